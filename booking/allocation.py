@@ -0,0 +1,141 @@
+"""
+Joint assignment of a batch of reservation requests to tables.
+
+Handing each request the cheapest free table in turn can seat a small party
+at the only table a later, larger party would have fit. ``assign_jointly``
+instead chooses the assignment that, in order of importance:
+
+1. sells the most seats,
+2. seats earlier requests rather than later ones,
+3. uses the cheapest tables, in ``(price, total_seats, id)`` order,
+4. gives the cheaper of those tables to the earlier requests.
+
+Requests are split into groups whose periods share a common instant, so a
+table takes at most one request per group and each group is an assignment
+problem, solved exactly with the Hungarian algorithm. Groups are solved in
+order of start time, each seeing the bookings placed by the previous ones;
+the result is optimal whenever the whole batch shares an instant, as a burst
+of bookings for the same sitting does.
+"""
+
+import math
+
+
+def periods_overlap(first, second):
+    return first.lower < second.upper and second.lower < first.upper
+
+
+def overlapping_groups(periods):
+    """Split indexes into runs of periods that share a common instant."""
+    order = sorted(range(len(periods)), key=lambda i: periods[i].lower)
+    groups = []
+    group_upper = None
+    for i in order:
+        if groups and periods[i].lower < group_upper:
+            groups[-1].append(i)
+            group_upper = min(group_upper, periods[i].upper)
+        else:
+            groups.append([i])
+            group_upper = periods[i].upper
+    return groups
+
+
+def solve_assignment(costs):
+    """
+    Minimum-cost assignment of every row of the ``costs`` matrix to a
+    distinct column; there must be at least as many columns as rows.
+    Returns the column of each row.
+    """
+    # Kuhn-Munkres with potentials, O(rows^2 * columns), on exact integers.
+    # Index 0 is a sentinel row and column.
+    rows, columns = len(costs), len(costs[0])
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    match = [0] * (columns + 1)
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        column = 0
+        min_slack = [math.inf] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[column] = True
+            current = match[column]
+            delta = math.inf
+            next_column = 0
+            for j in range(1, columns + 1):
+                if used[j]:
+                    continue
+                slack = costs[current - 1][j - 1] - u[current] - v[j]
+                if slack < min_slack[j]:
+                    min_slack[j] = slack
+                    way[j] = column
+                if min_slack[j] < delta:
+                    delta = min_slack[j]
+                    next_column = j
+            for j in range(columns + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    assignment = [None] * rows
+    for j in range(1, columns + 1):
+        if match[j]:
+            assignment[match[j] - 1] = j - 1
+    return assignment
+
+
+def assign_jointly(seat_requests, tables, booked):
+    """
+    Assign ``(number_of_seats, period)`` requests to ``tables``, which must
+    be in preference order, given the periods already ``booked`` per table
+    id. ``booked`` is extended with the new assignments. Returns one table
+    or None per request, in order.
+    """
+    count = len(seat_requests)
+    table_count = len(tables)
+    # Integer weights that make the objectives strictly lexicographic: one
+    # unit of each outweighs any possible total of the ones below it.
+    cheapness_scale = table_count * count * count + 1
+    earliness_scale = (table_count * count + 1) * cheapness_scale
+    seats_scale = (count * count + 1) * earliness_scale
+
+    assignments = [None] * count
+    for group in overlapping_groups([period for _, period in seat_requests]):
+        costs = []
+        for i in group:
+            number_of_seats, period = seat_requests[i]
+            row = []
+            for rank, table in enumerate(tables):
+                if table.total_seats < number_of_seats or any(
+                    periods_overlap(period, other) for other in booked[table.pk]
+                ):
+                    # Never chosen: a free "unassigned" column costs less.
+                    row.append(1)
+                    continue
+                row.append(
+                    -number_of_seats * seats_scale
+                    - (count - i) * earliness_scale
+                    + rank * cheapness_scale
+                    + rank * (count - i)
+                )
+            # One "unassigned" column per request, at no cost.
+            row.extend([0] * len(group))
+            costs.append(row)
+
+        columns = solve_assignment(costs)
+        for row, (i, column) in enumerate(zip(group, columns)):
+            if column < table_count and costs[row][column] < 0:
+                table = tables[column]
+                booked[table.pk].append(seat_requests[i][1])
+                assignments[i] = table
+    return assignments
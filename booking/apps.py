@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class BookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'booking'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from .db.pool import collect_pool_metrics
+        from .metrics import install_query_timer, registry
+
+        connection_created.connect(install_query_timer)
+        registry.add_collector(collect_pool_metrics)
@@ -0,0 +1,114 @@
+"""
+Native async read endpoints for ASGI deployments.
+
+DRF views are synchronous, so under ASGI every request to ``TableViewSet`` or
+``ReservationViewSet`` holds a worker thread. These views serve the same
+representations with Django's async ORM and never block the event loop.
+"""
+
+from functools import wraps
+
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import AsyncJWTAuthentication
+from .metrics import measure
+from .models import Reservation, Table
+from .pagination import ReservationPagination, TablePagination
+from .routers import ause_replicas, stop_using_replicas
+from .serializers import ReservationListSerializer, TableSerializer
+
+renderer = JSONRenderer()
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    with measure("render"):
+        content = renderer.render(data)
+    return HttpResponse(content, status=status_code, content_type="application/json")
+
+
+def async_api_view(view):
+    # Authenticates with the async JWT backend and renders API errors the same
+    # way DRF's exception handler does.
+    authentication = AsyncJWTAuthentication()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            return render(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+        try:
+            result = await authentication.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+            api_request = Request(request)
+            api_request.user = result[0]
+            token = await ause_replicas(api_request.user.pk)
+            try:
+                return await view(api_request, *args, **kwargs)
+            finally:
+                stop_using_replicas(token)
+        except exceptions.APIException as exc:
+            if isinstance(exc.detail, (list, dict)):
+                data = exc.detail
+            else:
+                data = {"detail": exc.detail}
+            response = render(data, exc.status_code)
+            if isinstance(
+                exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+            ):
+                response["WWW-Authenticate"] = authentication.authenticate_header(
+                    request
+                )
+            return response
+
+    return wrapper
+
+
+@async_api_view
+async def reservation_list(request):
+    queryset = Reservation.objects.filter(user=request.user).values(
+        *ReservationListSerializer.value_fields
+    )
+    serialize_row = ReservationListSerializer.build_row_serializer()
+    paginator = ReservationPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    with measure("serialize"):
+        data = [serialize_row(row) for row in page]
+    return render(paginator.get_paginated_data(data))
+
+
+@async_api_view
+async def reservation_detail(request, pk):
+    try:
+        row = await (
+            Reservation.objects.filter(user=request.user)
+            .values(*ReservationListSerializer.value_fields)
+            .aget(pk=pk)
+        )
+    except Reservation.DoesNotExist:
+        raise exceptions.NotFound("No Reservation matches the given query.")
+    with measure("serialize"):
+        data = ReservationListSerializer.build_row_serializer()(row)
+    return render(data)
+
+
+@async_api_view
+async def table_list(request):
+    paginator = TablePagination()
+    page = await paginator.apaginate_queryset(Table.objects.all(), request)
+    data = TableSerializer(page, many=True).data
+    return render(paginator.get_paginated_data(data))
+
+
+@async_api_view
+async def table_detail(request, pk):
+    try:
+        table = await Table.objects.aget(pk=pk)
+    except Table.DoesNotExist:
+        raise exceptions.NotFound("No Table matches the given query.")
+    return render(TableSerializer(table).data)
@@ -0,0 +1,208 @@
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch, get_md5_hash_password
+
+from .cache import auth_stamp_key
+from .models import ClaimsUser
+from .revocation import revocation_list
+
+AUTH_STAMP_CLAIM = "auth_stamp"
+REFRESH_JTI_CLAIM = "refresh_jti"
+# Stored for deleted users; no token carries it.
+DELETED_AUTH_STAMP = "deleted"
+
+
+def get_auth_stamp(user):
+    # Changes whenever the password or the active flag does, which revokes
+    # every token issued before.
+    return get_md5_hash_password(f"{user.password}:{user.is_active}")
+
+
+def get_revocation_ids(token):
+    # Access tokens are also revoked through the refresh token they came from.
+    return token.get(api_settings.JTI_CLAIM), token.get(REFRESH_JTI_CLAIM)
+
+
+def get_auth_stamp_timeout():
+    # Kept for as long as a token issued before the change can stay usable,
+    # including access tokens minted later from an old refresh token.
+    return (
+        api_settings.REFRESH_TOKEN_LIFETIME + api_settings.ACCESS_TOKEN_LIFETIME
+    ).total_seconds()
+
+
+def store_auth_stamp(user_id, stamp):
+    cache.set(auth_stamp_key(user_id), stamp, get_auth_stamp_timeout())
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token that carries the claims ``ClaimsJWTAuthentication`` needs;
+    access tokens derived from it copy them and record its ``jti`` so that
+    revoking it revokes them too.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token["username"] = user.get_username()
+        token["is_active"] = user.is_active
+        token[AUTH_STAMP_CLAIM] = get_auth_stamp(user)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access[REFRESH_JTI_CLAIM] = self[api_settings.JTI_CLAIM]
+        return access
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if revocation_list.is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is revoked"))
+
+    def revoke(self):
+        revocation_list.revoke(
+            self[api_settings.JTI_CLAIM], datetime_from_epoch(self["exp"])
+        )
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that builds ``request.user`` from token claims
+    instead of loading the user row on every request.
+
+    Tokens are revoked by comparing their stamp with the one stored in the
+    cache whenever a user is saved, and individually through
+    ``revocation_list``. A stamp missing from the cache is recomputed from
+    the user row, so the cache must be shared by every worker for revocations
+    to reach them all. Tokens issued without the claims fall back to the
+    database lookup.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation_list.is_revoked(*get_revocation_ids(validated_token)):
+            raise InvalidToken(_("Token is revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        if AUTH_STAMP_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        user_id = self.get_user_id(validated_token)
+        stamp = cache.get(auth_stamp_key(user_id))
+        if stamp is None:
+            stamp = self.load_auth_stamp(user_id)
+        return self.get_claims_user(validated_token, user_id, stamp)
+
+    def get_stamp_queryset(self, user_id):
+        return self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).only("password", "is_active")
+
+    def load_auth_stamp(self, user_id):
+        # The stamp is lost on restart and eviction, and users saved before
+        # stamps existed never got one. add() keeps a stamp a concurrent save
+        # stored meanwhile, which is newer than the row read here.
+        user = self.get_stamp_queryset(user_id).first()
+        stamp = get_auth_stamp(user) if user is not None else DELETED_AUTH_STAMP
+        key = auth_stamp_key(user_id)
+        if not cache.add(key, stamp, get_auth_stamp_timeout()):
+            stamp = cache.get(key, stamp)
+        return stamp
+
+    async def aload_auth_stamp(self, user_id):
+        user = await self.get_stamp_queryset(user_id).afirst()
+        stamp = get_auth_stamp(user) if user is not None else DELETED_AUTH_STAMP
+        key = auth_stamp_key(user_id)
+        if not await cache.aadd(key, stamp, get_auth_stamp_timeout()):
+            stamp = await cache.aget(key, stamp)
+        return stamp
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def get_claims_user(self, validated_token, user_id, stamp):
+        if stamp != validated_token[AUTH_STAMP_CLAIM]:
+            raise AuthenticationFailed(
+                _("Token has been revoked."), code="token_revoked"
+            )
+
+        is_active = validated_token.get("is_active", True)
+        if api_settings.CHECK_USER_IS_ACTIVE and not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return ClaimsUser.from_claims(
+            **{
+                api_settings.USER_ID_FIELD: user_id,
+                "username": validated_token.get("username", ""),
+                "is_active": is_active,
+            }
+        )
+
+
+class AsyncJWTAuthentication(ClaimsJWTAuthentication):
+    """
+    ``ClaimsJWTAuthentication`` for async views: token validation is pure CPU
+    and any lookups go through the async cache and ORM APIs, so the event loop
+    is never blocked.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        # Signature and expiry only; the revocation check may need the database.
+        validated_token = super(ClaimsJWTAuthentication, self).get_validated_token(
+            raw_token
+        )
+        if await revocation_list.ais_revoked(*get_revocation_ids(validated_token)):
+            raise InvalidToken(_("Token is revoked"))
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        if AUTH_STAMP_CLAIM in validated_token:
+            stamp = await cache.aget(auth_stamp_key(user_id))
+            if stamp is None:
+                stamp = await self.aload_auth_stamp(user_id)
+            return self.get_claims_user(validated_token, user_id, stamp)
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
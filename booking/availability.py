@@ -0,0 +1,94 @@
+import copy
+import threading
+from bisect import bisect_left
+from decimal import ROUND_HALF_UP, Decimal
+
+from .budgets import unbudgeted
+from .cache import TABLES_VERSION_KEY, get_version
+
+# Reservation.cost has two decimal places, and Postgres rounds numeric input
+# half away from zero.
+COST_EXPONENT = Decimal("0.01")
+
+
+class TableAvailabilityIndex:
+    """
+    Process-local index answering "cheapest table with at least N seats",
+    regardless of bookings.
+
+    Reservations always occupy a period, so which table is free is decided by
+    ``TableManager.available_for_period`` in the database. The index answers
+    the booking-independent part: booking uses it to turn away requests no
+    table can seat without a query, and quotes and waitlist validation read
+    prices from ``cost_matrix``.
+
+    Tables are bucketed by ``total_seats`` and each bucket is sorted by
+    ``(price, total_seats, id)``. A suffix minimum over the sorted seat counts
+    lets a lookup resolve with a single bisect. The table-set version lives in
+    the cache so every worker rebuilds after a table change is committed.
+
+    Each rebuild also prices every seat count up to the largest table, so
+    quotes are dictionary lookups.
+    """
+
+    def __init__(self, version_key=TABLES_VERSION_KEY):
+        self.version_key = version_key
+        self._lock = threading.Lock()
+        self._state = (None, [], [], {}, {})
+
+    @staticmethod
+    def sort_key(table):
+        return (table.price, table.total_seats, table.pk)
+
+    def rebuild(self, tables, version):
+        buckets = {}
+        for table in tables:
+            buckets.setdefault(table.total_seats, []).append(table)
+        for bucket in buckets.values():
+            bucket.sort(key=self.sort_key)
+
+        seats = sorted(buckets)
+        best = [None] * len(seats)
+        for i in range(len(seats) - 1, -1, -1):
+            candidate = buckets[seats[i]][0]
+            if i + 1 < len(seats) and self.sort_key(best[i + 1]) < self.sort_key(
+                candidate
+            ):
+                candidate = best[i + 1]
+            best[i] = candidate
+
+        costs = {}
+        for number_of_seats in range(1, seats[-1] + 1 if seats else 1):
+            table = best[bisect_left(seats, number_of_seats)]
+            cost = table.calculate_cost(number_of_seats).quantize(
+                COST_EXPONENT, rounding=ROUND_HALF_UP
+            )
+            costs[number_of_seats] = (table, cost)
+
+        self._state = (version, seats, best, buckets, costs)
+
+    def get_state(self, queryset):
+        version = get_version(self.version_key)
+        if self._state[0] != version:
+            with self._lock, unbudgeted():
+                if self._state[0] != version:
+                    self.rebuild(queryset, version)
+        return self._state
+
+    def best_table(self, number_of_seats, queryset):
+        _, seats, best, _, _ = self.get_state(queryset)
+        position = bisect_left(seats, number_of_seats)
+        if position == len(seats):
+            return None
+        return copy.copy(best[position])
+
+    def cost_matrix(self, queryset):
+        """
+        Return ``{number_of_seats: (table, cost)}`` for the cheapest table of
+        every seat count that some table can seat. The tables are shared and
+        must not be modified.
+        """
+        return self.get_state(queryset)[4]
+
+
+table_index = TableAvailabilityIndex()
@@ -0,0 +1,107 @@
+import threading
+import time
+from decimal import ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .availability import COST_EXPONENT
+from .models import Reservation, Table
+
+
+class PendingAllocation:
+    def __init__(self, user, number_of_seats, seats, period):
+        self.user = user
+        # As requested, and rounded up by Reservation.validate_number_of_seats.
+        self.number_of_seats = number_of_seats
+        self.seats = seats
+        self.period = period
+        self.done = threading.Event()
+        self.reservation = None
+        self.error = None
+
+
+class AllocationBatcher:
+    """
+    Allocates the reservation requests a process receives within
+    ``RESERVATION_BATCH_WINDOW_MS`` of each other together.
+
+    The first request to arrive leads: it waits out the window, places every
+    pending request at once with ``plan_allocations(joint=True)`` and inserts
+    the reservations in one transaction on its own connection, then wakes the
+    others, which run no queries. Batches form across the threads of one
+    worker process, so their size is bounded by its thread count.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def allocate(self, user, number_of_seats, seats, period):
+        """
+        Return the saved reservation, or raise ``ValidationError`` if no table
+        was free, or the database error the whole batch failed with.
+        """
+        request = PendingAllocation(user, number_of_seats, seats, period)
+        with self._lock:
+            self._pending.append(request)
+            leading = len(self._pending) == 1
+
+        if leading:
+            time.sleep(settings.RESERVATION_BATCH_WINDOW_MS / 1000)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            try:
+                self.run(batch)
+            except BaseException as exc:
+                for pending in batch:
+                    pending.error = exc
+                raise
+            finally:
+                for pending in batch:
+                    pending.done.set()
+        else:
+            request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.reservation
+
+    def run(self, batch):
+        with transaction.atomic():
+            tables = Table.objects.plan_allocations(
+                [(pending.seats, pending.period) for pending in batch], joint=True
+            )
+            reservations = [
+                (
+                    Reservation(
+                        user=pending.user,
+                        table=table,
+                        number_of_seats=pending.number_of_seats,
+                        # Rounded as the column would, for the response.
+                        cost=table.calculate_cost(pending.seats).quantize(
+                            COST_EXPONENT, rounding=ROUND_HALF_UP
+                        ),
+                        period=pending.period,
+                        active=True,
+                    )
+                    if table is not None
+                    else None
+                )
+                for pending, table in zip(batch, tables)
+            ]
+            Reservation.objects.bulk_create(
+                [reservation for reservation in reservations if reservation]
+            )
+
+        for pending, reservation in zip(batch, reservations):
+            if reservation is None:
+                pending.error = ValidationError(
+                    "No available table for this number of seats."
+                )
+            else:
+                pending.reservation = reservation
+
+
+batcher = AllocationBatcher()
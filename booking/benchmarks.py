@@ -0,0 +1,125 @@
+import json
+import math
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+def allow_test_client_host():
+    # The test clients always send ``Host: testserver``.
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+
+
+def run_threaded(send, requests, concurrency):
+    """
+    Call ``send(index)`` for every request index from ``concurrency`` threads
+    and return the wall-clock total and the latency of every call, in seconds.
+    """
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            send(index)
+            return time.perf_counter() - started
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, range(requests)))
+    return time.perf_counter() - started, latencies
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of an already sorted list.
+    return values[max(math.ceil(len(values) * q / 100) - 1, 0)]
+
+
+def summarize(total, latencies):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / total,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f"{label}: {summary['throughput']:.1f} req/s, "
+        f"p50 {summary['p50']:.2f} ms, "
+        f"p95 {summary['p95']:.2f} ms, "
+        f"p99 {summary['p99']:.2f} ms"
+    )
+
+
+class InProcessClient:
+    """
+    Sends requests through Django's test client in the calling thread and
+    counts the queries each one runs.
+    """
+
+    def __init__(self):
+        self.query_counts = []
+        self._lock = threading.Lock()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {"authorization": f"Bearer {token}"} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = Client(headers=headers).generic(
+                method,
+                path,
+                json.dumps(data) if data is not None else "",
+                content_type="application/json",
+            )
+        with self._lock:
+            self.query_counts.append(len(queries))
+        return response.status_code
+
+
+class HttpClient:
+    """
+    Sends requests to a running server; query counts are not available.
+    """
+
+    query_counts = ()
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, data=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, headers=headers, method=method
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def compare_summaries(baseline, current):
+    """
+    Relative change of every metric present in both summaries, as a fraction
+    of the baseline value.
+    """
+    return {
+        metric: (current[metric] - baseline[metric]) / baseline[metric]
+        for metric in ("throughput", "p50", "p95", "p99", "queries")
+        if baseline.get(metric) and current.get(metric) is not None
+    }
@@ -0,0 +1,94 @@
+import re
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_state = threading.local()
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """
+    Declare the query budget of a function-based view. Viewsets declare
+    theirs per action in a ``query_budgets`` dict.
+    """
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+
+    return decorator
+
+
+def get_view_budget(request):
+    match = request.resolver_match
+    if match is None:
+        return None
+    view = match.func
+    actions = getattr(view, "actions", None)
+    if actions is not None:
+        action = actions.get(request.method.lower())
+        return getattr(view.cls, "query_budgets", {}).get(action)
+    return getattr(view, "query_budget", None)
+
+
+@contextmanager
+def unbudgeted():
+    """
+    Upkeep that runs inside whichever request first needs it, such as the
+    periodic revocation list sync, is shared by every request in between and
+    not charged to the one that happens to trigger it. Anything a request
+    runs for itself, including authentication, counts.
+    """
+    _state.unbudgeted = getattr(_state, "unbudgeted", 0) + 1
+    try:
+        yield
+    finally:
+        _state.unbudgeted -= 1
+
+
+def fingerprint(sql):
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("(...)", sql)).strip()
+
+
+class QueryRecorder:
+    """
+    Records the SQL run on every connection in this thread, leaving out
+    savepoint bookkeeping, whose presence depends on the surrounding
+    transaction rather than on the endpoint.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not getattr(_state, "unbudgeted", 0) and not (
+            sql.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))
+        ):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def duplicates(self):
+        counts = Counter(fingerprint(sql) for sql in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+    def report(self, label, budget):
+        lines = [f"{label} ran {len(self.queries)} queries (budget {budget})."]
+        for sql, count in self.duplicates():
+            lines.append(f"  {count}x {sql}")
+        return "\n".join(lines)
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+TABLES_VERSION_KEY = "booking:tables:version"
+TABLES_PRIMARY_PIN_KEY = "booking:tables:primary"
+
+
+def auth_stamp_key(user_id):
+    return f"booking:auth:{user_id}:stamp"
+
+
+def reservations_version_key(user_id):
+    return f"booking:reservations:{user_id}:version"
+
+
+def primary_pin_key(user_id):
+    return f"booking:reservations:{user_id}:primary"
+
+
+def make_version(bumped_at):
+    return f"{bumped_at:f}:{uuid.uuid4().hex}"
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Not created by a write, so there is nothing for replicas to replay.
+        cache.add(key, make_version(0), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    cache.set(key, make_version(time.time()), None)
+
+
+def bumped_within(version, seconds):
+    bumped_at, _, _ = version.partition(":")
+    try:
+        return time.time() - float(bumped_at) < seconds
+    except ValueError:
+        return False
+
+
+def pin_to_primary(*keys):
+    # Reads guarded by these keys skip the replicas until they have had time
+    # to replay the write.
+    if settings.DATABASE_REPLICAS:
+        cache.set_many(dict.fromkeys(keys, True), settings.READ_YOUR_WRITES_WINDOW)
+
+
+def bump_reservations_version(*user_ids):
+    # Deferred until commit so readers never cache a version for rows that
+    # could still roll back.
+    for user_id in set(user_ids):
+
+        def bump(user_id=user_id):
+            # Pinned first, so a reader that sees the new version also sees
+            # the pin.
+            pin_to_primary(primary_pin_key(user_id))
+            bump_version(reservations_version_key(user_id))
+
+        transaction.on_commit(bump)
+
+
+def make_key(prefix, version, *parts):
+    digest = hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+    return f"{prefix}:{version}:{digest}"
+
+
+def make_etag(version, *parts):
+    digest = hashlib.md5("|".join(map(str, (version, *parts))).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def get_or_build(key, build, timeout, lock_timeout=5, poll_interval=0.01):
+    """
+    Return the cached value for ``key``, building it with ``build()`` on a miss.
+
+    Concurrent misses are coalesced: the first caller takes a short-lived lock
+    key and builds, the others poll for its result instead of rebuilding.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
+
+
+class LRUCache:
+    """
+    Small process-local LRU cache whose entries also expire after ``timeout``
+    seconds, for objects that are too hot to fetch from the shared cache.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, build):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = build()
+        with self._lock:
+            self._entries[key] = (now + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
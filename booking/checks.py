@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from psycopg2.extensions import ISOLATION_LEVEL_READ_COMMITTED
+
+# Backends whose entries other worker processes never see.
+PROCESS_LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # Table and reservation version tokens, replica pins and auth stamps must
+    # be shared, or other workers serve stale lists and ETags, read from
+    # lagging replicas and accept tokens for users whose stamp changed.
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.CACHE_REQUIRE_SHARED and backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        return [
+            Error(
+                f"The default cache ({backend}) is local to each process.",
+                hint="Set CACHE_URL to a shared cache such as redis://.",
+                id="booking.E001",
+            )
+        ]
+    return []
+
+
+@register()
+def check_isolation_level(app_configs, **kwargs):
+    # The overlap trigger takes an advisory lock and then looks for committed
+    # bookings, which a REPEATABLE READ or SERIALIZABLE snapshot taken before
+    # the lock would not show.
+    errors = []
+    for alias, settings_dict in settings.DATABASES.items():
+        level = settings_dict.get("OPTIONS", {}).get("isolation_level")
+        if level is not None and level != ISOLATION_LEVEL_READ_COMMITTED:
+            errors.append(
+                Error(
+                    f"DATABASES['{alias}'] sets an isolation level other than "
+                    "READ COMMITTED.",
+                    hint="Remove OPTIONS['isolation_level']; overlapping "
+                    "reservations are only rejected under READ COMMITTED.",
+                    id="booking.E002",
+                )
+            )
+    return errors
@@ -0,0 +1,43 @@
+from django.db.backends.postgresql import base, creation
+
+from .pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use.
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that borrows connections from a per-process pool
+    configured by the ``POOL`` entry of the database settings, and gives them
+    back instead of closing them. Pair it with ``CONN_MAX_AGE = 0`` so each
+    request returns its connection for other threads to reuse.
+    """
+
+    creation_class = DatabaseCreation
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+        key = (
+            self.alias,
+            repr(sorted(conn_params.items())),
+            repr(sorted(options.items())),
+        )
+        return get_pool(
+            key,
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            **options,
+        )
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        return self.pool.getconn()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
@@ -0,0 +1,264 @@
+import os
+import threading
+import time
+from collections import deque
+
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    A blocking, thread-safe pool of psycopg2 connections for one process.
+
+    Checkouts reuse the most recently returned connection, so the idle ones
+    beyond what the load needs age out through ``max_idle``. A connection that
+    sat idle for longer than ``check_after`` seconds is pinged before it is
+    handed out, and any connection older than ``max_lifetime`` is replaced.
+    ``fill()`` opens ``min_size`` connections up front, and idle connections
+    are never pruned below that number.
+    """
+
+    def __init__(
+        self,
+        connect,
+        min_size=0,
+        max_size=10,
+        timeout=5,
+        max_idle=600,
+        max_lifetime=3600,
+        check_after=30,
+    ):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        # (connection, opened_at, returned_at)
+        self._idle = deque()
+        self._opened_at = {}
+        self._size = 0
+        self._waiting = 0
+        self.stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+            "opened": 0,
+            "discarded": 0,
+        }
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def waiting(self):
+        return self._waiting
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._condition:
+            while True:
+                connection = self._take_idle()
+                if connection is not None:
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection became free within "
+                        f"{self.timeout} seconds ({self.max_size} in use)."
+                    )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self.stats["checkouts"] += 1
+            self.stats["wait_seconds"] += time.monotonic() - started
+
+        if connection is None:
+            connection = self._open()
+        return connection
+
+    def putconn(self, connection):
+        if not self._reset(connection):
+            self._discard(connection)
+            return
+        with self._condition:
+            opened_at = self._opened_at[id(connection)]
+            self._idle.append((connection, opened_at, time.monotonic()))
+            self._prune()
+            self._condition.notify()
+
+    def fill(self):
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            with self._condition:
+                opened_at = self._opened_at[id(connection)]
+                self._idle.append((connection, opened_at, time.monotonic()))
+                self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            while self._idle:
+                connection, _, _ = self._idle.pop()
+                self._close(connection)
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[id(connection)] = time.monotonic()
+            self.stats["opened"] += 1
+        return connection
+
+    def _take_idle(self):
+        # Called with the condition held.
+        now = time.monotonic()
+        while self._idle:
+            connection, opened_at, returned_at = self._idle.pop()
+            if connection.closed or now - opened_at > self.max_lifetime:
+                self._close(connection)
+                continue
+            if now - returned_at > self.check_after and not self._ping(connection):
+                self._close(connection)
+                continue
+            return connection
+        return None
+
+    def _prune(self):
+        # Called with the condition held. The oldest returned connections sit
+        # at the left end and are only closed above min_size.
+        now = time.monotonic()
+        while len(self._idle) > self.min_size:
+            _, _, returned_at = self._idle[0]
+            if now - returned_at <= self.max_idle:
+                break
+            connection, _, _ = self._idle.popleft()
+            self._close(connection)
+
+    def _reset(self, connection):
+        if connection.closed:
+            return False
+        try:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _ping(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not connection.autocommit:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self._condition:
+            self._close(connection)
+            self._condition.notify()
+
+    def _close(self, connection):
+        # Called with the condition held.
+        self._opened_at.pop(id(connection), None)
+        self._size -= 1
+        self.stats["discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def get_pool(key, connect, **options):
+    """
+    Return this process's pool for ``key``, creating it and opening its
+    ``min_size`` connections on first use. A pool inherited through ``fork()``
+    is abandoned without closing its sockets, which still belong to the
+    parent.
+    """
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid == os.getpid():
+            return pool
+        pool = _pools[key] = ConnectionPool(connect, **options)
+    # Outside the lock, so other pools stay available while this one connects.
+    pool.fill()
+    return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            if pool.pid == os.getpid():
+                pool.close()
+        _pools.clear()
+
+
+def collect_pool_metrics():
+    with _pools_lock:
+        pools = [
+            (alias, pool)
+            for (alias, *_), pool in _pools.items()
+            if pool.pid == os.getpid()
+        ]
+    counters, gauges = [], []
+    for alias, pool in pools:
+        labels = {"alias": alias}
+        stats = dict(pool.stats)
+        counters += [
+            ("booking_db_pool_checkouts_total", labels, stats["checkouts"]),
+            ("booking_db_pool_timeouts_total", labels, stats["timeouts"]),
+            ("booking_db_pool_wait_seconds_total", labels, stats["wait_seconds"]),
+            ("booking_db_pool_connections_opened_total", labels, stats["opened"]),
+            (
+                "booking_db_pool_connections_discarded_total",
+                labels,
+                stats["discarded"],
+            ),
+        ]
+        idle = pool.idle
+        gauges += [
+            ("booking_db_pool_connections", {**labels, "state": "idle"}, idle),
+            (
+                "booking_db_pool_connections",
+                {**labels, "state": "in_use"},
+                pool.size - idle,
+            ),
+            ("booking_db_pool_waiting", labels, pool.waiting),
+        ]
+    return counters, gauges
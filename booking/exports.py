@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+from .models import Reservation
+from .serializers import ReservationListSerializer
+
+EXPORT_FIELDS = [
+    "id",
+    "user",
+    "table",
+    "number_of_seats",
+    "cost",
+    "booked_at",
+    "start_at",
+    "end_at",
+    "active",
+]
+
+
+def get_export_queryset(booked_after=None, booked_before=None, active=None):
+    # Unordered: sorting the full history would have to finish before the
+    # first row could be sent.
+    queryset = Reservation.objects.order_by()
+    if booked_after is not None:
+        queryset = queryset.filter(booked_at__gte=booked_after)
+    if booked_before is not None:
+        queryset = queryset.filter(booked_at__lt=booked_before)
+    if active is not None:
+        queryset = queryset.filter(active=active)
+    return queryset.values(*ReservationListSerializer.value_fields)
+
+
+def iter_chunks(queryset, chunk_size):
+    """
+    Yield lists of at most ``chunk_size`` serialised rows, read through a
+    server-side cursor so only one chunk is held in memory at a time.
+    """
+    serialize_row = ReservationListSerializer.build_row_serializer()
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(serialize_row(row))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_ndjson(queryset, chunk_size):
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+
+def stream_csv(queryset, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for chunk in iter_chunks(queryset, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Only the header, for an empty export.
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+STREAMS = {"ndjson": stream_ndjson, "csv": stream_csv}
@@ -0,0 +1,139 @@
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .budgets import unbudgeted
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed."
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def claim(user, key, fingerprint):
+    """
+    Take the in-flight lock on ``key`` for ``user``, or wait for the request
+    holding it. Returns ``(record, claimed)``: either our claim, to be passed
+    to ``complete`` or ``release``, or the record of an earlier request with
+    its stored response.
+
+    Waiting gives up with a 409 after ``IDEMPOTENCY_LOCK_TIMEOUT`` seconds,
+    but a claim is only taken to belong to a crashed worker, and taken over,
+    once it is still unanswered after ``IDEMPOTENCY_ABANDON_AFTER`` seconds,
+    so a slow request is never run twice.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+    result = try_claim(user, key, fingerprint)
+    while result is None:
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInUse()
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+        # How often the key is polled depends on how long the request holding
+        # it runs, not on this endpoint, so only the first attempt is charged
+        # to its query budget.
+        with unbudgeted():
+            result = try_claim(user, key, fingerprint)
+    return result
+
+
+def try_claim(user, key, fingerprint):
+    # Returns ``(record, claimed)`` like claim(), or None while another
+    # request holds the key.
+    while True:
+        now = timezone.now()
+        record = IdempotencyKey.objects.claim(
+            user,
+            key,
+            fingerprint,
+            locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_ABANDON_AFTER),
+            expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+        )
+        if record is not None:
+            return record, True
+
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            # Released by a request that failed; try to claim it again.
+            continue
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyReused()
+        if record.status_code is not None:
+            return record, False
+        return None
+
+
+def complete(record, response):
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code, response=response.data
+    )
+
+
+def release(record):
+    IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
+
+
+def idempotent(handler):
+    """
+    Let clients retry an unsafe viewset action with an ``Idempotency-Key``
+    header. The first request runs the action and stores a successful
+    response for ``IDEMPOTENCY_KEY_TTL``; retries with the same key get that
+    response back instead of running it again, and retries that arrive while
+    it is still running wait for it. Failed responses are not stored, since
+    they change nothing, so the same key can be retried.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return handler(self, request, *args, **kwargs)
+        max_length = IdempotencyKey._meta.get_field("key").max_length
+        if not key or len(key) > max_length:
+            raise ValidationError(
+                {IDEMPOTENCY_HEADER: f"Must be between 1 and {max_length} characters."}
+            )
+
+        record, claimed = claim(request.user, key, request_fingerprint(request))
+        if not claimed:
+            response = Response(record.response, status=record.status_code)
+            response[REPLAYED_HEADER] = "true"
+            return response
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            release(record)
+            raise
+        if status.is_success(response.status_code):
+            complete(record, response)
+        else:
+            release(record)
+        return response
+
+    return wrapper
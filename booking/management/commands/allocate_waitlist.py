@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from booking.waitlist import allocate_waitlist, listen
+
+
+class Command(BaseCommand):
+    help = (
+        "Book free tables for waitlisted reservation requests. With --listen, "
+        "keep running and allocate whenever seats come free."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--listen",
+            action="store_true",
+            help="Wait for notifications from the database instead of exiting.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.WAITLIST_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        def allocate():
+            allocated = allocate_waitlist(options["batch_size"])
+            if allocated or not options["listen"]:
+                self.stdout.write(
+                    f"Allocated {len(allocated)} waitlisted reservations."
+                )
+
+        if not options["listen"]:
+            allocate()
+            return
+        try:
+            listen(allocate, settings.WAITLIST_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
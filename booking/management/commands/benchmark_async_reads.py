@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from booking.benchmarks import (
+    allow_test_client_host,
+    format_summary,
+    run_threaded,
+    summarize,
+)
+from booking.models import Reservation
+
+User = get_user_model()
+
+ENDPOINTS = {
+    "reservations": ("reservation-list", "async-reservation-list"),
+    "tables": ("table-list", "async-table-list"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and latency of the sync DRF list endpoints with the "
+        "native async ones under concurrent load."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="User id to authenticate as. "
+            "Defaults to the user with the most reservations.",
+        )
+        parser.add_argument(
+            "--endpoint", choices=sorted(ENDPOINTS), default="reservations"
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=20)
+
+    def get_user(self, user_id):
+        if user_id is not None:
+            try:
+                return User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f"User {user_id} does not exist.")
+        busiest = (
+            Reservation.objects.values("user_id")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first()
+        )
+        if busiest is not None:
+            return User.objects.get(pk=busiest["user_id"])
+        user = User.objects.order_by("pk").first()
+        if user is None:
+            raise CommandError("No users found; seed some data first.")
+        return user
+
+    def run_sync(self, url, headers, requests, concurrency):
+        def send(_):
+            response = Client(headers=headers).get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}.")
+
+        return run_threaded(send, requests, concurrency)
+
+    async def run_async(self, url, headers, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch():
+            async with semaphore:
+                started = time.perf_counter()
+                # AsyncClient ignores client-level headers in Django 4.2.
+                response = await client.get(url, headers=headers)
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}.")
+            return elapsed
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(fetch() for _ in range(requests)))
+        total = time.perf_counter() - started
+        await sync_to_async(connections.close_all)()
+        return total, latencies
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        user = self.get_user(options["user"])
+        token = RefreshToken.for_user(user).access_token
+        headers = {"authorization": f"Bearer {token}"}
+        sync_name, async_name = ENDPOINTS[options["endpoint"]]
+        requests, concurrency = options["requests"], options["concurrency"]
+
+        with allow_test_client_host():
+            sync_result = self.run_sync(
+                reverse(sync_name), headers, requests, concurrency
+            )
+            async_result = asyncio.run(
+                self.run_async(reverse(async_name), headers, requests, concurrency)
+            )
+
+        self.stdout.write(format_summary("sync", summarize(*sync_result)))
+        self.stdout.write(format_summary("async", summarize(*async_result)))
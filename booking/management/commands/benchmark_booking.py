@@ -0,0 +1,309 @@
+import json
+import statistics
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.authentication import ClaimsRefreshToken
+from booking.benchmarks import (
+    HttpClient,
+    InProcessClient,
+    allow_test_client_host,
+    compare_summaries,
+    format_summary,
+    run_threaded,
+    summarize,
+)
+from booking.models import Reservation, Table
+
+User = get_user_model()
+
+SEED_PREFIX = "bench-"
+SEED_PASSWORD = "bench-password"
+# Seeded history is laid out backwards from a fixed point so re-seeding more
+# rows never overlaps the ones already there.
+SEED_ANCHOR = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+SCENARIOS = ("token", "list", "create", "cancel")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed benchmark data and report latency percentiles, throughput and "
+        "queries per request for the booking API, optionally against a saved "
+        "baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--reservations-per-user", type=int, default=50)
+        parser.add_argument(
+            "--reseed",
+            action="store_true",
+            help="Delete previously seeded users and their reservations first.",
+        )
+        parser.add_argument(
+            "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+        )
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument(
+            "--url",
+            help="Base URL of a running server, e.g. http://127.0.0.1:8000. "
+            "Requests go through the test client in-process by default.",
+        )
+        parser.add_argument("--save-baseline", metavar="PATH")
+        parser.add_argument("--compare", metavar="PATH")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=0.2,
+            help="With --compare, fail when p95 latency or throughput is worse "
+            "than the baseline by more than this fraction, or when any "
+            "scenario runs more queries per request.",
+        )
+
+    def seed(self, users, reservations_per_user, reseed):
+        seeded = User.objects.filter(username__startswith=SEED_PREFIX)
+        if reseed:
+            seeded.delete()
+
+        existing = seeded.count()
+        if existing < users:
+            password = make_password(SEED_PASSWORD)
+            User.objects.bulk_create(
+                [
+                    User(username=f"{SEED_PREFIX}{i}", password=password)
+                    for i in range(existing, users)
+                ]
+            )
+
+        last_number = Table.objects.aggregate(last=Max("table_number"))["last"] or 0
+        for number in range(last_number + 1, last_number + 11 - Table.objects.count()):
+            Table.objects.create(table_number=number, total_seats=4 + number % 4 * 2)
+        tables = list(Table.objects.order_by("pk"))
+
+        users = list(
+            seeded.annotate(seeded_reservations=Count("reservations")).order_by("pk")[
+                :users
+            ]
+        )
+        slot = Reservation.objects.filter(user__in=users).count()
+        duration = settings.DEFAULT_RESERVATION_DURATION
+        reservations = []
+        for user in users:
+            missing = reservations_per_user - user.seeded_reservations
+            for _ in range(max(missing, 0)):
+                table = tables[slot % len(tables)]
+                start = SEED_ANCHOR - (slot // len(tables) + 1) * duration
+                number_of_seats = min(2 + slot % 4 * 2, table.total_seats)
+                reservations.append(
+                    Reservation(
+                        user=user,
+                        table=table,
+                        number_of_seats=number_of_seats,
+                        cost=table.calculate_cost(number_of_seats),
+                        period=DateTimeTZRange(start, start + duration),
+                        active=slot % 3 == 0,
+                    )
+                )
+                slot += 1
+        Reservation.objects.bulk_create(reservations, batch_size=5000)
+        return users
+
+    def future_period(self, index):
+        duration = settings.DEFAULT_RESERVATION_DURATION
+        start = self.window_start + index * duration
+        return start, start + duration
+
+    def build_scenario(self, name, client, users, tokens, requests):
+        # Returns the request to send for an index and its expected status.
+        if name == "token":
+            url = reverse("token_obtain_pair")
+            return (
+                lambda i: client.request(
+                    "POST",
+                    url,
+                    {
+                        "username": users[i % len(users)].username,
+                        "password": SEED_PASSWORD,
+                    },
+                ),
+                200,
+            )
+
+        if name == "list":
+            url = reverse("reservation-list")
+            return (
+                lambda i: client.request("GET", url, token=tokens[i % len(tokens)]),
+                200,
+            )
+
+        if name == "create":
+            url = reverse("reservation-list")
+
+            def create(i):
+                start, end = self.future_period(i)
+                data = {
+                    "number_of_seats": 4,
+                    "start_at": start.isoformat(),
+                    "end_at": end.isoformat(),
+                }
+                return client.request("POST", url, data, token=tokens[i % len(tokens)])
+
+            return create, 201
+
+        table = Table.objects.order_by("-total_seats").first()
+        reservations = []
+        for i in range(requests):
+            start, end = self.future_period(requests + i)
+            reservations.append(
+                Reservation(
+                    user=users[i % len(users)],
+                    table=table,
+                    number_of_seats=4,
+                    cost=table.calculate_cost(4),
+                    period=DateTimeTZRange(start, end),
+                )
+            )
+        Reservation.objects.bulk_create(reservations)
+        return (
+            lambda i: client.request(
+                "POST",
+                reverse("reservation-cancel", args=[reservations[i].pk]),
+                token=tokens[i % len(tokens)],
+            ),
+            200,
+        )
+
+    def run_scenario(self, name, client, users, tokens, requests, concurrency):
+        send, expected_status = self.build_scenario(
+            name, client, users, tokens, requests
+        )
+        errors = []
+        lock = threading.Lock()
+
+        def checked(index):
+            status_code = send(index)
+            if status_code != expected_status:
+                with lock:
+                    errors.append(status_code)
+
+        try:
+            summary = summarize(*run_threaded(checked, requests, concurrency))
+        finally:
+            Reservation.objects.filter(
+                user__in=users, period__startswith__gte=self.window_start
+            ).delete()
+
+        summary["errors"] = len(errors)
+        # The median ignores the occasional background query, such as a
+        # revocation list sync, that is not part of the endpoint's own cost.
+        summary["queries"] = (
+            statistics.median(client.query_counts) if client.query_counts else None
+        )
+        return summary
+
+    def format_result(self, name, summary):
+        line = format_summary(name, summary)
+        if summary["queries"] is not None:
+            line += f", {summary['queries']:.1f} queries/request"
+        if summary["errors"]:
+            line += f", {summary['errors']} unexpected responses"
+        return line
+
+    def compare(self, path, results, url, max_regression):
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+            baseline_results = baseline["results"]
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+        if baseline.get("url") != url:
+            self.stdout.write(
+                self.style.WARNING(
+                    "The baseline was recorded against a different target "
+                    f"({baseline.get('url') or 'in-process'})."
+                )
+            )
+
+        regressions = []
+        for name, summary in results.items():
+            if name not in baseline_results:
+                continue
+            changes = compare_summaries(baseline_results[name], summary)
+            self.stdout.write(
+                f"{name} vs baseline: "
+                + ", ".join(
+                    f"{metric} {change:+.1%}" for metric, change in changes.items()
+                )
+            )
+            if changes.get("p95", 0) > max_regression:
+                regressions.append(f"{name}: p95 {changes['p95']:+.1%}")
+            if changes.get("throughput", 0) < -max_regression:
+                regressions.append(f"{name}: throughput {changes['throughput']:+.1%}")
+            if changes.get("queries", 0) > 0:
+                regressions.append(f"{name}: queries {changes['queries']:+.1%}")
+
+        if regressions:
+            raise CommandError(
+                "Regressions against the baseline:\n"
+                + "\n".join(f"  {r}" for r in regressions)
+            )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The booking schema requires PostgreSQL.")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        if options["users"] < 1:
+            raise CommandError("--users must be positive.")
+
+        users = self.seed(
+            options["users"], options["reservations_per_user"], options["reseed"]
+        )
+        tokens = [str(ClaimsRefreshToken.for_user(user).access_token) for user in users]
+        self.window_start = timezone.now().replace(
+            minute=0, second=0, microsecond=0
+        ) + timedelta(days=3650)
+
+        results = {}
+        with allow_test_client_host():
+            for name in options["scenarios"]:
+                client = (
+                    HttpClient(options["url"]) if options["url"] else InProcessClient()
+                )
+                results[name] = self.run_scenario(
+                    name,
+                    client,
+                    users,
+                    tokens,
+                    options["requests"],
+                    options["concurrency"],
+                )
+                self.stdout.write(self.format_result(name, results[name]))
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as f:
+                json.dump(
+                    {
+                        "requests": options["requests"],
+                        "concurrency": options["concurrency"],
+                        "url": options["url"],
+                        "results": results,
+                    },
+                    f,
+                    indent=2,
+                )
+        if options["compare"]:
+            self.compare(
+                options["compare"], results, options["url"], options["max_regression"]
+            )
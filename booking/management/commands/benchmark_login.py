@@ -0,0 +1,85 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from booking.benchmarks import (
+    allow_test_client_host,
+    format_summary,
+    run_threaded,
+    summarize,
+)
+
+User = get_user_model()
+
+# reverse("rest_login") resolves to dj-rest-auth's own login route rather than
+# the CustomLoginView that overrides it, so the paths are spelled out.
+ENDPOINTS = {
+    "login": "/dj-rest-auth/login/",
+    "token": "/api/token/",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput and latency, optionally comparing several "
+        "password-hash work factors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="login")
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            nargs="+",
+            help="PBKDF2 work factors to compare. "
+            "Defaults to PASSWORD_HASH_ITERATIONS.",
+        )
+
+    def time_hash(self, password):
+        encoded = make_password(password)
+        started = time.perf_counter()
+        check_password(password, encoded)
+        return (time.perf_counter() - started) * 1000
+
+    def run_logins(self, url, requests, concurrency):
+        # A throwaway user per run so its stored hash uses the current work
+        # factor; threads use their own connections, so it has to be committed.
+        password = uuid.uuid4().hex
+        user = User.objects.create_user(
+            username=f"benchmark-{uuid.uuid4().hex[:12]}", password=password
+        )
+        data = {"username": user.username, "password": password}
+
+        def send(_):
+            response = Client().post(url, data)
+            if response.status_code != 200:
+                raise CommandError(f"POST {url} returned {response.status_code}.")
+
+        try:
+            return run_threaded(send, requests, concurrency)
+        finally:
+            user.delete()
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        url = ENDPOINTS[options["endpoint"]]
+        for iterations in options["iterations"] or [settings.PASSWORD_HASH_ITERATIONS]:
+            if iterations < 1:
+                raise CommandError("--iterations must be positive.")
+            with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+                hash_ms = self.time_hash(uuid.uuid4().hex)
+                with allow_test_client_host():
+                    result = self.run_logins(
+                        url, options["requests"], options["concurrency"]
+                    )
+            summary = format_summary(f"{iterations} iterations", summarize(*result))
+            self.stdout.write(f"{summary}, hash check {hash_ms:.2f} ms")
@@ -0,0 +1,145 @@
+import json
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from booking.models import Reservation, Table, default_reservation_period
+from booking.pagination import ReservationPagination
+from booking.views import ReservationViewSet
+
+User = get_user_model()
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN (ANALYZE, BUFFERS) on the booking hot-path queries and "
+        "report sequential scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="User id to build the reservation queries for. "
+            "Defaults to the user with the most reservations.",
+        )
+        parser.add_argument("--seats", type=int, default=4)
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=0,
+            help="Ignore sequential scans that read fewer rows than this.",
+        )
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error when any reported sequential scan is found.",
+        )
+
+    def get_user(self, user_id):
+        if user_id is not None:
+            try:
+                return User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f"User {user_id} does not exist.")
+        busiest = (
+            Reservation.objects.values("user_id")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first()
+        )
+        if busiest is not None:
+            return User.objects.get(pk=busiest["user_id"])
+        user = User.objects.order_by("pk").first()
+        if user is None:
+            raise CommandError("No users found; seed some data first.")
+        return user
+
+    def get_queries(self, user, number_of_seats):
+        view = ReservationViewSet()
+        view.request = SimpleNamespace(user=user)
+        view.action = "list"
+        reservations = view.get_queryset()
+        page_size = ReservationPagination.page_size
+        period = default_reservation_period()
+        reservation_id = reservations.values_list("pk", flat=True).first() or 0
+        table_id = Table.objects.values_list("pk", flat=True).first() or 0
+
+        return [
+            (
+                "ReservationViewSet.list",
+                reservations.order_by(*ReservationPagination.ordering)[:page_size],
+            ),
+            (
+                "ReservationViewSet.list (active)",
+                reservations.filter(active=True).order_by(
+                    *ReservationPagination.ordering
+                )[:page_size],
+            ),
+            (
+                "ReservationViewSet.retrieve",
+                reservations.filter(pk=reservation_id),
+            ),
+            (
+                "TableManager.available_for_period",
+                Table.objects.available_for_period(number_of_seats, period)[:1],
+            ),
+            (
+                "Active reservations per table",
+                Reservation.objects.filter(table_id=table_id, active=True),
+            ),
+        ]
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+            transaction.set_rollback(True)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This command requires PostgreSQL.")
+
+        user = self.get_user(options["user"])
+        offenders = []
+        for name, queryset in self.get_queries(user, options["seats"]):
+            result = self.explain(queryset)
+            nodes = list(walk_plan(result["Plan"]))
+            indexes = sorted(
+                {node["Index Name"] for node in nodes if "Index Name" in node}
+            )
+            seq_scans = [
+                node
+                for node in nodes
+                if node["Node Type"] == "Seq Scan"
+                and node["Actual Rows"] * node["Actual Loops"] >= options["min_rows"]
+            ]
+
+            self.stdout.write(
+                f"{name}: {result['Execution Time']:.3f} ms, "
+                f"indexes: {', '.join(indexes) or '-'}"
+            )
+            for node in seq_scans:
+                rows = node["Actual Rows"] * node["Actual Loops"]
+                message = f"  seq scan on {node['Relation Name']} ({rows} rows)"
+                self.stdout.write(self.style.WARNING(message))
+                offenders.append(f"{name}: {node['Relation Name']}")
+
+        if offenders and options["fail_on_seq_scan"]:
+            raise CommandError(
+                "Sequential scans found:\n" + "\n".join(f"  {o}" for o in offenders)
+            )
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from booking.exports import STREAMS, get_export_queryset
+
+
+def datetime_argument(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream reservations as NDJSON or CSV through a server-side cursor, "
+        "in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(STREAMS), default="ndjson")
+        parser.add_argument("--booked-after", type=datetime_argument)
+        parser.add_argument("--booked-before", type=datetime_argument)
+        active = parser.add_mutually_exclusive_group()
+        active.add_argument(
+            "--active", dest="active", action="store_true", default=None
+        )
+        active.add_argument("--inactive", dest="active", action="store_false")
+        parser.add_argument(
+            "--chunk-size", type=int, default=settings.RESERVATION_EXPORT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            "--output", help="File to write to. Defaults to standard output."
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        queryset = get_export_queryset(
+            booked_after=options["booked_after"],
+            booked_before=options["booked_before"],
+            active=options["active"],
+        )
+        chunks = STREAMS[options["format"]](queryset, options["chunk_size"])
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                f.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,97 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from booking.partitions import (
+    add_months,
+    archive_partition,
+    create_partition,
+    default_partition_months,
+    has_upcoming_reservations,
+    list_partitions,
+    month_start,
+    partition_name,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly booking_reservation partitions ahead of time and "
+        "archive the ones past the retention period. Run it daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.RESERVATION_PARTITIONS_AHEAD,
+            help="Months after the current one to create partitions for.",
+        )
+        parser.add_argument(
+            "--retain",
+            type=int,
+            default=settings.RESERVATION_RETENTION_MONTHS,
+            help="Months before the current one to keep attached; 0 keeps all.",
+        )
+        parser.add_argument(
+            "--archive-schema",
+            default=settings.RESERVATION_ARCHIVE_SCHEMA,
+            help="Schema that archived partitions are moved to.",
+        )
+        parser.add_argument(
+            "--export-dir",
+            help="Write archived partitions to gzipped CSV files in this "
+            "directory and drop them instead of keeping them in the database.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This command requires PostgreSQL.")
+        if options["export_dir"] and not os.path.isdir(options["export_dir"]):
+            raise CommandError(f"{options['export_dir']} is not a directory.")
+
+        now = timezone.now()
+        current = month_start(now)
+        partitions = list_partitions()
+
+        months = {add_months(current, offset) for offset in range(options["ahead"] + 1)}
+        # Reservations land in the default partition when this command has not
+        # run for a while; creating their months' partitions moves them out.
+        months.update(default_partition_months())
+        for month in sorted(months):
+            if month in partitions:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"Would create {partition_name(month)}.")
+                continue
+            moved = create_partition(month)
+            message = f"Created {partition_name(month)}"
+            if moved:
+                message += f" and moved {moved} reservations into it"
+            self.stdout.write(f"{message}.")
+
+        if options["retain"] <= 0:
+            return
+        cutoff = add_months(current, -options["retain"])
+        for month, name in sorted(partitions.items()):
+            if month >= cutoff:
+                continue
+            # Bookings made long in advance are still live; archiving them
+            # would drop them from their owners' lists and from the overlap
+            # check.
+            if has_upcoming_reservations(name, now):
+                self.stdout.write(
+                    self.style.WARNING(f"Kept {name}: it has upcoming reservations.")
+                )
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive {name}.")
+                continue
+            location = archive_partition(
+                name, options["archive_schema"], options["export_dir"]
+            )
+            self.stdout.write(f"Archived {name} to {location}.")
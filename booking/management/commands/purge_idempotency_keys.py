@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from booking.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored idempotency keys whose retry window has passed."
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.objects.purge_expired()
+        self.stdout.write(f"Purged {deleted} expired idempotency keys.")
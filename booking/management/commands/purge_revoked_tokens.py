@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from booking.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete revoked token ids whose tokens have expired anyway."
+
+    def handle(self, *args, **options):
+        deleted = RevokedToken.objects.purge_expired()
+        self.stdout.write(f"Purged {deleted} expired revoked tokens.")
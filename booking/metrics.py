@@ -0,0 +1,390 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_current_timing = ContextVar("booking_request_timing", default=None)
+
+HISTOGRAMS = {
+    "total": (
+        "booking_request_duration_seconds",
+        "Total time spent handling a request.",
+    ),
+    "db": (
+        "booking_request_db_duration_seconds",
+        "Time spent executing SQL while handling a request.",
+    ),
+    "serialize": (
+        "booking_request_serialize_duration_seconds",
+        "Time spent turning model instances and rows into response data.",
+    ),
+    "render": (
+        "booking_request_render_duration_seconds",
+        "Time spent rendering the response body.",
+    ),
+}
+REQUESTS_TOTAL = "booking_requests_total"
+ARCHIVE = "archived.json"
+ARCHIVE_LOCK = ".archive.lock"
+CONNECTIONS_OPENED = "booking_db_connections_opened_total"
+
+COUNTERS = {
+    REQUESTS_TOTAL: "Requests handled.",
+    CONNECTIONS_OPENED: "Database connections opened by Django.",
+    "booking_db_pool_checkouts_total": "Connections handed out by the pool.",
+    "booking_db_pool_timeouts_total": "Checkouts that gave up waiting for a "
+    "free pooled connection.",
+    "booking_db_pool_wait_seconds_total": "Time spent waiting for a free pooled "
+    "connection.",
+    "booking_db_pool_connections_opened_total": "Connections opened by the pool.",
+    "booking_db_pool_connections_discarded_total": "Pooled connections closed "
+    "because they were broken, failed the health check or outlived "
+    "max_lifetime.",
+}
+# Gauges describe live processes only; the values of exited workers are
+# dropped when aggregating.
+GAUGES = {
+    "booking_db_pool_connections": "Pooled connections by state.",
+    "booking_db_pool_waiting": "Threads waiting for a pooled connection.",
+}
+
+
+class RequestTiming:
+    """
+    Durations, in seconds, accumulated while one request is handled. Queries
+    are charged to the timing of the context they run in, which also follows
+    the request into the threads that ``sync_to_async`` uses under ASGI.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.render_started = None
+        self.measuring = set()
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def start_render(self, response):
+        self.render_started = time.perf_counter()
+        response.add_post_render_callback(self.finish_render)
+
+    def finish_render(self, response):
+        self.render += time.perf_counter() - self.render_started
+
+    def activate(self):
+        return _current_timing.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current_timing.reset(token)
+
+
+@contextmanager
+def measure(phase):
+    """
+    Add the time spent in the block to ``phase`` of the current request's
+    timing. Blocks nested in one of the same phase are not counted again.
+    """
+    timing = _current_timing.get()
+    if timing is None or phase in timing.measuring:
+        yield
+        return
+    timing.measuring.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        setattr(timing, phase, getattr(timing, phase) + elapsed)
+        timing.measuring.discard(phase)
+
+
+def time_queries(execute, sql, params, many, context):
+    timing = _current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += time.perf_counter() - started
+        timing.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    registry.inc(CONNECTIONS_OPENED, {"alias": connection.alias})
+    # connection_created fires again when a connection is reopened.
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Request latency histograms and counters for this process.
+
+    With ``METRICS_DIR`` set, each process periodically writes its totals to
+    ``<METRICS_DIR>/<pid>.json`` and ``collect()`` sums every file in the
+    directory, so any worker can serve the aggregate. Files left by exited
+    workers are folded into ``archived.json`` when collected and then
+    removed, which keeps the exported counters monotonic without the
+    directory growing as workers are recycled.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or settings.METRICS_BUCKETS)
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._flushed_at = 0.0
+
+    def add_collector(self, collector):
+        """
+        Register a callable returning ``(counters, gauges)``, each a list of
+        ``(name, labels, value)``, read whenever a snapshot is taken. Counter
+        values are the collector's running totals for this process.
+        """
+        self._collectors.append(collector)
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe_request(self, labels, timing, status_code):
+        total = timing.total
+        self.observe(HISTOGRAMS["total"][0], labels, total)
+        self.observe(HISTOGRAMS["db"][0], labels, timing.db)
+        self.observe(HISTOGRAMS["serialize"][0], labels, timing.serialize)
+        self.observe(HISTOGRAMS["render"][0], labels, timing.render)
+        self.inc(REQUESTS_TOTAL, {**labels, "status": str(status_code)})
+        self.maybe_flush()
+        return total
+
+    def snapshot(self):
+        counters, gauges = [], []
+        for collector in self._collectors:
+            collected_counters, collected_gauges = collector()
+            counters += collected_counters
+            gauges += collected_gauges
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "buckets": list(self.buckets),
+                "histograms": [
+                    [name, list(labels), list(counts), total, count]
+                    for (name, labels), (counts, total, count) in (
+                        self._histograms.items()
+                    )
+                ],
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ]
+                + [
+                    [name, sorted(labels.items()), value]
+                    for name, labels, value in counters
+                ],
+                "gauges": [
+                    [name, sorted(labels.items()), value]
+                    for name, labels, value in gauges
+                ],
+            }
+
+    def maybe_flush(self):
+        if not settings.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if now - self._flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self._flushed_at = now
+            self.flush()
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file and renamed so readers never see a
+        # partial snapshot.
+        descriptor, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    def collect(self):
+        snapshots = [self.snapshot()]
+        directory = settings.METRICS_DIR
+        if directory and os.path.isdir(directory):
+            own = f"{os.getpid()}.json"
+            dead = []
+            for filename in os.listdir(directory):
+                if not filename.endswith(".json") or filename == own:
+                    continue
+                try:
+                    with open(os.path.join(directory, filename)) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if "pid" in snapshot and not pid_alive(snapshot["pid"]):
+                    dead.append(filename)
+                snapshots.append(snapshot)
+            if dead:
+                self.archive(directory, dead)
+        return merge_snapshots(snapshots)
+
+    def archive(self, directory, filenames):
+        """
+        Fold the snapshots of exited workers into ``archived.json`` and delete
+        their files. Gauges are dropped, as they are for any dead process.
+        """
+        with open(os.path.join(directory, ARCHIVE_LOCK), "w") as lock:
+            # Another worker may be archiving the same files.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = [
+                {"buckets": list(self.buckets), "histograms": [], "counters": []}
+            ]
+            archived = []
+            for filename in (ARCHIVE, *filenames):
+                try:
+                    with open(os.path.join(directory, filename)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+                archived.append(filename)
+            if not set(archived) - {ARCHIVE}:
+                return
+            buckets, histograms, counters, _ = merge_snapshots(snapshots)
+            descriptor, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(descriptor, "w") as f:
+                json.dump(
+                    {
+                        "buckets": buckets,
+                        "histograms": [
+                            [name, list(labels), counts, total, count]
+                            for (name, labels), (counts, total, count) in (
+                                histograms.items()
+                            )
+                        ],
+                        "counters": [
+                            [name, list(labels), value]
+                            for (name, labels), value in counters.items()
+                        ],
+                    },
+                    f,
+                )
+            os.replace(path, os.path.join(directory, ARCHIVE))
+            for filename in archived:
+                if filename != ARCHIVE:
+                    os.remove(os.path.join(directory, filename))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._flushed_at = 0.0
+
+
+def merge_snapshots(snapshots):
+    buckets = None
+    histograms = {}
+    counters = {}
+    gauges = {}
+    for index, snapshot in enumerate(snapshots):
+        if buckets is None:
+            buckets = snapshot["buckets"]
+        elif snapshot["buckets"] != buckets:
+            # Written before a bucket layout change; cannot be summed.
+            continue
+        for name, labels, counts, total, count in snapshot["histograms"]:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        if index == 0 or pid_alive(snapshot.get("pid", 0)):
+            for name, labels, value in snapshot.get("gauges", []):
+                key = (name, tuple(tuple(label) for label in labels))
+                gauges[key] = gauges.get(key, 0) + value
+    return buckets or [], histograms, counters, gauges
+
+
+def format_labels(labels):
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def render_prometheus(collected):
+    """Render ``MetricsRegistry.collect()`` in the Prometheus text format."""
+    buckets, histograms, counters, gauges = collected
+    lines = []
+    for name, help_text in HISTOGRAMS.values():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(labels + (("le", repr(float(bound))),))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+    for kind, metrics, values in (
+        ("counter", COUNTERS, counters),
+        ("gauge", GAUGES, gauges),
+    ):
+        for name, help_text in metrics.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,98 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .budgets import QueryBudgetExceeded, QueryRecorder, get_view_budget
+from .metrics import RequestTiming, registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """
+    Checks every request against the query budget declared by its view and
+    logs or raises, depending on ``QUERY_BUDGET_MODE``, with the duplicated
+    SQL fingerprints that usually point at an N+1. Meant for development and
+    tests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.QUERY_BUDGET_MODE
+        if mode == "off":
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+
+        budget = get_view_budget(request)
+        if budget is not None and len(recorder.queries) > budget:
+            message = recorder.report(f"{request.method} {request.path}", budget)
+            if mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Adds a ``Server-Timing`` header splitting each request into database,
+    serialisation, response rendering and total time, and records the same
+    durations in the per-view histograms served by ``/metrics``. Queries that
+    serialisation triggers count towards both. Install it first so that
+    ``total`` covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.request_timing = timing = RequestTiming()
+        token = timing.activate()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.deactivate(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        request.request_timing = timing = RequestTiming()
+        token = timing.activate()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.deactivate(token)
+        return self.finish(request, response, timing)
+
+    def process_template_response(self, request, response):
+        # Runs right before the handler renders DRF and template responses.
+        timing = getattr(request, "request_timing", None)
+        if timing is not None:
+            timing.start_render(response)
+        return response
+
+    def finish(self, request, response, timing):
+        match = request.resolver_match
+        labels = {
+            "view": match.view_name if match is not None else "unmatched",
+            "method": request.method,
+        }
+        total = registry.observe_request(labels, timing, response.status_code)
+        response["Server-Timing"] = (
+            f'db;dur={timing.db * 1000:.3f};desc="{timing.queries} queries", '
+            f"serialize;dur={timing.serialize * 1000:.3f}, "
+            f"render;dur={timing.render * 1000:.3f}, "
+            f"total;dur={total * 1000:.3f}"
+        )
+        return response
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:37
+
+import booking.models
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_table_price'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        # Existing reservations keep a NULL period so they never conflict with
+        # the exclusion constraint; the default only applies to new rows.
+        migrations.AddField(
+            model_name='reservation',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(default=booking.models.default_reservation_period, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('active', True)), expressions=[('table', '='), ('period', '&&')], name='exclude_overlapping_reservations'),
+        ),
+    ]
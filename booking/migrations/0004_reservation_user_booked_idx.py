@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_reservation_period'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', '-booked_at', '-id'], name='reservation_user_booked_idx'),
+        ),
+    ]
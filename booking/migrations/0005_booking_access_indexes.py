@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:48
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('booking', '0004_reservation_user_booked_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('active', True)), fields=['user', '-booked_at', '-id'], name='reservation_user_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('active', True)), fields=['table', 'booked_at'], name='reservation_table_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='table',
+            index=models.Index(fields=['price', 'total_seats', 'id'], name='table_price_seats_idx'),
+        ),
+    ]
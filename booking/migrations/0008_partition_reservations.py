@@ -0,0 +1,197 @@
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# Rebuilds booking_reservation as a table partitioned by month on booked_at.
+# Postgres requires the partition key in the primary key, so it becomes
+# (id, booked_at); ids still come from the same identity sequence. Secondary
+# indexes and foreign keys are recreated under their existing names.
+#
+# An exclusion constraint on a partitioned table must compare the partition
+# key with "=", which would only catch overlaps between reservations booked in
+# the same month. The trigger below enforces the overlap rule across all
+# partitions instead: it serialises writers per table with an advisory lock
+# and raises the same SQLSTATE (23P01) as the constraint did. This is only
+# sound under READ COMMITTED, where the check after the lock sees rows that
+# were committed while waiting for it; under REPEATABLE READ or SERIALIZABLE
+# the snapshot predates them, so the database must keep Django's default
+# isolation level (checked as booking.E002).
+#
+# The copy runs in the migration's single transaction and holds an ACCESS
+# EXCLUSIVE lock on booking_reservation for its whole duration, blocking reads
+# and writes; on a large table run it in a maintenance window.
+PARTITION_SQL = """
+DO $$
+DECLARE
+    index_definitions text[];
+    foreign_keys text[];
+    definition text;
+    month timestamptz;
+    last_month timestamptz := date_trunc('month', now(), 'UTC') + interval '3 months';
+BEGIN
+    SELECT coalesce(array_agg(pg_get_indexdef(i.indexrelid)), '{}')
+      INTO index_definitions
+      FROM pg_index i
+     WHERE i.indrelid = 'booking_reservation'::regclass
+       AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid);
+    SELECT coalesce(array_agg(format(
+               'ALTER TABLE booking_reservation ADD CONSTRAINT %I %s',
+               conname, pg_get_constraintdef(oid))), '{}')
+      INTO foreign_keys
+      FROM pg_constraint
+     WHERE conrelid = 'booking_reservation'::regclass AND contype = 'f';
+
+    CREATE TABLE booking_reservation_partitioned (
+        LIKE booking_reservation
+        INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY
+    ) PARTITION BY RANGE (booked_at);
+    ALTER TABLE booking_reservation_partitioned ADD PRIMARY KEY (id, booked_at);
+
+    month := date_trunc(
+        'month',
+        coalesce((SELECT min(booked_at) FROM booking_reservation), now()),
+        'UTC'
+    );
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF booking_reservation_partitioned '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'booking_reservation_' || to_char(month AT TIME ZONE 'UTC', 'YYYY_MM'),
+            month,
+            month + interval '1 month'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+
+    INSERT INTO booking_reservation_partitioned SELECT * FROM booking_reservation;
+    DROP TABLE booking_reservation;
+    ALTER TABLE booking_reservation_partitioned RENAME TO booking_reservation;
+    ALTER TABLE booking_reservation
+        RENAME CONSTRAINT booking_reservation_partitioned_pkey TO booking_reservation_pkey;
+    ALTER SEQUENCE booking_reservation_partitioned_id_seq
+        RENAME TO booking_reservation_id_seq;
+    PERFORM setval(
+        'booking_reservation_id_seq',
+        coalesce((SELECT max(id) FROM booking_reservation), 0) + 1,
+        false
+    );
+
+    FOREACH definition IN ARRAY index_definitions LOOP
+        EXECUTE definition;
+    END LOOP;
+    FOREACH definition IN ARRAY foreign_keys LOOP
+        EXECUTE definition;
+    END LOOP;
+END $$;
+
+CREATE INDEX reservation_table_period_idx ON booking_reservation
+    USING gist (table_id, period) WHERE active;
+
+CREATE FUNCTION booking_reservation_exclude_overlapping() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.active AND NEW.period IS NOT NULL THEN
+        PERFORM pg_advisory_xact_lock(
+            hashtextextended('booking_reservation:' || NEW.table_id, 0)
+        );
+        IF EXISTS (
+            SELECT 1 FROM booking_reservation
+             WHERE table_id = NEW.table_id
+               AND active
+               AND period && NEW.period
+               AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'conflicting key value violates exclusion constraint '
+                            '"exclude_overlapping_reservations"'
+                USING ERRCODE = 'exclusion_violation',
+                      CONSTRAINT = 'exclude_overlapping_reservations',
+                      TABLE = 'booking_reservation';
+        END IF;
+    END IF;
+    RETURN NEW;
+END $$;
+
+CREATE TRIGGER exclude_overlapping_reservations
+    BEFORE INSERT OR UPDATE OF table_id, period, active ON booking_reservation
+    FOR EACH ROW EXECUTE FUNCTION booking_reservation_exclude_overlapping();
+"""
+
+UNPARTITION_SQL = """
+DO $$
+DECLARE
+    index_definitions text[];
+    foreign_keys text[];
+    definition text;
+BEGIN
+    SELECT coalesce(array_agg(replace(
+               pg_get_indexdef(i.indexrelid), ' ON ONLY ', ' ON ')), '{}')
+      INTO index_definitions
+      FROM pg_index i
+      JOIN pg_class c ON c.oid = i.indexrelid
+     WHERE i.indrelid = 'booking_reservation'::regclass
+       AND c.relname <> 'reservation_table_period_idx'
+       AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid);
+    SELECT coalesce(array_agg(format(
+               'ALTER TABLE booking_reservation ADD CONSTRAINT %I %s',
+               conname, pg_get_constraintdef(oid))), '{}')
+      INTO foreign_keys
+      FROM pg_constraint
+     WHERE conrelid = 'booking_reservation'::regclass
+       AND contype = 'f'
+       AND conparentid = 0;
+
+    CREATE TABLE booking_reservation_unpartitioned (
+        LIKE booking_reservation
+        INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY
+    );
+    ALTER TABLE booking_reservation_unpartitioned ADD PRIMARY KEY (id);
+    INSERT INTO booking_reservation_unpartitioned SELECT * FROM booking_reservation;
+
+    DROP TABLE booking_reservation;
+    DROP FUNCTION booking_reservation_exclude_overlapping();
+    ALTER TABLE booking_reservation_unpartitioned RENAME TO booking_reservation;
+    ALTER TABLE booking_reservation
+        RENAME CONSTRAINT booking_reservation_unpartitioned_pkey TO booking_reservation_pkey;
+    ALTER SEQUENCE booking_reservation_unpartitioned_id_seq
+        RENAME TO booking_reservation_id_seq;
+    PERFORM setval(
+        'booking_reservation_id_seq',
+        coalesce((SELECT max(id) FROM booking_reservation), 0) + 1,
+        false
+    );
+
+    FOREACH definition IN ARRAY index_definitions LOOP
+        EXECUTE definition;
+    END LOOP;
+    FOREACH definition IN ARRAY foreign_keys LOOP
+        EXECUTE definition;
+    END LOOP;
+END $$;
+
+ALTER TABLE booking_reservation ADD CONSTRAINT exclude_overlapping_reservations
+    EXCLUDE USING gist (table_id WITH =, period WITH &&) WHERE (active);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(PARTITION_SQL, UNPARTITION_SQL),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='reservation',
+                    name='exclude_overlapping_reservations',
+                ),
+                migrations.AddIndex(
+                    model_name='reservation',
+                    index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('active', True)), fields=['table', 'period'], name='reservation_table_period_idx'),
+                ),
+            ],
+        ),
+    ]
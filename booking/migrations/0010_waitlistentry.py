@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:57
+
+from django.conf import settings
+import django.contrib.postgres.fields.ranges
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Wakes the waitlist allocator (allocate_waitlist --listen) whenever seats may
+# have come free. Notifications are only delivered on commit, and identical
+# ones raised in the same transaction are delivered once.
+NOTIFY_SQL = """
+CREATE FUNCTION booking_notify_waitlist() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('booking_waitlist', '');
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER notify_waitlist_on_cancel
+    AFTER UPDATE OF active ON booking_reservation
+    FOR EACH ROW WHEN (OLD.active AND NOT NEW.active)
+    EXECUTE FUNCTION booking_notify_waitlist();
+
+CREATE TRIGGER notify_waitlist_on_delete
+    AFTER DELETE ON booking_reservation
+    FOR EACH ROW WHEN (OLD.active)
+    EXECUTE FUNCTION booking_notify_waitlist();
+
+CREATE TRIGGER notify_waitlist_on_table_change
+    AFTER INSERT OR UPDATE OF total_seats ON booking_table
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION booking_notify_waitlist();
+
+CREATE TRIGGER notify_waitlist_on_join
+    AFTER INSERT ON booking_waitlistentry
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION booking_notify_waitlist();
+"""
+
+DROP_NOTIFY_SQL = """
+DROP TRIGGER notify_waitlist_on_join ON booking_waitlistentry;
+DROP TRIGGER notify_waitlist_on_table_change ON booking_table;
+DROP TRIGGER notify_waitlist_on_delete ON booking_reservation;
+DROP TRIGGER notify_waitlist_on_cancel ON booking_reservation;
+DROP FUNCTION booking_notify_waitlist();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('booking', '0009_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number_of_seats', models.PositiveSmallIntegerField()),
+                ('period', django.contrib.postgres.fields.ranges.DateTimeRangeField()),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('allocated', 'Allocated'), ('expired', 'Expired')], default='waiting', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('allocated_at', models.DateTimeField(blank=True, null=True)),
+                ('reservation', models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='booking.reservation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'waitlist entries',
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['-priority', 'created_at', 'id'], name='waitlist_queue_idx'), models.Index(fields=['user', '-id'], name='waitlist_user_idx')],
+            },
+        ),
+        migrations.RunSQL(NOTIFY_SQL, DROP_NOTIFY_SQL),
+    ]
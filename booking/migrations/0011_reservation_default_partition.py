@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# Catches reservations booked in a month that has no partition yet, so a
+# missed manage_reservation_partitions run no longer makes every insert fail.
+# The command moves such rows into their month's partition when it creates it.
+DEFAULT_PARTITION_SQL = """
+CREATE TABLE booking_reservation_default
+    PARTITION OF booking_reservation DEFAULT;
+"""
+
+DROP_DEFAULT_PARTITION_SQL = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM booking_reservation_default) THEN
+        RAISE EXCEPTION 'booking_reservation_default still holds reservations; '
+                        'run manage_reservation_partitions to move them first';
+    END IF;
+END $$;
+DROP TABLE booking_reservation_default;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DEFAULT_PARTITION_SQL, DROP_DEFAULT_PARTITION_SQL),
+    ]
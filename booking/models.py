@@ -1,19 +1,168 @@
-from django.db import models
+from django.db import models, connections, router
+from django.db.models import Exists, OuterRef, Q
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GistIndex
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
+from django.utils import timezone
+
+from .allocation import assign_jointly, periods_overlap
+from .availability import table_index
+from .cache import LRUCache, bump_reservations_version
 
 User = get_user_model()
 
 
+def default_reservation_period():
+    start = timezone.now()
+    return DateTimeTZRange(start, start + settings.DEFAULT_RESERVATION_DURATION)
+
+
 class TableManager(models.Manager):
-    def get_best_available_table(self, number_of_seats):
-        available_tables = self.filter(total_seats__gte=number_of_seats).order_by(
-            "price", "total_seats"
+    def get_best_available_table(self, number_of_seats, period=None):
+        if period is not None:
+            return self.get_best_available_table_for_period(number_of_seats, period)
+
+        # Ignores bookings: a price-only lookup, and the booking path's check
+        # that some table is large enough before it looks for a free one.
+        # Inside a transaction the index may not reflect uncommitted changes,
+        # so fall back to a single ordered query.
+        if connections[self.db].in_atomic_block:
+            best_table = (
+                self.filter(total_seats__gte=number_of_seats)
+                .order_by("price", "total_seats", "pk")
+                .first()
+            )
+        else:
+            best_table = table_index.best_table(number_of_seats, self.all())
+        if best_table is None:
+            raise ValidationError("No available table for this number of seats.")
+        return best_table
+
+    def available_for_period(self, number_of_seats, period):
+        # The NOT EXISTS probe is answered by the GiST index backing the
+        # reservation exclusion constraint.
+        overlapping = Reservation.objects.filter(
+            table=OuterRef("pk"), active=True, period__overlap=period
+        )
+        return (
+            self.filter(total_seats__gte=number_of_seats)
+            .filter(~Exists(overlapping))
+            .order_by("price", "total_seats", "pk")
         )
-        if not available_tables.exists():
+
+    def get_best_available_table_for_period(self, number_of_seats, period):
+        best_table = self.available_for_period(number_of_seats, period).first()
+        if best_table is None:
             raise ValidationError("No available table for this number of seats.")
-        return available_tables.first()
+        return best_table
+
+    def claim_available_table(self, number_of_seats, period):
+        # Must run inside a transaction. Rows locked by concurrent allocations,
+        # including the tables a plan_allocations batch is using, are skipped,
+        # so callers fall through to the next-cheapest table instead of
+        # waiting. Returns None when every candidate is locked.
+        return (
+            self.available_for_period(number_of_seats, period)
+            .select_for_update(skip_locked=True)
+            .first()
+        )
+
+    def get_cost_matrix(self):
+        return table_index.cost_matrix(self.all())
+
+    def get_quotes(self, seat_counts):
+        # Prices only, from the in-process index: existing bookings are not
+        # considered. Odd seat counts are billed as the next even count, as
+        # when booking. Returns (seats, number_of_seats, table, cost) tuples,
+        # with table and cost None when no table is large enough.
+        costs = self.get_cost_matrix()
+        quotes = []
+        for seats in seat_counts:
+            number_of_seats = Reservation.validate_number_of_seats(seats)
+            table, cost = costs.get(number_of_seats, (None, None))
+            quotes.append((seats, number_of_seats, table, cost))
+        return quotes
+
+    def plan_allocations(self, seat_requests, joint=False):
+        # Must run inside a transaction. Loads the candidate tables and the
+        # active reservations overlapping the requested windows and assigns
+        # every (number_of_seats, period) request in memory: greedily in
+        # request order, or with joint=True so as to sell the most seats (see
+        # booking.allocation). Returns one Table or None per request, in
+        # order, with the tables used locked until the transaction ends.
+        if not seat_requests:
+            return []
+
+        db = router.db_for_write(self.model)
+        tables = list(
+            self.using(db)
+            .filter(total_seats__gte=min(seats for seats, _ in seat_requests))
+            .order_by("price", "total_seats", "pk")
+        )
+        envelope = DateTimeTZRange(
+            min(period.lower for _, period in seat_requests),
+            max(period.upper for _, period in seat_requests),
+        )
+        booked = self.get_bookings(db, [table.pk for table in tables], envelope)
+
+        # Only the tables the plan uses are locked, in pk order so concurrent
+        # planners cannot deadlock; single bookings skip them and take the
+        # others. Anything booked on them before the locks were granted shows
+        # up when their bookings are read again, and the plan is redone
+        # around it until every table it uses is locked and up to date.
+        locked = set()
+        while True:
+            assignments = self.assign(
+                seat_requests,
+                tables,
+                {pk: list(periods) for pk, periods in booked.items()},
+                joint,
+            )
+            planned = {table.pk for table in assignments if table} - locked
+            if not planned:
+                return assignments
+            list(
+                self.using(db)
+                .filter(pk__in=planned)
+                .order_by("pk")
+                .select_for_update()
+                .values_list("pk", flat=True)
+            )
+            locked |= planned
+            booked.update(self.get_bookings(db, list(planned), envelope))
+
+    @staticmethod
+    def get_bookings(db, table_ids, envelope):
+        bookings = {pk: [] for pk in table_ids}
+        for table_id, period in (
+            Reservation.objects.using(db)
+            .filter(table__in=table_ids, active=True, period__overlap=envelope)
+            .values_list("table_id", "period")
+        ):
+            bookings[table_id].append(period)
+        return bookings
+
+    @staticmethod
+    def assign(seat_requests, tables, booked, joint):
+        if joint:
+            return assign_jointly(seat_requests, tables, booked)
+
+        assignments = []
+        for number_of_seats, period in seat_requests:
+            for table in tables:
+                if table.total_seats >= number_of_seats and not any(
+                    periods_overlap(period, other) for other in booked[table.pk]
+                ):
+                    booked[table.pk].append(period)
+                    assignments.append(table)
+                    break
+            else:
+                assignments.append(None)
+        return assignments
 
 
 class Table(models.Model):
@@ -25,6 +174,13 @@ class Table(models.Model):
 
     objects = TableManager()
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["price", "total_seats", "id"], name="table_price_seats_idx"
+            ),
+        ]
+
     def clean(self):
         if self.total_seats < 4 or self.total_seats > 10:
             raise ValidationError("Total seats must be between 4 and 10.")
@@ -42,7 +198,37 @@ class Table(models.Model):
         return f"Table {self.table_number} ({self.total_seats} seats)"
 
 
+class ReservationManager(models.Manager):
+    def cancel_for_user(self, user, ids):
+        # Single conditional UPDATE; returns the ids that were actually
+        # cancelled, i.e. owned by the user and still active.
+        connection = connections[router.db_for_write(self.model)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {connection.ops.quote_name(self.model._meta.db_table)} "
+                "SET active = false "
+                "WHERE id = ANY(%s) AND user_id = %s AND active "
+                "RETURNING id",
+                [list(ids), user.pk],
+            )
+            cancelled = [row[0] for row in cursor.fetchall()]
+        if cancelled:
+            bump_reservations_version(user.pk)
+        return cancelled
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips post_save, so bump the owners' versions here.
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_reservations_version(*(obj.user_id for obj in objs))
+        return objs
+
+
 class Reservation(models.Model):
+    # id is the primary key here, but the table is partitioned by month and
+    # Postgres requires the partition key in the primary key, so the
+    # database's key is (id, booked_at) and nothing enforces that ids are
+    # unique on their own. They stay unique only because every id comes from
+    # the table's identity sequence; never insert new rows with explicit ids.
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="reservations"
     )
@@ -52,8 +238,45 @@ class Reservation(models.Model):
     number_of_seats = models.PositiveSmallIntegerField()
     cost = models.DecimalField(max_digits=10, decimal_places=2)
     booked_at = models.DateTimeField(auto_now_add=True)
+    period = DateTimeRangeField(null=True, default=default_reservation_period)
     active = models.BooleanField(default=True)
 
+    objects = ReservationManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-booked_at", "-id"],
+                name="reservation_user_booked_idx",
+            ),
+            models.Index(
+                fields=["user", "-booked_at", "-id"],
+                condition=Q(active=True),
+                name="reservation_user_active_idx",
+            ),
+            models.Index(
+                fields=["table", "booked_at"],
+                condition=Q(active=True),
+                name="reservation_table_active_idx",
+            ),
+            # Serves the exclude_overlapping_reservations trigger. The table is
+            # partitioned by month on booked_at (migration 0008), which rules
+            # out an exclusion constraint spanning partitions.
+            GistIndex(
+                fields=["table", "period"],
+                condition=Q(active=True),
+                name="reservation_table_period_idx",
+            ),
+        ]
+
+    @property
+    def start_at(self):
+        return self.period.lower if self.period else None
+
+    @property
+    def end_at(self):
+        return self.period.upper if self.period else None
+
     @classmethod
     def validate_number_of_seats(cls, number_of_seats):
         if number_of_seats < 1:
@@ -64,3 +287,181 @@ class Reservation(models.Model):
 
     def __str__(self):
         return f"Reservation by {self.user.username} for {self.number_of_seats} seats at Table {self.table.table_number}"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A reservation request that found no free table, queued until the
+    waitlist allocator can place it. Entries are served by descending
+    ``priority``, then first come, first served.
+    """
+
+    WAITING = "waiting"
+    ALLOCATED = "allocated"
+    EXPIRED = "expired"
+    STATUS_CHOICES = [
+        (WAITING, "Waiting"),
+        (ALLOCATED, "Allocated"),
+        (EXPIRED, "Expired"),
+    ]
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="waitlist_entries"
+    )
+    number_of_seats = models.PositiveSmallIntegerField()
+    period = DateTimeRangeField()
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    # No foreign key in the database: booking_reservation is partitioned and
+    # its primary key there is (id, booked_at).
+    reservation = models.OneToOneField(
+        Reservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="waitlist_entry",
+        db_constraint=False,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    allocated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "waitlist entries"
+        indexes = [
+            models.Index(
+                fields=["-priority", "created_at", "id"],
+                condition=Q(status="waiting"),
+                name="waitlist_queue_idx",
+            ),
+            models.Index(fields=["user", "-id"], name="waitlist_user_idx"),
+        ]
+
+    @property
+    def start_at(self):
+        return self.period.lower
+
+    @property
+    def end_at(self):
+        return self.period.upper
+
+    def __str__(self):
+        return f"Waitlist entry by {self.user_id} for {self.number_of_seats} seats"
+
+
+class RevokedTokenManager(models.Manager):
+    def purge_expired(self):
+        return self.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = RevokedTokenManager()
+
+    def __str__(self):
+        return self.jti
+
+
+class IdempotencyKeyManager(models.Manager):
+    def claim(self, user, key, fingerprint, locked_until, expires_at):
+        # Single statement: inserts the key, or takes over a row that has
+        # expired or whose request was abandoned. Returns the claimed record,
+        # or None when another request holds the key or has answered it.
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} AS k (user_id, key, fingerprint, "
+                "locked_until, expires_at, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s) "
+                "ON CONFLICT (user_id, key) DO UPDATE SET "
+                "fingerprint = EXCLUDED.fingerprint, status_code = NULL, "
+                "response = NULL, locked_until = EXCLUDED.locked_until, "
+                "expires_at = EXCLUDED.expires_at "
+                "WHERE k.expires_at <= %s "
+                "OR (k.status_code IS NULL AND k.locked_until <= %s) "
+                "RETURNING id",
+                [user.pk, key, fingerprint, locked_until, expires_at, now, now, now],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return self.model(
+            pk=row[0],
+            user_id=user.pk,
+            key=key,
+            fingerprint=fingerprint,
+            locked_until=locked_until,
+            expires_at=expires_at,
+        )
+
+    def purge_expired(self):
+        return self.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of an unsafe request sent with an ``Idempotency-Key``
+    header. ``status_code`` stays empty while the first request is running.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = IdempotencyKeyManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_key_user_key_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+user_cache = LRUCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TIMEOUT)
+
+
+class ClaimsUser(User):
+    """
+    A user built from access-token claims without touching the database.
+
+    Fields the token does not carry are deferred; the first access loads them
+    all at once from ``user_cache``.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, **values):
+        field_names = [
+            field.attname
+            for field in cls._meta.concrete_fields
+            if field.attname in values
+        ]
+        return cls.from_db(
+            router.db_for_read(cls),
+            field_names,
+            [values[name] for name in field_names],
+        )
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        deferred = self.get_deferred_fields()
+        if not fields or not deferred.issuperset(fields):
+            return super().refresh_from_db(using, fields, **kwargs)
+
+        user = user_cache.get(self.pk, lambda: User.objects.get(pk=self.pk))
+        for name in deferred:
+            setattr(self, name, getattr(user, name))
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    # Row estimate from the planner (pg statistics) instead of COUNT(*).
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination keyed on a unique tuple of columns.
+
+    Each page continues strictly after the last row of the previous one using a
+    keyset predicate served by a matching index, so the cost of a page does not
+    depend on how deep the client has scrolled. ``?count=estimate`` adds an
+    approximate total.
+    """
+
+    ordering = ("-id",)
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor."
+    count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.count = estimate_count(queryset)
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.count = await sync_to_async(estimate_count)(queryset)
+        page_queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_keyset_filter(self, position):
+        fields = [name.lstrip("-") for name in self.ordering]
+        lookups = ["lt" if name.startswith("-") else "gt" for name in self.ordering]
+
+        keyset = Q()
+        for i, (field, lookup) in enumerate(zip(fields, lookups)):
+            condition = Q(**{f"{field}__{lookup}": position[i]})
+            for previous in range(i):
+                condition &= Q(**{fields[previous]: position[previous]})
+            keyset |= condition
+
+        # The redundant bound on the leading column lets Postgres turn the
+        # disjunction into a single index range scan.
+        inclusive = {"lt": "lte", "gt": "gte"}[lookups[0]]
+        leading = Q(**{f"{fields[0]}__{inclusive}": position[0]})
+        return leading & keyset
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (
+            TypeError,
+            ValueError,
+            UnicodeEncodeError,
+            binascii.Error,
+            DjangoValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row):
+        values = []
+        for name in self.ordering:
+            name = name.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            # Keep full microsecond precision; DjangoJSONEncoder truncates it.
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        encoded = json.dumps(values).encode()
+        return base64.urlsafe_b64encode(encoded).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_data(self, data):
+        paginated = OrderedDict([("next", self.get_next_link())])
+        if self.count is not None:
+            paginated["count"] = self.count
+        paginated["results"] = data
+        return paginated
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        properties = {
+            "next": {"type": "string", "nullable": True, "format": "uri"},
+            "count": {"type": "integer"},
+            "results": schema,
+        }
+        return {"type": "object", "required": ["results"], "properties": properties}
+
+
+class ReservationPagination(KeysetPagination):
+    ordering = ("-booked_at", "-id")
+
+
+class TablePagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class WaitlistPagination(KeysetPagination):
+    ordering = ("-id",)
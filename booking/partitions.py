@@ -0,0 +1,152 @@
+import gzip
+import os
+import re
+from datetime import datetime, timezone
+
+from django.db import connection, transaction
+
+from .cache import bump_reservations_version
+from .models import Reservation, WaitlistEntry
+
+PARTITION_NAME = re.compile(r"^booking_reservation_(\d{4})_(\d{2})$")
+
+
+def month_start(value):
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f"{Reservation._meta.db_table}_{month:%Y_%m}"
+
+
+def default_partition_name():
+    return f"{Reservation._meta.db_table}_default"
+
+
+def list_partitions():
+    """Return ``{month: name}`` for the monthly partitions attached now."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = %s::regclass",
+            [Reservation._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            year, month = map(int, match.groups())
+            partitions[datetime(year, month, 1, tzinfo=timezone.utc)] = name
+    return partitions
+
+
+def default_partition_months():
+    """Return the months of the reservations in the default partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', booked_at, 'UTC') "
+            f"FROM {connection.ops.quote_name(default_partition_name())}"
+        )
+        return {month_start(row[0]) for row in cursor.fetchall()}
+
+
+def create_partition(month):
+    """
+    Create the partition for ``month``, moving the month's reservations out
+    of the default partition into it. Returns how many were moved.
+    """
+    quote = connection.ops.quote_name
+    name = quote(partition_name(month))
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Postgres refuses to create the partition while the default one
+            # holds rows that belong in it.
+            cursor.execute(
+                "CREATE TEMPORARY TABLE booking_reservation_moving "
+                f"(LIKE {quote(Reservation._meta.db_table)})"
+            )
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {quote(default_partition_name())} "
+                "WHERE booked_at >= %s AND booked_at < %s RETURNING *) "
+                "INSERT INTO booking_reservation_moving SELECT * FROM moved",
+                bounds,
+            )
+            moved = cursor.rowcount
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} "
+                f"PARTITION OF {quote(Reservation._meta.db_table)} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+            cursor.execute(
+                f"INSERT INTO {name} SELECT * FROM booking_reservation_moving"
+            )
+            cursor.execute("DROP TABLE booking_reservation_moving")
+    return moved
+
+
+def has_upcoming_reservations(name, now):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {connection.ops.quote_name(name)} "
+            "WHERE active AND upper(period) > %s)",
+            [now],
+        )
+        return cursor.fetchone()[0]
+
+
+def archive_partition(name, schema, export_dir=None):
+    """
+    Detach a monthly partition so the hot indexes no longer cover it, then
+    either move it into ``schema`` without its secondary indexes or, with
+    ``export_dir``, write it to ``<name>.csv.gz`` there and drop it. The
+    owners' cached lists and ETags are invalidated, and waitlist entries stop
+    pointing at the archived reservations.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT DISTINCT user_id FROM {quote(name)}")
+            user_ids = [user_id for (user_id,) in cursor.fetchall()]
+            # Waitlist entries reference reservations without a foreign key,
+            # so nothing else would clear them.
+            cursor.execute(
+                f"UPDATE {quote(WaitlistEntry._meta.db_table)} "
+                "SET reservation_id = NULL "
+                f"WHERE reservation_id IN (SELECT id FROM {quote(name)})"
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(Reservation._meta.db_table)} "
+                f"DETACH PARTITION {quote(name)}"
+            )
+            bump_reservations_version(*user_ids)
+            if export_dir is not None:
+                path = os.path.join(export_dir, f"{name}.csv.gz")
+                with gzip.open(path, "wt", newline="") as f:
+                    cursor.copy_expert(
+                        f"COPY {quote(name)} TO STDOUT WITH (FORMAT csv, HEADER)", f
+                    )
+                # Deferred foreign key checks queued for the partition's rows
+                # in this transaction would block the drop.
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                cursor.execute(f"DROP TABLE {quote(name)}")
+                return path
+
+            cursor.execute(
+                "SELECT indexrelid::regclass::text FROM pg_index "
+                "WHERE indrelid = %s::regclass AND NOT indisprimary",
+                [name],
+            )
+            for (index,) in cursor.fetchall():
+                cursor.execute(f"DROP INDEX {index}")
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(schema)}")
+            cursor.execute(f"ALTER TABLE {quote(name)} SET SCHEMA {quote(schema)}")
+            return f"{schema}.{name}"
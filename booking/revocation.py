@@ -0,0 +1,137 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .budgets import unbudgeted
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: no false negatives, and false
+    positives at roughly ``error_rate`` while it holds at most ``capacity``
+    items.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        # Double hashing: k probes derived from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        # Counts only items that were not in the filter yet, so adding the
+        # same id again does not use up capacity.
+        added = False
+        for position in self.positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
+
+
+class RevocationList:
+    """
+    Per-process view of the revoked token ids stored in ``RevokedToken``.
+
+    Lookups only hash the id against a Bloom filter; the database is queried
+    to confirm a positive hit and, every ``TOKEN_REVOCATION_SYNC_INTERVAL``
+    seconds, to pull ids revoked since the last sync (by any process). The
+    filter is rebuilt from the unexpired rows once it holds more ids than it
+    was sized for.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._bloom = None
+        self._synced_at = None
+        self._next_sync = 0
+
+    def sync_due(self):
+        return self._bloom is None or time.monotonic() >= self._next_sync
+
+    def maybe_sync(self):
+        if self.sync_due():
+            with self._lock:
+                if self.sync_due():
+                    self.sync()
+
+    def sync(self):
+        with self._lock, unbudgeted():
+            now = timezone.now()
+            if self._bloom is None or self._bloom.count > self._bloom.capacity:
+                rows = RevokedToken.objects.filter(expires_at__gt=now)
+                bloom = BloomFilter(
+                    max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, rows.count() * 2),
+                    settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+                )
+            else:
+                # Overlap the window so rows from transactions that committed
+                # after the previous sync started are not missed.
+                overlap = timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_OVERLAP)
+                rows = RevokedToken.objects.filter(
+                    revoked_at__gte=self._synced_at - overlap
+                )
+                bloom = self._bloom
+            for jti in rows.values_list("jti", flat=True).iterator():
+                bloom.add(jti)
+            self._bloom = bloom
+            self._synced_at = now
+            self._next_sync = time.monotonic() + settings.TOKEN_REVOCATION_SYNC_INTERVAL
+
+    def candidates(self, jtis):
+        return [jti for jti in jtis if jti and jti in self._bloom]
+
+    def is_revoked(self, *jtis):
+        self.maybe_sync()
+        candidates = self.candidates(jtis)
+        return bool(candidates) and (
+            RevokedToken.objects.filter(jti__in=candidates).exists()
+        )
+
+    async def ais_revoked(self, *jtis):
+        if self.sync_due():
+            await sync_to_async(self.maybe_sync)()
+        candidates = self.candidates(jtis)
+        return bool(candidates) and (
+            await RevokedToken.objects.filter(jti__in=candidates).aexists()
+        )
+
+    def revoke(self, jti, expires_at):
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True
+        )
+        if self._bloom is not None:
+            with self._lock:
+                self._bloom.add(jti)
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .budgets import unbudgeted
+from .cache import TABLES_PRIMARY_PIN_KEY, primary_pin_key
+
+_replica_reads = ContextVar("booking_replica_reads", default=False)
+
+# Streaming replicas that have replayed everything they received report no
+# lag, however long ago the primary last committed.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class ReplicaHealth:
+    """
+    Tracks which replicas are within ``REPLICA_MAX_LAG`` seconds of the
+    primary. Each process measures a replica at most once every
+    ``REPLICA_LAG_CHECK_INTERVAL`` seconds, from whichever request first needs
+    it after the interval; an unreachable replica counts as lagging.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def lag(self, alias):
+        with unbudgeted(), connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0] or 0)
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        checked_at, healthy = self._checked.get(alias, (None, False))
+        if checked_at is not None and now - checked_at < (
+            settings.REPLICA_LAG_CHECK_INTERVAL
+        ):
+            return healthy
+
+        with self._lock:
+            checked_at, healthy = self._checked.get(alias, (None, False))
+            if checked_at is None or now - checked_at >= (
+                settings.REPLICA_LAG_CHECK_INTERVAL
+            ):
+                try:
+                    healthy = self.lag(alias) <= settings.REPLICA_MAX_LAG
+                except DatabaseError:
+                    healthy = False
+                self._checked[alias] = (now, healthy)
+        return healthy
+
+    def choose(self):
+        replicas = [
+            alias for alias in settings.DATABASE_REPLICAS if self.is_healthy(alias)
+        ]
+        return random.choice(replicas) if replicas else None
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def get_pin_keys(user_id):
+    return [TABLES_PRIMARY_PIN_KEY, primary_pin_key(user_id)]
+
+
+def use_replicas(user_id):
+    """
+    Let the reads of the current context go to a replica, unless the user's
+    reservations or the table set changed within ``READ_YOUR_WRITES_WINDOW``.
+    Returns a token for ``stop_using_replicas`` or None.
+    """
+    if not settings.DATABASE_REPLICAS or cache.get_many(get_pin_keys(user_id)):
+        return None
+    return _replica_reads.set(True)
+
+
+async def ause_replicas(user_id):
+    if not settings.DATABASE_REPLICAS or await cache.aget_many(get_pin_keys(user_id)):
+        return None
+    return _replica_reads.set(True)
+
+
+def stop_using_replicas(token):
+    if token is not None:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Routes reads to a healthy replica inside a ``use_replicas`` context and
+    everything else, including reads inside a transaction on the primary, to
+    the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica_health.choose() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Instances loaded from a replica would otherwise be saved back to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -1,14 +1,54 @@
-from rest_framework import serializers
-from .models import Reservation, Table
+from decimal import Decimal
 
+from django.conf import settings
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from .authentication import ClaimsRefreshToken
+from .metrics import measure
+from .models import Reservation, Table, WaitlistEntry, default_reservation_period
 
-class TableSerializer(serializers.ModelSerializer):
+
+def pop_period(attrs):
+    # Replaces start_at/end_at with a period when either was given.
+    start_at = attrs.pop("start_at", None)
+    end_at = attrs.pop("end_at", None)
+    if start_at is None and end_at is None:
+        return attrs
+
+    if start_at is None:
+        start_at = timezone.now()
+    if end_at is None:
+        end_at = start_at + settings.DEFAULT_RESERVATION_DURATION
+    if end_at <= start_at:
+        raise serializers.ValidationError("end_at must be after start_at.")
+
+    attrs["period"] = DateTimeTZRange(start_at, end_at)
+    return attrs
+
+
+class TimedSerializerMixin:
+    # Charged to the request's "serialize" phase in Server-Timing and /metrics.
+    def to_representation(self, instance):
+        with measure("serialize"):
+            return super().to_representation(instance)
+
+
+class TableSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Table
         fields = "__all__"
 
 
-class ReservationListSerializer(serializers.ModelSerializer):
+class ReservationListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    start_at = serializers.DateTimeField(read_only=True)
+    end_at = serializers.DateTimeField(read_only=True)
+
     class Meta:
         model = Reservation
         fields = [
@@ -18,14 +58,181 @@ class ReservationListSerializer(serializers.ModelSerializer):
             "number_of_seats",
             "cost",
             "booked_at",
+            "start_at",
+            "end_at",
             "active",
         ]
 
+    # Columns read by the values() fast path, see build_row_serializer().
+    value_fields = [
+        "id",
+        "user_id",
+        "table_id",
+        "number_of_seats",
+        "cost",
+        "booked_at",
+        "period",
+        "active",
+    ]
+
+    @classmethod
+    def supports_fast_path(cls):
+        return (
+            api_settings.DATETIME_FORMAT.lower() == ISO_8601
+            and api_settings.COERCE_DECIMAL_TO_STRING
+        )
+
+    @classmethod
+    def build_row_serializer(cls):
+        """
+        Return a function turning a ``values(*value_fields)`` row into the same
+        dict ``ReservationListSerializer`` would produce for the model instance.
+        """
+        current_timezone = timezone.get_current_timezone()
+        cost_field = Reservation._meta.get_field("cost")
+        cost_exponent = Decimal(1).scaleb(-cost_field.decimal_places)
+
+        def datetime_repr(value):
+            if not value:
+                return None
+            value = value.astimezone(current_timezone).isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+
+        def serialize_row(row):
+            period = row["period"]
+            return {
+                "id": row["id"],
+                "user": row["user_id"],
+                "table": row["table_id"],
+                "number_of_seats": row["number_of_seats"],
+                "cost": "{:f}".format(row["cost"].quantize(cost_exponent)),
+                "booked_at": datetime_repr(row["booked_at"]),
+                "start_at": datetime_repr(period.lower) if period else None,
+                "end_at": datetime_repr(period.upper) if period else None,
+                "active": row["active"],
+            }
 
-class ReservationCreateSerializer(serializers.ModelSerializer):
+        return serialize_row
+
+
+class ReservationCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     table = TableSerializer(read_only=True)
+    start_at = serializers.DateTimeField(required=False)
+    end_at = serializers.DateTimeField(required=False)
 
     class Meta:
         model = Reservation
-        fields = ["number_of_seats", "cost", "table"]
+        fields = ["number_of_seats", "cost", "table", "start_at", "end_at"]
+
+    def validate(self, attrs):
+        return pop_period(attrs)
+
+
+class ReservationUpdateSerializer(ReservationCreateSerializer):
+    # Moving a booking needs a table that is free for the new window, which
+    # only allocation can find; cancel and book again instead.
+    start_at = serializers.DateTimeField(read_only=True)
+    end_at = serializers.DateTimeField(read_only=True)
+
+
+class WaitlistEntrySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    start_at = serializers.DateTimeField(required=False)
+    end_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            "id",
+            "number_of_seats",
+            "start_at",
+            "end_at",
+            "priority",
+            "status",
+            "reservation",
+            "created_at",
+            "allocated_at",
+        ]
+        read_only_fields = [
+            "priority",
+            "status",
+            "reservation",
+            "created_at",
+            "allocated_at",
+        ]
+        extra_kwargs = {"number_of_seats": {"min_value": 1}}
+
+    def validate_number_of_seats(self, value):
+        # An entry no table can ever seat would only wait until it expires.
+        number_of_seats = Reservation.validate_number_of_seats(value)
+        if number_of_seats not in Table.objects.get_cost_matrix():
+            raise serializers.ValidationError("No table has this many seats.")
+        return value
+
+    def validate(self, attrs):
+        attrs = pop_period(attrs)
+        attrs.setdefault("period", default_reservation_period())
+        return attrs
+
+
+class ReservationBulkCancelSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RESERVATION_BULK_MAX_SIZE,
+    )
+
+
+class ReservationExportSerializer(serializers.Serializer):
+    booked_after = serializers.DateTimeField(required=False)
+    booked_before = serializers.DateTimeField(required=False)
+    active = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        booked_after = attrs.get("booked_after")
+        booked_before = attrs.get("booked_before")
+        if booked_after and booked_before and booked_before <= booked_after:
+            raise serializers.ValidationError(
+                "booked_before must be after booked_after."
+            )
+        return attrs
+
+
+class CommaSeparatedListField(serializers.ListField):
+    """Accepts ``?name=1,2,3`` as well as repeated ``?name=1&name=2``."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = [data]
+        if isinstance(data, list):
+            data = [part for item in data for part in str(item).split(",")]
+        return super().to_internal_value(data)
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    seats = CommaSeparatedListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.QUOTE_MAX_SEAT_COUNTS,
+    )
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        # Checks the signature and expiry; TokenError becomes a 401 in the view.
+        return {"token": ClaimsRefreshToken(attrs["refresh"])}
+
+    def save(self):
+        self.validated_data["token"].revoke()
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import DELETED_AUTH_STAMP, get_auth_stamp, store_auth_stamp
+from .cache import (
+    TABLES_PRIMARY_PIN_KEY,
+    TABLES_VERSION_KEY,
+    bump_reservations_version,
+    bump_version,
+    pin_to_primary,
+)
+from .models import ClaimsUser, Reservation, Table, User, user_cache
+
+
+@receiver([post_save, post_delete], sender=Table)
+def bump_tables_version(sender, **kwargs):
+    # Invalidates the availability index and cached table responses, which
+    # are rebuilt from the primary until the replicas catch up. Pinned first,
+    # so a reader that sees the new version also sees the pin.
+    def bump():
+        pin_to_primary(TABLES_PRIMARY_PIN_KEY)
+        bump_version(TABLES_VERSION_KEY)
+
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=Reservation)
+def bump_user_reservations_version(sender, instance, **kwargs):
+    bump_reservations_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+def refresh_auth_stamp(sender, instance, **kwargs):
+    user_id = instance.pk
+    user_cache.delete(user_id)
+    stamp = get_auth_stamp(instance)
+    transaction.on_commit(lambda: store_auth_stamp(user_id, stamp))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=ClaimsUser)
+def revoke_auth_stamp(sender, instance, **kwargs):
+    user_id = instance.pk
+    user_cache.delete(user_id)
+    transaction.on_commit(lambda: store_auth_stamp(user_id, DELETED_AUTH_STAMP))
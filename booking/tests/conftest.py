@@ -1,6 +1,12 @@
 import pytest
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from booking.metrics import registry
+from booking.models import user_cache
+from booking.revocation import revocation_list
+from booking.routers import replica_health
 
 User = get_user_model()
 
@@ -22,3 +28,32 @@ def create_user(db):
         return user
 
     return _create_user
+
+
+@pytest.fixture
+def user(create_user):
+    return create_user("test@example.com", "password", "testuser")
+
+
+@pytest.fixture
+def auth_client(api_client, user):
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    user_cache.clear()
+    revocation_list.reset()
+    registry.reset()
+    replica_health.reset()
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    settings.MIDDLEWARE = [
+        *settings.MIDDLEWARE,
+        "booking.middleware.QueryBudgetMiddleware",
+    ]
+    settings.QUERY_BUDGET_MODE = "raise"
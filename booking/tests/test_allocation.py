@@ -0,0 +1,163 @@
+import itertools
+import random
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from psycopg2.extras import DateTimeTZRange
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from booking.allocation import assign_jointly, periods_overlap
+from booking.models import Reservation, Table
+
+START = datetime(2026, 1, 1, 18, tzinfo=timezone.utc)
+
+
+def period(start_hours=0, hours=2):
+    start = START + timedelta(hours=start_hours)
+    return DateTimeTZRange(start, start + timedelta(hours=hours))
+
+
+def tables(*seat_counts):
+    return [
+        SimpleNamespace(pk=pk, total_seats=seats)
+        for pk, seats in enumerate(seat_counts, 1)
+    ]
+
+
+def assign(seat_requests, candidates):
+    return [
+        table and table.pk
+        for table in assign_jointly(seat_requests, candidates, defaultdict(list))
+    ]
+
+
+def test_places_a_later_large_party():
+    # Seating the first party at the cheapest table would leave none for the
+    # second.
+    assert assign([(2, period()), (10, period())], tables(10, 4)) == [2, 1]
+
+
+def test_prefers_more_seats_then_earlier_requests():
+    assert assign([(2, period()), (6, period())], tables(6)) == [None, 1]
+    assert assign([(4, period()), (4, period())], tables(4)) == [1, None]
+
+
+def test_gives_the_cheapest_tables_to_the_earliest_requests():
+    assert assign([(4, period()), (4, period())], tables(4, 4, 4)) == [1, 2]
+
+
+def test_requests_that_do_not_overlap_share_a_table():
+    seat_requests = [(4, period(2)), (4, period(0)), (4, period(1))]
+
+    assert assign(seat_requests, tables(4, 4)) == [1, 1, 2]
+
+
+def test_respects_existing_bookings():
+    booked = defaultdict(list, {1: [period(1)]})
+
+    assignments = assign_jointly([(2, period())], tables(4, 4), booked)
+
+    assert [table.pk for table in assignments] == [2]
+    assert booked[2] == [period()]
+
+
+def objective(seat_requests, assignments):
+    # The lexicographic objective from booking.allocation, to be maximised.
+    count = len(seat_requests)
+    placed = [i for i, pk in enumerate(assignments) if pk is not None]
+    return (
+        sum(seat_requests[i][0] for i in placed),
+        sum(count - i for i in placed),
+        -sum(assignments[i] for i in placed),
+        -sum(assignments[i] * (count - i) for i in placed),
+    )
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_exhaustive_search(seed):
+    rng = random.Random(seed)
+    candidates = tables(*(rng.choice([2, 4, 6, 8]) for _ in range(rng.randint(1, 4))))
+    seat_requests = [
+        (rng.choice([2, 4, 6, 8]), period(rng.choice([0, 0.5, 1]), 2))
+        for _ in range(rng.randint(1, 5))
+    ]
+
+    def feasible(assignments):
+        for i, pk in enumerate(assignments):
+            if pk is None:
+                continue
+            if candidates[pk - 1].total_seats < seat_requests[i][0]:
+                return False
+            for j in range(i):
+                if assignments[j] == pk and periods_overlap(
+                    seat_requests[i][1], seat_requests[j][1]
+                ):
+                    return False
+        return True
+
+    choices = [None] + [table.pk for table in candidates]
+    best = max(
+        objective(seat_requests, assignments)
+        for assignments in itertools.product(choices, repeat=len(seat_requests))
+        if feasible(assignments)
+    )
+
+    assert objective(seat_requests, assign(seat_requests, candidates)) == best
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_bookings_are_allocated_together(create_user, settings):
+    settings.RESERVATION_BATCH_WINDOW_MS = 500
+    Table.objects.create(table_number=1, total_seats=10, price=10)
+    Table.objects.create(table_number=2, total_seats=4, price=40)
+    user = create_user("test@example.com", "password", "testuser")
+    barrier = threading.Barrier(2)
+    responses = {}
+
+    def book(number_of_seats):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        barrier.wait()
+        try:
+            responses[number_of_seats] = client.post(
+                reverse("reservation-list"),
+                {"number_of_seats": number_of_seats},
+                format="json",
+            )
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=book, args=(seats,)) for seats in (2, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert responses[2].status_code == status.HTTP_201_CREATED
+    assert responses[10].status_code == status.HTTP_201_CREATED
+    assert responses[2].data["table"]["table_number"] == 2
+    assert responses[10].data["table"]["table_number"] == 1
+    assert Reservation.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batched_booking_without_a_free_table_is_rejected(create_user, settings):
+    settings.RESERVATION_BATCH_WINDOW_MS = 1
+    Table.objects.create(table_number=1, total_seats=4)
+    client = APIClient()
+    client.force_authenticate(user=create_user("a@example.com", "password", "a"))
+    url = reverse("reservation-list")
+
+    assert client.post(url, {"number_of_seats": 4}, format="json").status_code == (
+        status.HTTP_201_CREATED
+    )
+    response = client.post(url, {"number_of_seats": 4}, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert Reservation.objects.count() == 1
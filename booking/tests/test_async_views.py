@@ -0,0 +1,91 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from booking.models import Reservation, Table
+
+
+@pytest.fixture
+def authenticate(api_client):
+    def _authenticate(user):
+        token = RefreshToken.for_user(user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return api_client
+
+    return _authenticate
+
+
+@pytest.mark.django_db
+def test_async_reservation_list_matches_sync(create_user, authenticate):
+    user = create_user("test@example.com", "password", "testuser")
+    client = authenticate(user)
+    table = Table.objects.create(table_number=1, total_seats=6)
+    for _ in range(3):
+        Reservation.objects.create(
+            user=user, table=table, number_of_seats=4, cost=50, period=None
+        )
+
+    sync_response = client.get(reverse("reservation-list"), {"page_size": 2})
+    async_response = client.get(reverse("async-reservation-list"), {"page_size": 2})
+
+    assert async_response.status_code == status.HTTP_200_OK
+    assert async_response.json()["results"] == sync_response.json()["results"]
+    assert async_response.json()["next"] is not None
+
+    next_page = client.get(async_response.json()["next"])
+    assert len(next_page.json()["results"]) == 1
+
+
+@pytest.mark.django_db
+def test_async_table_endpoints_match_sync(create_user, authenticate):
+    user = create_user("test@example.com", "password", "testuser")
+    client = authenticate(user)
+    table = Table.objects.create(table_number=1, total_seats=6)
+
+    sync_list = client.get(reverse("table-list")).json()
+    async_list = client.get(reverse("async-table-list")).json()
+    assert async_list == sync_list
+
+    url = reverse("async-table-detail", args=[table.id])
+    assert (
+        client.get(url).json()
+        == client.get(reverse("table-detail", args=[table.id])).json()
+    )
+
+
+@pytest.mark.django_db
+def test_async_reservation_detail(create_user, authenticate):
+    owner = create_user("owner@example.com", "password", "owner")
+    other = create_user("other@example.com", "password", "other")
+    table = Table.objects.create(table_number=1, total_seats=6)
+    reservation = Reservation.objects.create(
+        user=owner, table=table, number_of_seats=4, cost=50
+    )
+    url = reverse("async-reservation-detail", args=[reservation.id])
+
+    response = authenticate(owner).get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == reservation.id
+
+    response = authenticate(other).get(url)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "authorization, expected_detail",
+    [
+        (None, "Authentication credentials were not provided."),
+        ("Bearer not-a-token", "Given token not valid for any token type"),
+    ],
+)
+def test_async_views_require_authentication(api_client, authorization, expected_detail):
+    if authorization:
+        api_client.credentials(HTTP_AUTHORIZATION=authorization)
+
+    response = api_client.get(reverse("async-reservation-list"))
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == expected_detail
+    assert "WWW-Authenticate" in response
@@ -1,7 +1,11 @@
 import pytest
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
-from booking.models import Table, Reservation
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from booking.authentication import AUTH_STAMP_CLAIM, ClaimsRefreshToken
+from booking.models import ClaimsUser, Table, Reservation
+from booking.revocation import revocation_list
 
 
 @pytest.mark.django_db
@@ -210,3 +214,116 @@ def test_reservation_cancel(
     else:
         assert "message" in response.data
         assert response.data["message"] == "Reservation cancelled successfully."
+
+
+@pytest.fixture
+def claims_token():
+    def _claims_token(user):
+        return str(ClaimsRefreshToken.for_user(user).access_token)
+
+    return _claims_token
+
+
+@pytest.mark.django_db
+def test_claims_token_skips_user_query(
+    api_client, create_user, claims_token, django_assert_num_queries
+):
+    user = create_user("test@example.com", "password", "testuser")
+    url = reverse("reservation-list")
+    revocation_list.sync()
+
+    legacy_token = str(RefreshToken.for_user(user).access_token)
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {legacy_token}")
+    with django_assert_num_queries(2):
+        assert api_client.get(url).status_code == status.HTTP_200_OK
+
+    # The first request stores the user's stamp, which later ones reuse.
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {claims_token(user)}")
+    with django_assert_num_queries(2):
+        assert api_client.get(url).status_code == status.HTTP_200_OK
+    with django_assert_num_queries(1):
+        assert api_client.get(url).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_token_obtain_pair_issues_claims(api_client, create_user):
+    create_user("test@example.com", "password", "testuser")
+
+    response = api_client.post(
+        reverse("token_obtain_pair"),
+        {"username": "testuser", "password": "password"},
+    )
+
+    token = AccessToken(response.data["access"])
+    assert token["username"] == "testuser"
+    assert token["is_active"] is True
+    assert AUTH_STAMP_CLAIM in token
+
+
+@pytest.mark.django_db
+def test_claims_token_revoked_on_password_change(
+    api_client, create_user, claims_token, django_capture_on_commit_callbacks
+):
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {claims_token(user)}")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.set_password("new-password")
+        user.save()
+
+    response = api_client.get(reverse("reservation-list"))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.data["detail"] == "Token has been revoked."
+
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {claims_token(user)}")
+    assert api_client.get(reverse("reservation-list")).status_code == 200
+
+
+@pytest.mark.django_db
+def test_claims_token_revoked_without_a_cached_stamp(
+    api_client, create_user, claims_token
+):
+    # As on a worker that never saw the password change.
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {claims_token(user)}")
+    user.set_password("new-password")
+    user.save()
+    cache.clear()
+
+    response = api_client.get(reverse("reservation-list"))
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.data["detail"] == "Token has been revoked."
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url_name", ["reservation-list", "async-reservation-list"])
+def test_claims_token_of_deleted_user_is_revoked(
+    api_client, create_user, claims_token, url_name
+):
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {claims_token(user)}")
+    user.delete()
+    cache.clear()
+
+    response = api_client.get(reverse(url_name))
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_claims_user_loads_deferred_fields_once(create_user, django_assert_num_queries):
+    user = create_user("test@example.com", "password", "testuser")
+
+    claims_user = ClaimsUser.from_claims(
+        id=user.pk, username="testuser", is_active=True
+    )
+    with django_assert_num_queries(1):
+        assert claims_user.email == "test@example.com"
+        assert claims_user.date_joined == user.date_joined
+
+    claims_user = ClaimsUser.from_claims(
+        id=user.pk, username="testuser", is_active=True
+    )
+    with django_assert_num_queries(0):
+        assert claims_user.email == "test@example.com"
@@ -0,0 +1,123 @@
+import logging
+
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import ResolverMatch, reverse
+from rest_framework import status
+
+from booking.authentication import ClaimsRefreshToken
+from booking.budgets import QueryBudgetExceeded, fingerprint, query_budget
+from booking.cache import auth_stamp_key
+from booking.middleware import QueryBudgetMiddleware
+from booking.models import Reservation, Table
+from booking.views import ReservationViewSet
+
+
+def test_fingerprint_collapses_in_lists_and_whitespace():
+    sql = 'SELECT "id"\n  FROM "booking_table" WHERE "id" IN (%s, %s, %s)'
+    assert fingerprint(sql) == 'SELECT "id" FROM "booking_table" WHERE "id" IN (...)'
+
+
+@query_budget(1)
+def n_plus_one_view(request):
+    for table in Table.objects.all():
+        Table.objects.get(pk=table.pk)
+    return HttpResponse()
+
+
+def run_middleware(settings, mode):
+    settings.QUERY_BUDGET_MODE = mode
+    request = RequestFactory().get("/tables/")
+
+    def get_response(request):
+        request.resolver_match = ResolverMatch(n_plus_one_view, (), {})
+        return n_plus_one_view(request)
+
+    return QueryBudgetMiddleware(get_response)(request)
+
+
+@pytest.mark.django_db
+def test_budget_exceeded_reports_duplicates(settings):
+    for number in range(1, 4):
+        Table.objects.create(table_number=number, total_seats=4)
+
+    with pytest.raises(QueryBudgetExceeded) as exc_info:
+        run_middleware(settings, "raise")
+
+    message = str(exc_info.value)
+    assert message.startswith("GET /tables/ ran 4 queries (budget 1).")
+    assert '3x SELECT "booking_table"' in message
+
+
+@pytest.mark.django_db
+def test_budget_exceeded_is_logged(settings, caplog):
+    Table.objects.create(table_number=1, total_seats=4)
+    Table.objects.create(table_number=2, total_seats=4)
+
+    with caplog.at_level(logging.WARNING, logger="booking.middleware"):
+        response = run_middleware(settings, "log")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "ran 3 queries (budget 1)" in caplog.text
+
+
+@pytest.mark.django_db
+def test_reservation_endpoints_stay_within_budget_at_volume(api_client, create_user):
+    # Query budgets are enforced by the autouse fixture in conftest.py; this
+    # exercises the hot endpoints with enough rows for an N+1 to show.
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.force_authenticate(user=user)
+    tables = [
+        Table.objects.create(table_number=number, total_seats=10)
+        for number in range(1, 6)
+    ]
+    reservations = [
+        Reservation.objects.create(
+            user=user, table=tables[i % 5], number_of_seats=4, cost=40, period=None
+        )
+        for i in range(25)
+    ]
+
+    response = api_client.get(reverse("reservation-list"), {"count": "estimate"})
+    assert response.status_code == status.HTTP_200_OK
+
+    response = api_client.post(
+        reverse("reservation-bulk"), [{"number_of_seats": 4}] * 5, format="json"
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = api_client.post(
+        reverse("reservation-bulk-cancel"),
+        {"ids": [r.id for r in reservations]},
+        format="json",
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = api_client.post(reverse("reservation-cancel", args=[reservations[0].id]))
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_budgets_count_authentication_and_idempotency_keys(
+    api_client, create_user, monkeypatch
+):
+    user = create_user("test@example.com", "password", "testuser")
+    table = Table.objects.create(table_number=1, total_seats=4)
+    reservation = Reservation.objects.create(
+        user=user, table=table, number_of_seats=4, cost=40, period=None
+    )
+    token = ClaimsRefreshToken.for_user(user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    cache.delete(auth_stamp_key(user.pk))
+    monkeypatch.setitem(ReservationViewSet.query_budgets, "cancel", 0)
+
+    with pytest.raises(QueryBudgetExceeded) as exc_info:
+        api_client.post(
+            reverse("reservation-cancel", args=[reservation.pk]),
+            HTTP_IDEMPOTENCY_KEY="cancel-1",
+        )
+
+    # The auth stamp, the key claim, the cancellation and the stored response.
+    assert "ran 4 queries (budget 0)" in str(exc_info.value)
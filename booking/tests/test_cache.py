@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from django.core.cache import cache
+from psycopg2.extensions import ISOLATION_LEVEL_SERIALIZABLE
+
+from booking.cache import bump_version, get_or_build, get_version
+from booking.checks import check_isolation_level, check_shared_cache
+
+
+def test_bump_version_changes_token():
+    version = get_version("test:version")
+    assert get_version("test:version") == version
+
+    bump_version("test:version")
+    assert get_version("test:version") != version
+
+
+def test_get_or_build_builds_once():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return "value"
+
+    assert get_or_build("test:key", build, timeout=60) == "value"
+    assert get_or_build("test:key", build, timeout=60) == "value"
+    assert len(calls) == 1
+
+
+def test_get_or_build_waits_for_inflight_build():
+    cache.add("test:key:lock", 1, 5)
+    timer = threading.Timer(0.05, cache.set, args=("test:key", "built", 60))
+    timer.start()
+
+    def build():
+        pytest.fail("Concurrent misses should not rebuild.")
+
+    try:
+        assert get_or_build("test:key", build, timeout=60) == "built"
+    finally:
+        timer.join()
+
+
+def test_process_local_cache_is_an_error_when_a_shared_one_is_required(settings):
+    settings.CACHE_REQUIRE_SHARED = True
+
+    assert [error.id for error in check_shared_cache(None)] == ["booking.E001"]
+
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}
+    }
+    assert check_shared_cache(None) == []
+
+
+def test_isolation_levels_other_than_read_committed_are_an_error(settings):
+    assert check_isolation_level(None) == []
+
+    settings.DATABASES = {
+        **settings.DATABASES,
+        "default": {
+            **settings.DATABASES["default"],
+            "OPTIONS": {"isolation_level": ISOLATION_LEVEL_SERIALIZABLE},
+        },
+    }
+    assert [error.id for error in check_isolation_level(None)] == ["booking.E002"]
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from booking.models import Reservation, Table
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_explain_booking_queries(create_user, capsys):
+    user = create_user("test@example.com", "password", "testuser")
+    table = Table.objects.create(table_number=1, total_seats=6)
+    Reservation.objects.create(user=user, table=table, number_of_seats=4, cost=50)
+
+    call_command("explain_booking_queries", "--user", str(user.pk))
+
+    output = capsys.readouterr().out
+    assert "ReservationViewSet.list:" in output
+    assert "TableManager.available_for_period:" in output
+
+
+@pytest.mark.django_db
+def test_explain_booking_queries_fails_on_seq_scan(create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    Table.objects.create(table_number=1, total_seats=6)
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_indexscan = off")
+        cursor.execute("SET enable_bitmapscan = off")
+
+    with pytest.raises(CommandError, match="Sequential scans found"):
+        call_command(
+            "explain_booking_queries", "--user", str(user.pk), "--fail-on-seq-scan"
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_async_reads(create_user, capsys):
+    user = create_user("test@example.com", "password", "testuser")
+    table = Table.objects.create(table_number=1, total_seats=6)
+    Reservation.objects.create(user=user, table=table, number_of_seats=4, cost=50)
+
+    call_command("benchmark_async_reads", "--requests", "4", "--concurrency", "2")
+
+    output = capsys.readouterr().out
+    assert output.startswith("sync: ")
+    assert "\nasync: " in output
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_login(capsys):
+    call_command(
+        "benchmark_login",
+        "--requests",
+        "2",
+        "--concurrency",
+        "2",
+        "--iterations",
+        "1000",
+        "2000",
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("1000 iterations: ")
+    assert lines[1].startswith("2000 iterations: ")
+    assert not User.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_booking(settings, tmp_path, capsys):
+    settings.PASSWORD_HASH_ITERATIONS = 1000
+    baseline = tmp_path / "baseline.json"
+    options = [
+        "--users",
+        "2",
+        "--reservations-per-user",
+        "3",
+        "--requests",
+        "4",
+        "--concurrency",
+        "2",
+    ]
+
+    call_command("benchmark_booking", *options, "--save-baseline", str(baseline))
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(":")[0] for line in lines] == [
+        "token",
+        "list",
+        "create",
+        "cancel",
+    ]
+    assert all("queries/request" in line for line in lines)
+    assert not any("unexpected responses" in line for line in lines)
+    assert Reservation.objects.count() == 6
+    assert set(json.loads(baseline.read_text())["results"]) == {
+        "token",
+        "list",
+        "create",
+        "cancel",
+    }
+
+    call_command(
+        "benchmark_booking",
+        *options,
+        "--scenarios",
+        "list",
+        "--compare",
+        str(baseline),
+        "--max-regression",
+        "100",
+    )
+    assert "list vs baseline: " in capsys.readouterr().out
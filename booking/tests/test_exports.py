@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from booking.authentication import ClaimsRefreshToken
+from booking.models import Reservation, Table
+
+
+@pytest.fixture
+def staff_client(api_client, create_user):
+    user = create_user("finance@example.com", "password", "finance")
+    user.is_staff = True
+    user.save()
+    # Claims tokens leave is_staff to be loaded when the permission check
+    # reads it.
+    token = ClaimsRefreshToken.for_user(user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return api_client
+
+
+@pytest.fixture
+def reservations(create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    table = Table.objects.create(table_number=1, total_seats=6)
+    created = [
+        Reservation.objects.create(
+            user=user, table=table, number_of_seats=4, cost=50, period=None
+        )
+        for _ in range(5)
+    ]
+    Reservation.objects.filter(pk=created[0].pk).update(active=False)
+    Reservation.objects.filter(pk=created[1].pk).update(
+        booked_at=timezone.now() - timedelta(days=2)
+    )
+    return created
+
+
+def export(client, **params):
+    response = client.get(reverse("reservation-export"), params)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.streaming
+    chunks = [chunk.decode() for chunk in response.streaming_content]
+    return response, chunks
+
+
+def test_export_streams_ndjson_in_chunks(staff_client, reservations, settings):
+    settings.RESERVATION_EXPORT_CHUNK_SIZE = 2
+
+    response, chunks = export(staff_client)
+
+    assert response["Content-Type"] == "application/x-ndjson"
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert sorted(row["id"] for row in rows) == [r.pk for r in reservations]
+    assert set(rows[0]) == {
+        "id",
+        "user",
+        "table",
+        "number_of_seats",
+        "cost",
+        "booked_at",
+        "start_at",
+        "end_at",
+        "active",
+    }
+
+
+def test_export_csv_with_filters(staff_client, reservations):
+    response, chunks = export(
+        staff_client,
+        format="csv",
+        active="true",
+        booked_after=(timezone.now() - timedelta(days=1)).isoformat(),
+    )
+
+    assert response["Content-Type"] == "text/csv"
+    assert response["Content-Disposition"] == (
+        'attachment; filename="reservations.csv"'
+    )
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert sorted(int(row["id"]) for row in rows) == [r.pk for r in reservations[2:]]
+    assert {row["active"] for row in rows} == {"True"}
+    assert rows[0]["cost"] == "50.00"
+
+
+def test_export_of_nothing_is_just_the_header(staff_client, db):
+    _, chunks = export(staff_client, format="csv")
+
+    assert "".join(chunks).strip() == ",".join(
+        ["id", "user", "table", "number_of_seats", "cost"]
+        + ["booked_at", "start_at", "end_at", "active"]
+    )
+
+
+def test_export_rejects_an_empty_range(staff_client, db):
+    now = timezone.now()
+    response = staff_client.get(
+        reverse("reservation-export"),
+        {"booked_after": now.isoformat(), "booked_before": now.isoformat()},
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_requires_staff(api_client, create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.force_authenticate(user)
+
+    response = api_client.get(reverse("reservation-export"))
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_export_command(reservations, tmp_path):
+    output = tmp_path / "reservations.ndjson"
+
+    call_command("export_reservations", "--inactive", "--output", str(output))
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["id"] for row in rows] == [reservations[0].pk]
+
+    stdout = io.StringIO()
+    call_command(
+        "export_reservations", "--format", "csv", "--chunk-size", "2", stdout=stdout
+    )
+    assert len(stdout.getvalue().splitlines()) == len(reservations) + 1
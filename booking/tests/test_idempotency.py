@@ -0,0 +1,195 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from booking.idempotency import IdempotencyKeyInUse, claim
+from booking.models import IdempotencyKey, Reservation, Table
+
+
+def create_reservation(client, key, number_of_seats=4):
+    return client.post(
+        reverse("reservation-list"),
+        {"number_of_seats": number_of_seats},
+        format="json",
+        HTTP_IDEMPOTENCY_KEY=key,
+    )
+
+
+@pytest.mark.django_db
+def test_retried_create_replays_the_stored_response(auth_client):
+    Table.objects.create(table_number=1, total_seats=6)
+
+    first = create_reservation(auth_client, "retry-1")
+    second = create_reservation(auth_client, "retry-1")
+
+    assert first.status_code == second.status_code == status.HTTP_201_CREATED
+    assert second.data == first.data
+    assert "Idempotent-Replayed" not in first
+    assert second["Idempotent-Replayed"] == "true"
+    assert Reservation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_keys_are_scoped_per_user(auth_client, api_client, create_user):
+    Table.objects.create(table_number=1, total_seats=6)
+    Table.objects.create(table_number=2, total_seats=6)
+    create_reservation(auth_client, "shared")
+
+    other_client = type(api_client)()
+    other_client.force_authenticate(create_user("o@example.com", "password", "o"))
+    response = create_reservation(other_client, "shared")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert "Idempotent-Replayed" not in response
+    assert Reservation.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_key_reused_for_a_different_request_is_rejected(auth_client):
+    Table.objects.create(table_number=1, total_seats=6)
+    create_reservation(auth_client, "retry-1")
+
+    response = create_reservation(auth_client, "retry-1", number_of_seats=2)
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert Reservation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_failed_requests_are_not_stored(auth_client):
+    assert create_reservation(auth_client, "retry-1").status_code == (
+        status.HTTP_400_BAD_REQUEST
+    )
+    Table.objects.create(table_number=1, total_seats=6)
+
+    response = create_reservation(auth_client, "retry-1")
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert Reservation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_cancel_is_idempotent(auth_client, user):
+    table = Table.objects.create(table_number=1, total_seats=6)
+    reservation = Reservation.objects.create(
+        user=user, table=table, number_of_seats=4, cost=50, period=None
+    )
+    url = reverse("reservation-bulk-cancel")
+
+    responses = [
+        auth_client.post(
+            url, {"ids": [reservation.pk]}, format="json", HTTP_IDEMPOTENCY_KEY="c"
+        )
+        for _ in range(2)
+    ]
+
+    assert [response.data["cancelled"] for response in responses] == [
+        [reservation.pk],
+        [reservation.pk],
+    ]
+
+
+def pending_key(user, key, locked_for):
+    now = timezone.now()
+    return IdempotencyKey.objects.create(
+        user=user,
+        key=key,
+        fingerprint="",
+        locked_until=now + timedelta(seconds=locked_for),
+        expires_at=now + timedelta(hours=1),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_retry_waits_for_the_first_result(auth_client, user, settings):
+    settings.IDEMPOTENCY_POLL_INTERVAL = 0.01
+    Table.objects.create(table_number=1, total_seats=6)
+    # Claim the key the way the first request would, then let that request
+    # finish while the retry is waiting.
+    first = create_reservation(auth_client, "in-flight")
+    record = IdempotencyKey.objects.get(key="in-flight")
+    IdempotencyKey.objects.filter(pk=record.pk).update(status_code=None, response=None)
+
+    def finish_first_request():
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status_code=first.status_code, response=first.data
+        )
+        connection.close()
+
+    finish = threading.Timer(0.1, finish_first_request)
+    finish.start()
+
+    try:
+        response = create_reservation(auth_client, "in-flight")
+    finally:
+        finish.join()
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response["Idempotent-Replayed"] == "true"
+    assert Reservation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_retry_gives_up_on_a_key_that_stays_in_flight(auth_client, user, settings):
+    settings.IDEMPOTENCY_LOCK_TIMEOUT = 0.05
+    settings.IDEMPOTENCY_POLL_INTERVAL = 0.01
+    Table.objects.create(table_number=1, total_seats=6)
+    record = pending_key(user, "in-flight", locked_for=60)
+    create_reservation(auth_client, "other")
+    record.fingerprint = IdempotencyKey.objects.get(key="other").fingerprint
+    record.save()
+
+    response = create_reservation(auth_client, "in-flight")
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert Reservation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_slow_request_is_not_taken_over_when_retries_give_up(user, settings):
+    settings.IDEMPOTENCY_LOCK_TIMEOUT = 0.05
+    settings.IDEMPOTENCY_POLL_INTERVAL = 0.01
+    record, claimed = claim(user, "slow", "fingerprint")
+    assert claimed
+
+    # Still running after the retry's wait, but far from being abandoned.
+    time.sleep(0.1)
+    with pytest.raises(IdempotencyKeyInUse):
+        claim(user, "slow", "fingerprint")
+
+    assert IdempotencyKey.objects.get(pk=record.pk).locked_until == (
+        record.locked_until
+    )
+
+
+@pytest.mark.django_db
+def test_abandoned_and_expired_keys_can_be_claimed_again(auth_client, user):
+    Table.objects.create(table_number=1, total_seats=6)
+    Table.objects.create(table_number=2, total_seats=6)
+    Table.objects.create(table_number=3, total_seats=6)
+    pending_key(user, "abandoned", locked_for=-1)
+    create_reservation(auth_client, "expired")
+    IdempotencyKey.objects.filter(key="expired").update(expires_at=timezone.now())
+
+    abandoned = create_reservation(auth_client, "abandoned")
+    response = create_reservation(auth_client, "expired")
+
+    assert abandoned.status_code == response.status_code == status.HTTP_201_CREATED
+    assert "Idempotent-Replayed" not in response
+    assert Reservation.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_purge_expired_idempotency_keys(user):
+    pending_key(user, "expired", locked_for=0)
+    IdempotencyKey.objects.filter(key="expired").update(expires_at=timezone.now())
+    pending_key(user, "active", locked_for=0)
+
+    assert IdempotencyKey.objects.purge_expired() == 1
+    assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["active"]
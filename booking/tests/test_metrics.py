@@ -0,0 +1,204 @@
+import json
+import re
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from booking.metrics import MetricsRegistry, RequestTiming, render_prometheus
+from booking.models import Reservation, Table
+
+
+@pytest.fixture
+def authenticated_client(api_client, create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    token = RefreshToken.for_user(user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    api_client.user = user
+    return api_client
+
+
+def parse_server_timing(header):
+    return {
+        name: float(duration)
+        for name, duration in re.findall(r"(\w+);dur=([\d.]+)", header)
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url_name", ["reservation-list", "async-reservation-list"])
+def test_server_timing_header(authenticated_client, url_name):
+    table = Table.objects.create(table_number=1, total_seats=6)
+    Reservation.objects.create(
+        user=authenticated_client.user,
+        table=table,
+        number_of_seats=4,
+        cost=50,
+        period=None,
+    )
+
+    response = authenticated_client.get(reverse(url_name))
+
+    assert response.status_code == status.HTTP_200_OK
+    header = response["Server-Timing"]
+    timings = parse_server_timing(header)
+    assert set(timings) == {"db", "serialize", "render", "total"}
+    assert timings["serialize"] > 0
+    assert timings["total"] >= timings["db"] + timings["render"]
+    assert timings["total"] >= timings["serialize"] + timings["render"]
+    queries = int(re.search(r'desc="(\d+) queries"', header).group(1))
+    assert queries >= 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_reports_view_histograms(authenticated_client):
+    authenticated_client.get(reverse("table-list"))
+    authenticated_client.get(reverse("table-list"))
+
+    response = authenticated_client.get(reverse("metrics"))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = response.content.decode()
+    labels = 'method="GET",view="table-list"'
+    assert "# TYPE booking_request_duration_seconds histogram" in body
+    assert f'booking_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in body
+    assert f"booking_request_db_duration_seconds_count{{{labels}}} 2" in body
+    assert f"booking_request_render_duration_seconds_count{{{labels}}} 2" in body
+    assert f"booking_request_serialize_duration_seconds_count{{{labels}}} 2" in body
+    assert (
+        'booking_requests_total{method="GET",status="200",view="table-list"} 2' in body
+    )
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_requires_configured_token(api_client, settings):
+    settings.METRICS_TOKEN = "secret"
+
+    assert api_client.get(reverse("metrics")).status_code == 401
+    response = api_client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_limited_to_allowed_addresses_and_staff(
+    api_client, create_user
+):
+    url = reverse("metrics")
+    response = api_client.get(url, REMOTE_ADDR="203.0.113.7")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    api_client.force_login(create_user("a@example.com", "password", "a"))
+    response = api_client.get(url, REMOTE_ADDR="203.0.113.7")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    staff = create_user("b@example.com", "password", "b")
+    staff.is_staff = True
+    staff.save()
+    api_client.force_login(staff)
+    response = api_client.get(url, REMOTE_ADDR="203.0.113.7")
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_collect_aggregates_worker_files(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    labels = {"view": "table-list", "method": "GET"}
+
+    worker = MetricsRegistry(buckets=(0.1, 1))
+    timing = RequestTiming()
+    worker.observe_request(labels, timing, 200)
+    worker.flush()
+    # Pretend the snapshot was written by another process.
+    (tmp_path / "worker.json").write_text(next(tmp_path.glob("*.json")).read_text())
+
+    current = MetricsRegistry(buckets=(0.1, 1))
+    current.observe("booking_request_duration_seconds", labels, 0.5)
+    current.flush()
+
+    buckets, histograms, counters, _ = current.collect()
+    key = (
+        "booking_request_duration_seconds",
+        (("method", "GET"), ("view", "table-list")),
+    )
+    counts, total, count = histograms[key]
+    assert buckets == [0.1, 1]
+    assert count == 2
+    assert counts == [1, 1]
+    assert total >= 0.5
+    assert list(counters.values()) == [1]
+
+    body = render_prometheus((buckets, histograms, counters, {}))
+    assert (
+        'booking_request_duration_seconds_bucket{method="GET",view="table-list",'
+        'le="0.1"} 1' in body
+    )
+    assert (
+        'booking_request_duration_seconds_bucket{method="GET",view="table-list",'
+        'le="1.0"} 2' in body
+    )
+
+
+def test_collect_skips_unreadable_and_mismatched_files(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    (tmp_path / "broken.json").write_text("{")
+    (tmp_path / "old.json").write_text(
+        json.dumps(
+            {
+                "buckets": [5],
+                "histograms": [["booking_request_duration_seconds", [], [1], 1.0, 1]],
+                "counters": [],
+            }
+        )
+    )
+
+    buckets, histograms, counters, _ = MetricsRegistry(buckets=(0.1, 1)).collect()
+
+    assert buckets == [0.1, 1]
+    assert histograms == {}
+    assert counters == {}
+
+
+def test_collect_archives_files_of_exited_workers(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    labels = {"view": "table-list", "method": "GET"}
+
+    worker = MetricsRegistry(buckets=(0.1, 1))
+    worker.observe_request(labels, RequestTiming(), 200)
+    worker.inc("booking_db_pool_checkouts_total", {})
+    snapshot = worker.snapshot()
+    # No process can have this pid.
+    snapshot["pid"] = 2**22 + 1
+    snapshot["gauges"] = [["booking_db_pool_waiting", [], 3]]
+    (tmp_path / "exited.json").write_text(json.dumps(snapshot))
+
+    current = MetricsRegistry(buckets=(0.1, 1))
+    first = current.collect()
+    assert not (tmp_path / "exited.json").exists()
+    assert (tmp_path / "archived.json").exists()
+
+    second = current.collect()
+    assert second == first
+    _, histograms, counters, gauges = second
+    assert counters[("booking_db_pool_checkouts_total", ())] == 1
+    assert (
+        counters[
+            (
+                "booking_requests_total",
+                (("method", "GET"), ("status", "200"), ("view", "table-list")),
+            )
+        ]
+        == 1
+    )
+    key = (
+        "booking_request_duration_seconds",
+        (("method", "GET"), ("view", "table-list")),
+    )
+    assert histograms[key][2] == 1
+    assert gauges == {}
+
+    # Later exits are added to the archive rather than replacing it.
+    (tmp_path / "exited.json").write_text(json.dumps(snapshot))
+    _, _, counters, _ = current.collect()
+    assert counters[("booking_db_pool_checkouts_total", ())] == 2
+    assert not (tmp_path / "exited.json").exists()
@@ -1,5 +1,10 @@
+from datetime import timedelta
+
 import pytest
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
 from booking.models import Reservation, Table
 
 
@@ -83,3 +88,73 @@ def test_table_seat_validation(
             table.full_clean()
         except ValidationError:
             pytest.fail("ValidationError raised unexpectedly!")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_best_available_table_uses_index(django_assert_num_queries):
+    Table.objects.create(table_number=1, total_seats=4, price=100)
+    cheap = Table.objects.create(table_number=2, total_seats=6, price=80)
+    Table.objects.create(table_number=3, total_seats=10, price=60)
+
+    assert Table.objects.get_best_available_table(4).table_number == 3
+    with django_assert_num_queries(0):
+        assert Table.objects.get_best_available_table(2).table_number == 3
+        assert Table.objects.get_best_available_table(10).table_number == 3
+
+    cheap.price = 50
+    cheap.save()
+    assert Table.objects.get_best_available_table(4).table_number == 2
+    assert Table.objects.get_best_available_table(8).table_number == 3
+
+    Table.objects.filter(table_number=3).delete()
+    with pytest.raises(ValidationError):
+        Table.objects.get_best_available_table(8)
+
+
+@pytest.mark.django_db
+def test_get_best_available_table_for_period(create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    cheap = Table.objects.create(table_number=1, total_seats=6, price=80)
+    Table.objects.create(table_number=2, total_seats=6, price=90)
+
+    start = timezone.now()
+    period = DateTimeTZRange(start, start + timedelta(hours=2))
+    reservation = Reservation.objects.create(
+        user=user, table=cheap, number_of_seats=4, cost=50, period=period
+    )
+
+    overlapping = DateTimeTZRange(
+        start + timedelta(hours=1), start + timedelta(hours=3)
+    )
+    later = DateTimeTZRange(start + timedelta(hours=2), start + timedelta(hours=4))
+    assert Table.objects.get_best_available_table(4, overlapping).table_number == 2
+    assert Table.objects.get_best_available_table(4, later).table_number == 1
+
+    reservation.active = False
+    reservation.save()
+    assert Table.objects.get_best_available_table(4, overlapping).table_number == 1
+
+
+@pytest.mark.django_db
+def test_overlapping_active_reservations_are_rejected(create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    table = Table.objects.create(table_number=1, total_seats=6)
+
+    start = timezone.now()
+    Reservation.objects.create(
+        user=user,
+        table=table,
+        number_of_seats=4,
+        cost=50,
+        period=DateTimeTZRange(start, start + timedelta(hours=2)),
+    )
+    with pytest.raises(IntegrityError):
+        Reservation.objects.create(
+            user=user,
+            table=table,
+            number_of_seats=2,
+            cost=25,
+            period=DateTimeTZRange(
+                start + timedelta(hours=1), start + timedelta(hours=3)
+            ),
+        )
@@ -0,0 +1,178 @@
+import csv
+import gzip
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
+
+from booking.cache import get_version, reservations_version_key
+from booking.models import Reservation, Table, WaitlistEntry
+from booking.partitions import (
+    add_months,
+    create_partition,
+    default_partition_months,
+    list_partitions,
+    month_start,
+    partition_name,
+)
+
+
+@pytest.fixture
+def table(db):
+    return Table.objects.create(table_number=1, total_seats=6)
+
+
+@pytest.fixture
+def book(create_user, table):
+    user = create_user("test@example.com", "password", "testuser")
+
+    def _book(booked_months_ago=0, period=None):
+        reservation = Reservation.objects.create(
+            user=user, table=table, number_of_seats=4, cost=50, period=period
+        )
+        if booked_months_ago:
+            month = add_months(month_start(timezone.now()), -booked_months_ago)
+            create_partition(month)
+            Reservation.objects.filter(pk=reservation.pk).update(
+                booked_at=month + timedelta(days=1)
+            )
+        return reservation
+
+    return _book
+
+
+def run(**options):
+    out = StringIO()
+    call_command("manage_reservation_partitions", stdout=out, **options)
+    return out.getvalue()
+
+
+def table_exists(name):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        return cursor.fetchone()[0] is not None
+
+
+def test_migration_creates_monthly_partitions_ahead(db):
+    current = month_start(timezone.now())
+
+    assert set(list_partitions()) >= {add_months(current, i) for i in range(4)}
+
+
+def test_command_creates_missing_partitions(db):
+    current = month_start(timezone.now())
+
+    output = run(ahead=5, retain=0)
+
+    assert f"Created {partition_name(add_months(current, 5))}." in output
+    assert add_months(current, 5) in list_partitions()
+    assert "Created" not in run(ahead=5, retain=0)
+
+
+def test_overlaps_are_rejected_across_partitions(book):
+    start = timezone.now() + timedelta(days=1)
+    book(booked_months_ago=2, period=DateTimeTZRange(start, start + timedelta(hours=2)))
+
+    with pytest.raises(IntegrityError):
+        book(
+            period=DateTimeTZRange(
+                start + timedelta(hours=1), start + timedelta(hours=3)
+            )
+        )
+
+
+def test_command_archives_old_partitions_to_schema(book):
+    old = book(booked_months_ago=14)
+    recent = book()
+    name = partition_name(add_months(month_start(timezone.now()), -14))
+
+    output = run(ahead=0, retain=12, archive_schema="booking_archive")
+
+    assert f"Archived {name} to booking_archive.{name}." in output
+    assert list(Reservation.objects.values_list("pk", flat=True)) == [recent.pk]
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT id FROM booking_archive.{name}")
+        assert cursor.fetchall() == [(old.pk,)]
+        cursor.execute(
+            "SELECT count(*) FROM pg_index WHERE indrelid = %s::regclass",
+            [f"booking_archive.{name}"],
+        )
+        assert cursor.fetchone()[0] == 1
+
+
+def test_command_exports_old_partitions(book, tmp_path):
+    old = book(booked_months_ago=14)
+    name = partition_name(add_months(month_start(timezone.now()), -14))
+
+    run(ahead=0, retain=12, export_dir=str(tmp_path))
+
+    with gzip.open(tmp_path / f"{name}.csv.gz", "rt") as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row["id"]) for row in rows] == [old.pk]
+    assert not table_exists(name)
+
+
+def test_command_keeps_partitions_with_upcoming_reservations(book):
+    start = timezone.now() + timedelta(days=30)
+    book(
+        booked_months_ago=14, period=DateTimeTZRange(start, start + timedelta(hours=2))
+    )
+    name = partition_name(add_months(month_start(timezone.now()), -14))
+
+    output = run(ahead=0, retain=12)
+
+    assert f"Kept {name}: it has upcoming reservations." in output
+    assert Reservation.objects.count() == 1
+
+
+def test_command_moves_reservations_out_of_the_default_partition(book):
+    # As if the command had not run for long enough that a reservation was
+    # booked in a month without a partition.
+    month = add_months(month_start(timezone.now()), 20)
+    reservation = book()
+    Reservation.objects.filter(pk=reservation.pk).update(
+        booked_at=month + timedelta(days=1)
+    )
+    assert default_partition_months() == {month}
+
+    output = run(ahead=0, retain=0)
+
+    assert (
+        f"Created {partition_name(month)} and moved 1 reservations into it." in output
+    )
+    assert default_partition_months() == set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT tableoid::regclass::text FROM booking_reservation WHERE id = %s",
+            [reservation.pk],
+        )
+        assert cursor.fetchone()[0] == partition_name(month)
+
+
+@pytest.mark.parametrize("export", [False, True])
+def test_archiving_invalidates_lists_and_detaches_waitlist_entries(
+    book, tmp_path, django_capture_on_commit_callbacks, export
+):
+    start = timezone.now() - timedelta(days=400)
+    period = DateTimeTZRange(start, start + timedelta(hours=2))
+    old = book(booked_months_ago=14, period=period)
+    entry = WaitlistEntry.objects.create(
+        user=old.user,
+        number_of_seats=4,
+        period=period,
+        status=WaitlistEntry.ALLOCATED,
+        reservation=old,
+    )
+    version = get_version(reservations_version_key(old.user_id))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        run(ahead=0, retain=12, export_dir=str(tmp_path) if export else None)
+
+    assert get_version(reservations_version_key(old.user_id)) != version
+    entry.refresh_from_db()
+    assert entry.reservation_id is None
+    assert entry.status == WaitlistEntry.ALLOCATED
@@ -0,0 +1,149 @@
+import psycopg2
+import pytest
+from django.db import connection
+
+from booking.db.base import DatabaseWrapper
+from booking.db.pool import (
+    ConnectionPool,
+    PoolTimeout,
+    close_pools,
+    collect_pool_metrics,
+)
+
+
+@pytest.fixture
+def connect(db):
+    params = connection.get_connection_params()
+    return lambda: psycopg2.connect(**params)
+
+
+@pytest.fixture
+def pool(connect):
+    pool = ConnectionPool(connect, max_size=2, timeout=0.05)
+    yield pool
+    pool.close()
+
+
+def backend_pid(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        return cursor.fetchone()[0]
+
+
+def test_pool_reuses_returned_connections(pool):
+    first = pool.getconn()
+    pool.putconn(first)
+    second = pool.getconn()
+
+    assert second is first
+    assert pool.stats["opened"] == 1
+    assert pool.stats["checkouts"] == 2
+    pool.putconn(second)
+
+
+def test_pool_times_out_when_exhausted(pool):
+    held = [pool.getconn(), pool.getconn()]
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+    assert pool.stats["timeouts"] == 1
+    pool.putconn(held.pop())
+    held.append(pool.getconn())
+    for conn in held:
+        pool.putconn(conn)
+
+
+def test_pool_rolls_back_returned_transactions(pool):
+    conn = pool.getconn()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    pool.putconn(conn)
+
+    assert conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_pool_replaces_dead_connections(connect):
+    pool = ConnectionPool(connect, max_size=1, check_after=0)
+    conn = pool.getconn()
+    pid = backend_pid(conn)
+    conn.rollback()
+    pool.putconn(conn)
+
+    killer = connect()
+    with killer.cursor() as cursor:
+        cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+    killer.close()
+
+    replacement = pool.getconn()
+    assert backend_pid(replacement) != pid
+    assert pool.stats["discarded"] == 1
+    assert pool.size == 1
+    pool.putconn(replacement)
+    pool.close()
+
+
+def test_pool_fill_opens_min_size_connections(connect):
+    pool = ConnectionPool(connect, min_size=2, max_size=3, max_idle=0)
+    pool.fill()
+
+    assert pool.stats["opened"] == 2
+    assert pool.size == pool.idle == 2
+    conn = pool.getconn()
+    assert pool.stats["opened"] == 2
+    pool.putconn(conn)
+    # Idle connections past max_idle are still kept up to min_size.
+    assert pool.idle == 2
+    pool.close()
+
+
+def test_backend_pool_opens_min_size_connections_on_first_use(db):
+    settings_dict = {
+        **connection.settings_dict,
+        "ENGINE": "booking.db",
+        "CONN_MAX_AGE": 0,
+        "POOL": {"min_size": 2, "max_size": 3},
+    }
+    wrapper = DatabaseWrapper(settings_dict)
+    try:
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+        assert wrapper.pool.stats["opened"] == 2
+        assert wrapper.pool.size == 2
+        assert wrapper.pool.idle == 1
+    finally:
+        wrapper.close()
+        wrapper.pool.close()
+        close_pools()
+
+
+def test_backend_returns_connections_to_the_pool(db):
+    settings_dict = {
+        **connection.settings_dict,
+        "ENGINE": "booking.db",
+        "CONN_MAX_AGE": 0,
+        "POOL": {"max_size": 1},
+    }
+    wrapper = DatabaseWrapper(settings_dict)
+    try:
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            first_pid = cursor.fetchone()[0]
+        wrapper.close()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            second_pid = cursor.fetchone()[0]
+        wrapper.close()
+
+        assert second_pid == first_pid
+        assert wrapper.pool.stats["checkouts"] == 2
+        assert wrapper.pool.idle == 1
+        counters, gauges = collect_pool_metrics()
+        assert ("booking_db_pool_checkouts_total", {"alias": "default"}, 2) in counters
+        assert ("booking_db_pool_waiting", {"alias": "default"}, 0) in gauges
+    finally:
+        wrapper.close()
+        wrapper.pool.close()
@@ -0,0 +1,71 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from booking.models import Reservation, Table
+
+
+def get_quotes(client, seats):
+    response = client.get(reverse("quote-list"), {"seats": seats})
+    assert response.status_code == status.HTTP_200_OK
+    return [
+        (
+            quote["seats"],
+            quote["number_of_seats"],
+            quote["table"] and quote["table"]["table_number"],
+            quote["cost"],
+        )
+        for quote in response.data["results"]
+    ]
+
+
+@pytest.mark.django_db
+def test_quotes_follow_table_order_and_cost(auth_client):
+    Table.objects.create(table_number=1, total_seats=4, price=40)
+    Table.objects.create(table_number=2, total_seats=6, price=60)
+    Table.objects.create(table_number=3, total_seats=8, price=50)
+
+    assert get_quotes(auth_client, "1,3,6,8,10") == [
+        (1, 2, 1, "20.00"),
+        (3, 4, 1, "30.00"),
+        (6, 6, 3, "37.50"),
+        (8, 8, 3, "43.75"),
+        (10, 10, None, None),
+    ]
+
+
+@pytest.mark.django_db
+def test_quote_matches_the_cost_of_a_booking(auth_client):
+    Table.objects.create(table_number=1, total_seats=6, price=50)
+
+    [(_, _, _, cost)] = get_quotes(auth_client, "2")
+    response = auth_client.post(
+        reverse("reservation-list"), {"number_of_seats": 2}, format="json"
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert cost == "16.67"
+    assert str(Reservation.objects.get().cost) == cost
+
+
+@pytest.mark.django_db
+def test_quotes_are_repriced_after_a_table_change(
+    auth_client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        table = Table.objects.create(table_number=1, total_seats=4, price=40)
+    assert get_quotes(auth_client, "4") == [(4, 4, 1, "30.00")]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        table.price = 80
+        table.save()
+
+    assert get_quotes(auth_client, "4") == [(4, 4, 1, "60.00")]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("seats", ["", "0", "2,x", ",".join(["2"] * 21)])
+def test_invalid_seat_counts_are_rejected(auth_client, seats):
+    response = auth_client.get(reverse("quote-list"), {"seats": seats})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
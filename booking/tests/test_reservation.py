@@ -1,7 +1,16 @@
+import threading
+import time
+from datetime import timedelta
+
 import pytest
+from django.db import connection, transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from django.urls import reverse
-from booking.models import Table, Reservation
+from booking.models import Table, Reservation, default_reservation_period
+from booking.serializers import ReservationListSerializer
 
 
 @pytest.fixture
@@ -103,6 +112,22 @@ def test_reservation_no_available_table(api_client, create_user, create_tables):
     assert "No available table" in str(response.data)
 
 
+@pytest.mark.django_db(transaction=True)
+def test_reservation_too_large_for_any_table_is_rejected_from_the_index(
+    api_client, create_user, create_tables, django_assert_num_queries
+):
+    api_client.force_authenticate(user=create_user("t@example.com", "pw", "t"))
+    Table.objects.get_cost_matrix()
+
+    with django_assert_num_queries(0):
+        response = api_client.post(
+            reverse("reservation-list"), {"number_of_seats": 12}, format="json"
+        )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "No available table" in str(response.data)
+
+
 @pytest.mark.django_db
 def test_reservation_cancel(api_client, create_user, create_tables):
     user = create_user(
@@ -120,3 +145,469 @@ def test_reservation_cancel(api_client, create_user, create_tables):
     assert response.status_code == status.HTTP_200_OK
     reservation.refresh_from_db()
     assert reservation.active is False
+
+
+@pytest.mark.django_db
+def test_reservation_booking_with_time_window(api_client, create_user, create_tables):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    url = reverse("reservation-list")
+    data = {
+        "number_of_seats": 4,
+        "start_at": "2030-01-01T19:00:00Z",
+        "end_at": "2030-01-01T21:00:00Z",
+    }
+    first = api_client.post(url, data=data, format="json")
+    second = api_client.post(url, data=data, format="json")
+
+    assert first.status_code == status.HTTP_201_CREATED
+    assert second.status_code == status.HTTP_201_CREATED
+    assert first.data["table"]["table_number"] == 1
+    assert second.data["table"]["table_number"] == 2
+    assert first.data["start_at"] == "2030-01-01T19:00:00Z"
+    assert first.data["end_at"] == "2030-01-01T21:00:00Z"
+
+    data["start_at"] = "2030-01-01T21:00:00Z"
+    data["end_at"] = "2030-01-01T23:00:00Z"
+    third = api_client.post(url, data=data, format="json")
+    assert third.data["table"]["table_number"] == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["put", "patch"])
+def test_reservation_update_cannot_move_the_window(
+    api_client, create_user, create_tables, method
+):
+    user = create_user("t@example.com", "pw", "t")
+    api_client.force_authenticate(user=user)
+    table = create_tables[0]
+    booked, moved = (
+        Reservation.objects.create(
+            user=user,
+            table=table,
+            number_of_seats=4,
+            cost=75,
+            period=DateTimeTZRange(start, start + timedelta(hours=2)),
+        )
+        for start in (
+            timezone.now() + timedelta(days=1),
+            timezone.now() + timedelta(days=2),
+        )
+    )
+
+    response = getattr(api_client, method)(
+        reverse("reservation-detail", args=[moved.pk]),
+        {
+            "number_of_seats": 4,
+            "start_at": booked.start_at.isoformat(),
+            "end_at": booked.end_at.isoformat(),
+        },
+        format="json",
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    original_period = moved.period
+    moved.refresh_from_db()
+    assert moved.period == original_period
+
+
+@pytest.mark.django_db
+def test_reservation_invalid_time_window(api_client, create_user, create_tables):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    url = reverse("reservation-list")
+    data = {
+        "number_of_seats": 4,
+        "start_at": "2030-01-01T21:00:00Z",
+        "end_at": "2030-01-01T19:00:00Z",
+    }
+    response = api_client.post(url, data=data, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "end_at must be after start_at." in str(response.data)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reservation_booking_skips_locked_tables(
+    api_client, create_user, create_tables
+):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    locked = threading.Event()
+    release = threading.Event()
+
+    def hold_cheapest_table():
+        with transaction.atomic():
+            Table.objects.select_for_update().get(table_number=1)
+            locked.set()
+            release.wait(timeout=10)
+        connection.close()
+
+    holder = threading.Thread(target=hold_cheapest_table)
+    holder.start()
+    try:
+        assert locked.wait(timeout=10)
+        url = reverse("reservation-list")
+        response = api_client.post(url, data={"number_of_seats": 4}, format="json")
+    finally:
+        release.set()
+        holder.join()
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["table"]["table_number"] == 2
+
+
+@pytest.mark.django_db
+def test_bulk_reservation_booking(api_client, create_user, create_tables):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    window = {"start_at": "2030-01-01T19:00:00Z", "end_at": "2030-01-01T21:00:00Z"}
+    payload = [
+        {"number_of_seats": 3, **window},
+        {"number_of_seats": 4, **window},
+        {"number_of_seats": 0, **window},
+        {"number_of_seats": 12, **window},
+    ]
+    url = reverse("reservation-bulk")
+    response = api_client.post(url, data=payload, format="json")
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    results = response.data["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["table"]["table_number"] == 1
+    assert results[0]["cost"] == "75.00"
+    assert results[1]["table"]["table_number"] == 2
+    assert results[1]["cost"] == "100.00"
+    assert "Number of seats must be at least 1." in results[2]["errors"]
+    assert "No available table" in str(results[3]["errors"])
+
+    reservations = Reservation.objects.filter(user=user, active=True)
+    assert reservations.count() == 2
+    assert {reservation.id for reservation in reservations} == {
+        results[0]["id"],
+        results[1]["id"],
+    }
+
+
+@pytest.mark.django_db
+def test_bulk_reservation_requires_list(api_client, create_user, create_tables):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    url = reverse("reservation-bulk")
+    response = api_client.post(url, data={"number_of_seats": 4}, format="json")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Expected a non-empty list of reservations." in str(response.data)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reservation_booking_skips_tables_held_by_bulk_allocation(
+    api_client, create_user, create_tables, settings
+):
+    settings.RESERVATION_ALLOCATION_ATTEMPTS = 1
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+    locked = threading.Event()
+    release = threading.Event()
+
+    def plan_bulk_allocation():
+        with transaction.atomic():
+            Table.objects.plan_allocations([(4, default_reservation_period())])
+            locked.set()
+            release.wait(timeout=10)
+        connection.close()
+
+    planner = threading.Thread(target=plan_bulk_allocation)
+    planner.start()
+    try:
+        assert locked.wait(timeout=10)
+        url = reverse("reservation-list")
+        response = api_client.post(url, data={"number_of_seats": 4}, format="json")
+    finally:
+        release.set()
+        planner.join()
+
+    # Only the planned table is locked, and the booking did not wait for it.
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["table"]["table_number"] == 2
+
+
+@pytest.mark.django_db
+def test_plan_allocations_replans_around_bookings_made_before_the_lock(
+    create_user, create_tables, monkeypatch
+):
+    period = default_reservation_period()
+    Reservation.objects.create(
+        user=create_user("t@example.com", "pw", "t"),
+        table=create_tables[0],
+        number_of_seats=4,
+        cost=75,
+        period=period,
+    )
+    get_bookings = Table.objects.get_bookings
+    calls = []
+
+    def get_bookings_missing_the_first_read(db, table_ids, envelope):
+        calls.append(table_ids)
+        if len(calls) == 1:
+            return {pk: [] for pk in table_ids}
+        return get_bookings(db, table_ids, envelope)
+
+    monkeypatch.setattr(
+        Table.objects, "get_bookings", get_bookings_missing_the_first_read
+    )
+    with transaction.atomic():
+        [table] = Table.objects.plan_allocations([(4, period)])
+
+    assert table == create_tables[1]
+    assert calls[1:] == [[create_tables[0].pk], [create_tables[1].pk]]
+
+
+@pytest.mark.django_db
+def test_bulk_reservation_conflict(api_client, create_user, create_tables, monkeypatch):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+    start = timezone.now() + timedelta(days=1)
+    Reservation.objects.create(
+        user=user,
+        table=create_tables[0],
+        number_of_seats=4,
+        cost=75,
+        period=DateTimeTZRange(start, start + timedelta(hours=2)),
+    )
+    # As if the slot was booked after the plan read the bookings.
+    monkeypatch.setattr(
+        Table.objects,
+        "plan_allocations",
+        lambda seat_requests, joint=False: [create_tables[0]] * len(seat_requests),
+    )
+
+    url = reverse("reservation-bulk")
+    window = {
+        "start_at": start.isoformat(),
+        "end_at": (start + timedelta(hours=1)).isoformat(),
+    }
+    response = api_client.post(
+        url, data=[{"number_of_seats": 4, **window}], format="json"
+    )
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert Reservation.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_reservation_cancel_is_a_single_statement(
+    api_client, create_user, create_tables, django_assert_num_queries
+):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+    reservation = Reservation.objects.create(
+        user=user, table=create_tables[0], number_of_seats=4, cost=50
+    )
+
+    url = reverse("reservation-cancel", args=[reservation.id])
+    with django_assert_num_queries(1):
+        response = api_client.post(url, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_reservation_cancel_race(api_client, create_user, create_tables, monkeypatch):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+    reservation = Reservation.objects.create(
+        user=user, table=create_tables[0], number_of_seats=4, cost=50
+    )
+    # As if the reservation was reactivated between the UPDATE and the read.
+    monkeypatch.setattr(Reservation.objects, "cancel_for_user", lambda user, ids: 0)
+
+    url = reverse("reservation-cancel", args=[reservation.id])
+    response = api_client.post(url, format="json")
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.data["detail"] == (
+        "Reservation could not be cancelled, please retry."
+    )
+
+
+@pytest.mark.django_db
+def test_reservation_cancel_not_found(api_client, create_user):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    url = reverse("reservation-cancel", args=[999999])
+    response = api_client.post(url, format="json")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.data["detail"] == "Reservation not found."
+
+
+@pytest.mark.django_db
+def test_reservation_bulk_cancel(api_client, create_user, create_tables):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    other = create_user(
+        email="other@example.com", password="testpass", username="otheruser"
+    )
+    api_client.force_authenticate(user=user)
+
+    own = [
+        Reservation.objects.create(
+            user=user, table=table, number_of_seats=4, cost=50, period=None
+        )
+        for table in create_tables[:3]
+    ]
+    own[2].active = False
+    own[2].save()
+    foreign = Reservation.objects.create(
+        user=other, table=create_tables[3], number_of_seats=4, cost=50
+    )
+
+    ids = [own[0].id, own[1].id, own[2].id, foreign.id]
+    url = reverse("reservation-bulk-cancel")
+    response = api_client.post(url, data={"ids": ids}, format="json")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["cancelled"] == [own[0].id, own[1].id]
+    assert response.data["not_cancelled"] == [own[2].id, foreign.id]
+    assert not Reservation.objects.filter(user=user, active=True).exists()
+    foreign.refresh_from_db()
+    assert foreign.active is True
+
+
+@pytest.mark.django_db
+def test_reservation_list_keyset_pagination(api_client, create_user, create_tables):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+    reservations = [
+        Reservation.objects.create(
+            user=user, table=create_tables[0], number_of_seats=4, cost=50, period=None
+        )
+        for _ in range(5)
+    ]
+
+    url = reverse("reservation-list")
+    response = api_client.get(url, {"page_size": 2, "count": "estimate"})
+    assert response.status_code == status.HTTP_200_OK
+    assert isinstance(response.data["count"], int)
+
+    seen = [item["id"] for item in response.data["results"]]
+    next_url = response.data["next"]
+    while next_url:
+        response = api_client.get(next_url)
+        assert response.status_code == status.HTTP_200_OK
+        seen += [item["id"] for item in response.data["results"]]
+        next_url = response.data["next"]
+
+    assert seen == [reservation.id for reservation in reversed(reservations)]
+
+
+@pytest.mark.django_db
+def test_reservation_list_invalid_cursor(api_client, create_user):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse("reservation-list"), {"cursor": "not-a-cursor"})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("timezone_name", ["UTC", "Asia/Tehran"])
+def test_reservation_list_fast_path_matches_serializer(
+    create_user, create_tables, timezone_name
+):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    start = timezone.now().replace(microsecond=0)
+    Reservation.objects.create(
+        user=user, table=create_tables[0], number_of_seats=3, cost="66.67"
+    )
+    Reservation.objects.create(
+        user=user,
+        table=create_tables[1],
+        number_of_seats=6,
+        cost=125,
+        period=DateTimeTZRange(start, start + timedelta(minutes=90)),
+        active=False,
+    )
+    Reservation.objects.create(
+        user=user, table=create_tables[2], number_of_seats=8, cost=175, period=None
+    )
+
+    queryset = Reservation.objects.filter(user=user).order_by("id")
+    with timezone.override(timezone_name):
+        expected = ReservationListSerializer(queryset, many=True).data
+        serialize_row = ReservationListSerializer.build_row_serializer()
+        rows = queryset.values(*ReservationListSerializer.value_fields)
+        actual = [serialize_row(row) for row in rows]
+
+    assert JSONRenderer().render(actual) == JSONRenderer().render(expected)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reservation_list_conditional_get(
+    api_client, create_user, create_tables, django_assert_num_queries
+):
+    user = create_user(
+        email="test@example.com", password="testpass", username="testuser"
+    )
+    api_client.force_authenticate(user=user)
+    reservation = Reservation.objects.create(
+        user=user, table=create_tables[0], number_of_seats=4, cost=50
+    )
+
+    url = reverse("reservation-list")
+    response = api_client.get(url)
+    etag = response["ETag"]
+    assert response.status_code == status.HTTP_200_OK
+
+    with django_assert_num_queries(0):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+
+    detail_url = reverse("reservation-detail", args=[reservation.id])
+    detail_etag = api_client.get(detail_url)["ETag"]
+    assert detail_etag != etag
+
+    api_client.post(reverse("reservation-cancel", args=[reservation.id]))
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+    assert response.data["results"][0]["active"] is False
+    response = api_client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+    assert response.status_code == status.HTTP_200_OK
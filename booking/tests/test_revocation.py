@@ -0,0 +1,74 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+
+from booking.models import RevokedToken
+from booking.revocation import BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.001)
+    items = [uuid.uuid4().hex for _ in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 50
+
+
+@pytest.mark.django_db
+def test_revocation_check_is_query_free_between_syncs(django_assert_num_queries):
+    revocations = RevocationList()
+    expires_at = timezone.now() + timedelta(hours=1)
+    revocations.revoke("revoked", expires_at)
+    revocations.sync()
+
+    with django_assert_num_queries(0):
+        assert not revocations.is_revoked("not-revoked", None)
+
+    # A positive hit is confirmed against the database.
+    with django_assert_num_queries(1):
+        assert revocations.is_revoked("not-revoked", "revoked")
+
+
+@pytest.mark.django_db
+def test_revocations_from_other_processes_arrive_on_sync():
+    revocations = RevocationList()
+    expires_at = timezone.now() + timedelta(hours=1)
+
+    with override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=3600):
+        revocations.sync()
+        RevokedToken.objects.create(jti="elsewhere", expires_at=expires_at)
+        assert not revocations.is_revoked("elsewhere")
+
+    with override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=0):
+        revocations.sync()
+        assert revocations.is_revoked("elsewhere")
+
+
+@pytest.mark.django_db
+def test_overlapping_syncs_do_not_inflate_the_filter_count():
+    revocations = RevocationList()
+    expires_at = timezone.now() + timedelta(hours=1)
+    revocations.revoke("revoked", expires_at)
+    revocations.sync()
+
+    with override_settings(TOKEN_REVOCATION_SYNC_OVERLAP=3600):
+        for _ in range(3):
+            revocations.sync()
+
+    assert revocations._bloom.count == 1
+
+
+@pytest.mark.django_db
+def test_purge_expired_revocations():
+    now = timezone.now()
+    RevokedToken.objects.create(jti="expired", expires_at=now - timedelta(seconds=1))
+    RevokedToken.objects.create(jti="active", expires_at=now + timedelta(hours=1))
+
+    assert RevokedToken.objects.purge_expired() == 1
+    assert list(RevokedToken.objects.values_list("jti", flat=True)) == ["active"]
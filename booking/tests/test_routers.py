@@ -0,0 +1,180 @@
+import pytest
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from booking import cache as booking_cache
+from booking.cache import (
+    TABLES_PRIMARY_PIN_KEY,
+    TABLES_VERSION_KEY,
+    bump_version,
+    primary_pin_key,
+    reservations_version_key,
+)
+from booking.models import Reservation, Table
+from booking.routers import (
+    ReplicaRouter,
+    replica_health,
+    stop_using_replicas,
+    use_replicas,
+)
+
+
+@pytest.fixture
+def replica(settings, transactional_db):
+    # A second connection to the test database only sees committed rows, like
+    # a replica that has caught up.
+    connections.settings["replica"] = {**connections["default"].settings_dict}
+    settings.DATABASE_REPLICAS = ["replica"]
+    yield connections["replica"]
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
+
+
+@pytest.fixture
+def client_for(api_client):
+    def _client_for(user):
+        token = RefreshToken.for_user(user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return api_client
+
+    return _client_for
+
+
+@pytest.fixture
+def reservation(create_user):
+    user = create_user("test@example.com", "password", "testuser")
+    table = Table.objects.create(table_number=1, total_seats=6)
+    return Reservation.objects.create(
+        user=user, table=table, number_of_seats=4, cost=50, period=None
+    )
+
+
+@pytest.fixture
+def replayed_reservation(reservation):
+    # Lets the read-your-writes window for the reservation's owner lapse.
+    cache.clear()
+    return reservation
+
+
+def replica_queries(replica, send):
+    with CaptureQueriesContext(replica) as queries:
+        response = send()
+    assert response.status_code == status.HTTP_200_OK
+    return [
+        query["sql"] for query in queries if "pg_is_in_recovery" not in query["sql"]
+    ]
+
+
+@pytest.mark.parametrize("url_name", ["reservation-list", "async-reservation-list"])
+def test_safe_requests_read_from_replica(
+    replica, replayed_reservation, client_for, url_name
+):
+    client = client_for(replayed_reservation.user)
+
+    queries = replica_queries(replica, lambda: client.get(reverse(url_name)))
+
+    assert any("booking_reservation" in sql for sql in queries)
+
+
+def test_writes_pin_the_users_reads_to_primary(
+    replica, reservation, client_for, create_user
+):
+    # Creating the reservation pinned its owner; other users are unaffected
+    # once the table created alongside it has replayed.
+    cache.delete(TABLES_PRIMARY_PIN_KEY)
+    client = client_for(reservation.user)
+    assert (
+        replica_queries(replica, lambda: client.get(reverse("reservation-list"))) == []
+    )
+
+    other = client_for(create_user("other@example.com", "password", "other"))
+    assert replica_queries(replica, lambda: other.get(reverse("reservation-list")))
+
+
+def test_table_changes_pin_every_user_to_primary(replica, create_user, client_for):
+    client = client_for(create_user("test@example.com", "password", "testuser"))
+    Table.objects.create(table_number=1, total_seats=6)
+
+    assert replica_queries(replica, lambda: client.get(reverse("table-list"))) == []
+
+
+@pytest.mark.parametrize(
+    "url_name, version_key",
+    [
+        ("table-list", lambda user: TABLES_VERSION_KEY),
+        ("reservation-list", lambda user: reservations_version_key(user.pk)),
+    ],
+)
+def test_responses_under_a_new_version_are_not_read_from_replica(
+    replica, replayed_reservation, client_for, url_name, version_key
+):
+    # A request landing after the version bump but before its pin.
+    user = replayed_reservation.user
+    bump_version(version_key(user))
+    client = client_for(user)
+
+    assert replica_queries(replica, lambda: client.get(reverse(url_name))) == []
+    assert cache.get(TABLES_PRIMARY_PIN_KEY) is None
+    assert cache.get(primary_pin_key(user.pk)) is None
+
+
+def test_writes_pin_readers_before_bumping_the_version(
+    replica, create_user, monkeypatch
+):
+    user = create_user("test@example.com", "password", "testuser")
+    cache.clear()
+    pinned = []
+
+    def bump_version(key):
+        pinned.append(
+            bool(cache.get_many([TABLES_PRIMARY_PIN_KEY, primary_pin_key(user.pk)]))
+        )
+        cache.clear()
+
+    monkeypatch.setattr(booking_cache, "bump_version", bump_version)
+    monkeypatch.setattr("booking.signals.bump_version", bump_version)
+    table = Table.objects.create(table_number=1, total_seats=6)
+    Reservation.objects.create(
+        user=user, table=table, number_of_seats=4, cost=50, period=None
+    )
+
+    assert pinned == [True, True]
+
+
+def test_lagging_replica_falls_back_to_primary(
+    replica, replayed_reservation, client_for, monkeypatch
+):
+    monkeypatch.setattr(replica_health, "lag", lambda alias: 30.0)
+    client = client_for(replayed_reservation.user)
+
+    assert (
+        replica_queries(replica, lambda: client.get(reverse("reservation-list"))) == []
+    )
+
+
+def test_unreachable_replica_counts_as_lagging(replica, monkeypatch):
+    def lag(alias):
+        raise DatabaseError("connection refused")
+
+    monkeypatch.setattr(replica_health, "lag", lag)
+
+    assert replica_health.choose() is None
+
+
+def test_router_keeps_writes_and_transactions_on_primary(replica):
+    router = ReplicaRouter()
+    token = use_replicas(user_id=1)
+    try:
+        assert router.db_for_read(Table) == "replica"
+        assert router.db_for_write(Table) == "default"
+        with transaction.atomic():
+            assert router.db_for_read(Table) == "default"
+    finally:
+        stop_using_replicas(token)
+
+    assert router.db_for_read(Table) is None
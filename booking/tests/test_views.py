@@ -1,8 +1,10 @@
 import pytest
-from rest_framework import status
+from rest_framework import status, viewsets
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
 from booking.models import Reservation, Table
+from booking.views import ConditionalGetMixin
 
 
 User = get_user_model()
@@ -178,3 +180,66 @@ def test_cancel_reservation(
         assert response.data.get("message") == "Reservation cancelled successfully."
         reservation.refresh_from_db()
         assert reservation.active is False
+
+
+@pytest.mark.django_db(transaction=True)
+def test_table_list_is_served_from_cache(
+    api_client,
+    create_user,
+    django_assert_num_queries,
+):
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.force_authenticate(user=user)
+    Table.objects.create(table_number=1, total_seats=6)
+
+    url = reverse("table-list")
+    first = api_client.get(url)
+    with django_assert_num_queries(0):
+        second = api_client.get(url)
+
+    assert first.status_code == status.HTTP_200_OK
+    assert second.data == first.data
+    assert [table["table_number"] for table in second.data["results"]] == [1]
+
+    response = api_client.post(url, {"table_number": 2, "total_seats": 4}, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = api_client.get(url)
+    assert [table["table_number"] for table in response.data["results"]] == [1, 2]
+
+    table = Table.objects.get(table_number=2)
+    detail_url = reverse("table-detail", args=[table.id])
+    assert api_client.get(detail_url).data["total_seats"] == 4
+    api_client.patch(detail_url, {"total_seats": 8}, format="json")
+    assert api_client.get(detail_url).data["total_seats"] == 8
+
+
+@pytest.mark.django_db(transaction=True)
+def test_table_list_conditional_get(
+    api_client,
+    create_user,
+    django_assert_num_queries,
+):
+    user = create_user("test@example.com", "password", "testuser")
+    api_client.force_authenticate(user=user)
+    Table.objects.create(table_number=1, total_seats=6)
+
+    url = reverse("table-list")
+    etag = api_client.get(url)["ETag"]
+
+    with django_assert_num_queries(0):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    Table.objects.create(table_number=2, total_seats=4)
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+
+
+def test_conditional_get_views_must_name_their_version_key():
+    with pytest.raises(ImproperlyConfigured):
+
+        class UnversionedViewSet(ConditionalGetMixin, viewsets.ViewSet):
+            pass
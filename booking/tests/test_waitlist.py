@@ -0,0 +1,260 @@
+import select
+import time
+from datetime import timedelta
+
+import psycopg2
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from booking.models import Reservation, Table, WaitlistEntry
+from booking.waitlist import WAITLIST_CHANNEL, allocate_waitlist, listen
+
+
+def period(hours=1):
+    start = timezone.now() + timedelta(hours=hours)
+    return (start, start + timedelta(hours=2))
+
+
+def enqueue(user, number_of_seats=4, priority=0, hours=1):
+    return WaitlistEntry.objects.create(
+        user=user,
+        number_of_seats=number_of_seats,
+        period=period(hours),
+        priority=priority,
+    )
+
+
+@pytest.mark.django_db
+def test_allocates_by_priority_then_arrival(
+    user, create_user, django_capture_on_commit_callbacks, mailoutbox
+):
+    Table.objects.create(table_number=1, total_seats=4, price=40)
+    other = create_user("other@example.com", "password", "other")
+    first = enqueue(user)
+    second = enqueue(user)
+    urgent = enqueue(other, priority=5)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert allocate_waitlist() == [urgent]
+    urgent.refresh_from_db()
+    with django_capture_on_commit_callbacks(execute=True):
+        Reservation.objects.filter(pk=urgent.reservation_id).update(active=False)
+        assert allocate_waitlist() == [first]
+
+    second.refresh_from_db()
+    assert second.status == WaitlistEntry.WAITING
+    assert urgent.status == WaitlistEntry.ALLOCATED
+    reservation = Reservation.objects.get(pk=urgent.reservation_id)
+    assert (reservation.user, reservation.cost, reservation.period) == (
+        other,
+        30,
+        urgent.period,
+    )
+    assert [message.to for message in mailoutbox] == [
+        ["other@example.com"],
+        ["test@example.com"],
+    ]
+    assert "table 1" in mailoutbox[0].body
+
+
+@pytest.mark.django_db
+def test_allocation_is_batched(user, django_assert_max_num_queries):
+    for number in range(1, 9):
+        Table.objects.create(table_number=number, total_seats=4)
+    entries = [enqueue(user) for _ in range(8)]
+
+    # Expire, lock the queue, read the tables and their bookings, lock the
+    # ones used and read their bookings again, insert the reservations and
+    # update the entries, whatever the queue length.
+    with django_assert_max_num_queries(10):
+        allocated = allocate_waitlist()
+
+    assert allocated == entries
+    assert Reservation.objects.count() == 8
+
+
+@pytest.mark.django_db
+def test_entries_expire_after_their_start(user, settings):
+    Table.objects.create(table_number=1, total_seats=4)
+    late = enqueue(user, hours=-1)
+    settings.WAITLIST_MAX_DELAY = timedelta(minutes=30)
+
+    assert allocate_waitlist() == []
+
+    late.refresh_from_db()
+    assert late.status == WaitlistEntry.EXPIRED
+    assert not Reservation.objects.exists()
+
+
+@pytest.mark.django_db
+def test_join_list_and_withdraw(auth_client, user):
+    Table.objects.create(table_number=1, total_seats=6)
+    url = reverse("waitlist-list")
+
+    response = auth_client.post(url, {"number_of_seats": 3}, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["status"] == WaitlistEntry.WAITING
+    entry = WaitlistEntry.objects.get()
+    assert entry.user == user
+    assert entry.period.lower <= timezone.now()
+
+    assert [item["id"] for item in auth_client.get(url).data["results"]] == [entry.pk]
+
+    response = auth_client.delete(reverse("waitlist-detail", args=[entry.pk]))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert not WaitlistEntry.objects.exists()
+
+
+@pytest.mark.django_db
+def test_allocated_entries_cannot_be_withdrawn(auth_client, user):
+    Table.objects.create(table_number=1, total_seats=4)
+    entry = enqueue(user)
+    allocate_waitlist()
+
+    response = auth_client.delete(reverse("waitlist-detail", args=[entry.pk]))
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert WaitlistEntry.objects.filter(pk=entry.pk).exists()
+
+
+@pytest.mark.django_db
+def test_cannot_wait_for_more_seats_than_any_table_has(auth_client):
+    Table.objects.create(table_number=1, total_seats=6)
+
+    response = auth_client.post(
+        reverse("waitlist-list"), {"number_of_seats": 7}, format="json"
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not WaitlistEntry.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cancellation_notifies_the_allocator(auth_client, user):
+    table = Table.objects.create(table_number=1, total_seats=4)
+    reservation = Reservation.objects.create(
+        user=user, table=table, number_of_seats=4, cost=50, period=None
+    )
+    listener = psycopg2.connect(**connection.get_connection_params())
+    try:
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute(f"LISTEN {WAITLIST_CHANNEL}")
+
+        auth_client.post(reverse("reservation-cancel", args=[reservation.pk]))
+
+        select.select([listener], [], [], 5)
+        listener.poll()
+        assert [notify.channel for notify in listener.notifies] == [WAITLIST_CHANNEL]
+    finally:
+        listener.close()
+
+
+class StopListening(BaseException):
+    pass
+
+
+@pytest.mark.django_db(transaction=True)
+def test_listen_runs_again_when_notified():
+    calls = []
+
+    def callback():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            Table.objects.create(table_number=1, total_seats=4)
+        else:
+            raise StopListening
+
+    with pytest.raises(StopListening):
+        listen(callback, timeout=30)
+
+    assert calls[1] - calls[0] < 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_listen_survives_failed_runs(caplog):
+    calls = []
+
+    def callback():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("allocation failed")
+        raise StopListening
+
+    with pytest.raises(StopListening):
+        listen(callback, timeout=0.01)
+
+    assert len(calls) == 2
+    assert "Waitlist allocation failed." in caplog.text
+
+
+@pytest.mark.django_db(transaction=True)
+def test_listen_reconnects_after_losing_the_connection():
+    channels = []
+
+    def callback():
+        if not channels:
+            pid = connection.connection.get_backend_pid()
+            killer = psycopg2.connect(**connection.get_connection_params())
+            try:
+                killer.autocommit = True
+                with killer.cursor() as cursor:
+                    cursor.execute("SELECT pg_terminate_backend(%s)", [pid])
+            finally:
+                killer.close()
+            channels.append(None)
+            Table.objects.count()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_listening_channels()")
+            channels.append([row[0] for row in cursor.fetchall()])
+        raise StopListening
+
+    with pytest.raises(StopListening):
+        listen(callback, timeout=0.01)
+
+    assert channels == [None, [WAITLIST_CHANNEL]]
+
+
+@pytest.mark.django_db
+def test_allocation_skips_entries_that_cannot_be_placed(user):
+    table = Table.objects.create(table_number=1, total_seats=4)
+    Reservation.objects.create(
+        user=user, table=table, number_of_seats=4, cost=50, period=period()
+    )
+    blocked = [enqueue(user, priority=1) for _ in range(3)]
+    later = [enqueue(user, hours=5), enqueue(user, hours=10), enqueue(user, hours=15)]
+
+    assert allocate_waitlist(batch_size=2) == later[:2]
+
+    waiting = WaitlistEntry.objects.filter(status=WaitlistEntry.WAITING)
+    assert set(waiting) == {*blocked, later[2]}
+
+
+@pytest.mark.django_db
+def test_allocate_waitlist_command(user, capsys):
+    Table.objects.create(table_number=1, total_seats=4)
+    enqueue(user)
+
+    call_command("allocate_waitlist")
+
+    assert capsys.readouterr().out == "Allocated 1 waitlisted reservations.\n"
+    assert WaitlistEntry.objects.get().status == WaitlistEntry.ALLOCATED
+
+
+@pytest.mark.django_db
+def test_deleting_a_reservation_detaches_its_entry(auth_client, user):
+    Table.objects.create(table_number=1, total_seats=4)
+    entry = enqueue(user)
+    [allocated] = allocate_waitlist()
+
+    response = auth_client.delete(
+        reverse("reservation-detail", args=[allocated.reservation_id])
+    )
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    entry.refresh_from_db()
+    assert (entry.status, entry.reservation) == (WaitlistEntry.ALLOCATED, None)
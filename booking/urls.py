@@ -1,13 +1,36 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TableViewSet, ReservationViewSet
+from . import async_views
+from .views import QuoteViewSet, TableViewSet, ReservationViewSet, WaitlistViewSet
 
 
 router = DefaultRouter()
 router.register(r"tables", TableViewSet)
 router.register(r"reservations", ReservationViewSet, basename="reservation")
+router.register(r"quotes", QuoteViewSet, basename="quote")
+router.register(r"waitlist", WaitlistViewSet, basename="waitlist")
 
 
 urlpatterns = [
     path("", include(router.urls)),
+    path(
+        "async/tables/",
+        async_views.table_list,
+        name="async-table-list",
+    ),
+    path(
+        "async/tables/<int:pk>/",
+        async_views.table_detail,
+        name="async-table-detail",
+    ),
+    path(
+        "async/reservations/",
+        async_views.reservation_list,
+        name="async-reservation-list",
+    ),
+    path(
+        "async/reservations/<int:pk>/",
+        async_views.reservation_detail,
+        name="async-reservation-detail",
+    ),
 ]
@@ -1,21 +1,160 @@
-from rest_framework import permissions, viewsets, status
+import time
+from functools import partial
+
+from rest_framework import mixins, permissions, viewsets, status
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, router, transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
 
+from .exports import STREAMS, get_export_queryset
+from .idempotency import idempotent
+from .metrics import measure
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import (
+    ReservationBulkCancelSerializer,
+    ReservationExportSerializer,
     ReservationListSerializer,
     ReservationCreateSerializer,
+    ReservationUpdateSerializer,
+    QuoteRequestSerializer,
     TableSerializer,
+    WaitlistEntrySerializer,
+)
+from .batching import batcher
+from .cache import (
+    TABLES_VERSION_KEY,
+    bumped_within,
+    get_or_build,
+    get_version,
+    make_etag,
+    make_key,
+    reservations_version_key,
 )
-from .models import Reservation, Table
+from .models import Reservation, Table, WaitlistEntry, default_reservation_period
+from .pagination import ReservationPagination, TablePagination, WaitlistPagination
+from .routers import stop_using_replicas, use_replicas
+
+# Query budgets count authentication, which reads the user's auth stamp when it
+# is not cached, and the Idempotency-Key bookkeeping of the actions accepting
+# one: claiming the key, then storing or releasing it.
+AUTH_QUERIES = 1
+IDEMPOTENCY_QUERIES = 2
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags derived from a version token rather than the response body.
+
+    ``If-None-Match`` is answered with a 304 before the queryset is evaluated
+    or anything is serialised. Subclasses set ``version_key`` to the cache key
+    of that token, or to a function of the requesting user's id returning it.
+    """
+
+    version_key = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.version_key is None:
+            raise ImproperlyConfigured(f"{cls.__name__} must set version_key.")
+
+    def get_response_version(self):
+        key = self.version_key
+        if callable(key):
+            key = key(self.request.user.pk)
+        return get_version(key)
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        if getattr(self, "response_version", None) is None:
+            self.response_version = self.get_response_version()
+        etag = make_etag(
+            self.response_version,
+            request.get_full_path(),
+            request.accepted_media_type,
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response["ETag"] = etag
+        return response
 
 
-class TableViewSet(viewsets.ModelViewSet):
+class ReplicaReadMixin:
+    """
+    Serves safe requests from a read replica once the user is authenticated,
+    unless recent writes pinned their reads to the primary. Used with
+    ``ConditionalGetMixin``: the version token is read first, and a version
+    bumped within ``READ_YOUR_WRITES_WINDOW`` keeps the request on the
+    primary, so rows a replica has not replayed yet are never cached or
+    tagged under it.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            self.response_version = self.get_response_version()
+            if not bumped_within(
+                self.response_version, settings.READ_YOUR_WRITES_WINDOW
+            ):
+                self.replica_token = use_replicas(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        stop_using_replicas(getattr(self, "replica_token", None))
+        self.replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class TableViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Table.objects.all()
     serializer_class = TableSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TablePagination
+    version_key = TABLES_VERSION_KEY
+    query_budgets = {
+        "list": AUTH_QUERIES + 1,
+        "retrieve": AUTH_QUERIES + 1,
+        "create": AUTH_QUERIES + 3,
+        "update": AUTH_QUERIES + 3,
+        "partial_update": AUTH_QUERIES + 3,
+        "destroy": AUTH_QUERIES + 2,
+    }
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        # Keyed by the table-set version, which is bumped on every committed
+        # Table save/delete, so cached responses are never stale.
+        key = make_key(
+            "booking:tables:response",
+            self.response_version,
+            self.action,
+            request.build_absolute_uri(),
+        )
+
+        def build():
+            response = handler(request, *args, **kwargs)
+            return response.status_code, response.data
+
+        status_code, data = get_or_build(
+            key, build, settings.TABLE_RESPONSE_CACHE_TIMEOUT
+        )
+        return Response(data, status=status_code)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            partial(self.get_cached_response, super().list), request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            partial(self.get_cached_response, super().retrieve),
+            request,
+            *args,
+            **kwargs,
+        )
 
     def perform_create(self, serializer):
         if Table.objects.count() >= 10:
@@ -26,32 +165,177 @@ class TableViewSet(viewsets.ModelViewSet):
             raise DRFValidationError(e.messages)
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class QuoteViewSet(ConditionalGetMixin, viewsets.ViewSet):
+    """
+    Cheapest table and cost for each of ``?seats=2,4,6``, without booking.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    version_key = TABLES_VERSION_KEY
+    # Served from the in-process table index, rebuilt outside the budget.
+    query_budgets = {"list": AUTH_QUERIES}
+
+    def list(self, request):
+        return self.get_conditional_response(self.build_list_response, request)
+
+    def build_list_response(self, request):
+        serializer = QuoteRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        seat_counts = list(dict.fromkeys(serializer.validated_data["seats"]))
+
+        tables = {}
+        results = []
+        for seats, number_of_seats, table, cost in Table.objects.get_quotes(
+            seat_counts
+        ):
+            if table is not None and table.pk not in tables:
+                tables[table.pk] = TableSerializer(table).data
+            results.append(
+                {
+                    "seats": seats,
+                    "number_of_seats": number_of_seats,
+                    "table": tables[table.pk] if table is not None else None,
+                    "cost": f"{cost:f}" if cost is not None else None,
+                }
+            )
+        return Response({"results": results})
+
+
+class WaitlistViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Requests waiting for a table to come free. The ``allocate_waitlist``
+    command books them and emails the user.
+    """
+
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = WaitlistPagination
+    query_budgets = {
+        "list": AUTH_QUERIES + 2,
+        "retrieve": AUTH_QUERIES + 1,
+        "create": AUTH_QUERIES + 1,
+        "destroy": AUTH_QUERIES + 2,
+    }
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        # Conditional, so an entry the allocator has just booked stays.
+        deleted, _ = WaitlistEntry.objects.filter(
+            pk=instance.pk, status=WaitlistEntry.WAITING
+        ).delete()
+        if not deleted:
+            raise DRFValidationError("Only waiting entries can be withdrawn.")
+
+
+class ReservationViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ReservationPagination
+    version_key = staticmethod(reservations_version_key)
+    # The list budget leaves room for ?count=estimate.
+    query_budgets = {
+        "list": AUTH_QUERIES + 2,
+        "retrieve": AUTH_QUERIES + 1,
+        # A batch leader reads the tables and their bookings, locks the ones
+        # it uses, reads their bookings again and inserts the whole batch.
+        "create": AUTH_QUERIES + IDEMPOTENCY_QUERIES + 5,
+        "update": AUTH_QUERIES + 2,
+        "partial_update": AUTH_QUERIES + 2,
+        # Includes detaching the waitlist entry the reservation came from.
+        "destroy": AUTH_QUERIES + 3,
+        "cancel": AUTH_QUERIES + IDEMPOTENCY_QUERIES + 2,
+        "bulk_cancel": AUTH_QUERIES + IDEMPOTENCY_QUERIES + 1,
+        # Read the tables and their bookings, lock the ones used, read their
+        # bookings again, insert.
+        "bulk": AUTH_QUERIES + IDEMPOTENCY_QUERIES + 5,
+        # Checking is_staff loads the rest of the user, which the token does
+        # not carry; the rows are streamed after the view has returned.
+        "export": AUTH_QUERIES + 1,
+    }
 
     def get_queryset(self):
-        queryset = Reservation.objects.all()
-        if self.action == "cancel":
-            return queryset.select_related("user", "table")
-        return queryset.filter(user=self.request.user).select_related("table")
+        return Reservation.objects.filter(user=self.request.user).select_related(
+            "table"
+        )
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
             return ReservationListSerializer
+        if self.action in ["update", "partial_update"]:
+            return ReservationUpdateSerializer
         return ReservationCreateSerializer
 
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.build_list_response, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(super().retrieve, request, *args, **kwargs)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def build_list_response(self, request, *args, **kwargs):
+        if not ReservationListSerializer.supports_fast_path():
+            return super().list(request, *args, **kwargs)
+
+        # Read-only fast path: plain rows instead of model instances and the
+        # field-by-field serializer machinery.
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *ReservationListSerializer.value_fields
+        )
+        serialize_row = ReservationListSerializer.build_row_serializer()
+        page = self.paginate_queryset(queryset)
+        with measure("serialize"):
+            data = [serialize_row(row) for row in (queryset if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
     def validate_cancel_request(self, reservation, user):
-        if reservation.user != user:
+        if reservation.user_id != user.pk:
             raise DRFValidationError("You can only cancel your own reservations.")
         if not reservation.active:
             raise DRFValidationError("This reservation is already cancelled.")
 
     @action(detail=True, methods=["post"], name="cancel")
+    @idempotent
     def cancel(self, request, pk=None):
         try:
-            reservation = self.get_object()
-        except Reservation.DoesNotExist:
+            reservation_id = int(pk)
+        except (TypeError, ValueError):
+            reservation_id = None
+
+        if reservation_id and Reservation.objects.cancel_for_user(
+            request.user, [reservation_id]
+        ):
+            return Response(
+                {"message": "Reservation cancelled successfully."},
+                status=status.HTTP_200_OK,
+            )
+
+        # Nothing was updated; look the row up only to explain why.
+        reservation = (
+            Reservation.objects.filter(pk=reservation_id)
+            .only("user_id", "active")
+            .first()
+            if reservation_id
+            else None
+        )
+        if reservation is None:
             return Response(
                 {"detail": "Reservation not found."},
                 status=status.HTTP_404_NOT_FOUND,
@@ -65,30 +349,205 @@ class ReservationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        reservation.active = False
-        reservation.save()
+        # Owned and active, so it changed between the UPDATE and the read.
+        return Response(
+            {"detail": "Reservation could not be cancelled, please retry."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk-cancel", name="bulk cancel")
+    @idempotent
+    def bulk_cancel(self, request):
+        serializer = ReservationBulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+
+        cancelled = set(Reservation.objects.cancel_for_user(request.user, ids))
 
         return Response(
-            {"message": "Reservation cancelled successfully."},
+            {
+                "cancelled": [pk for pk in ids if pk in cancelled],
+                "not_cancelled": [pk for pk in ids if pk not in cancelled],
+            },
             status=status.HTTP_200_OK,
         )
 
+    @action(detail=False, methods=["post"], url_path="bulk", name="bulk")
+    @idempotent
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise DRFValidationError("Expected a non-empty list of reservations.")
+        if len(items) > settings.RESERVATION_BULK_MAX_SIZE:
+            raise DRFValidationError(
+                f"Cannot create more than {settings.RESERVATION_BULK_MAX_SIZE} "
+                "reservations at once."
+            )
+
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            try:
+                serializer.is_valid(raise_exception=True)
+                number_of_seats = Reservation.validate_number_of_seats(
+                    serializer.validated_data["number_of_seats"]
+                )
+            except DRFValidationError as e:
+                results[index] = {"index": index, "errors": e.detail}
+                continue
+            except DjangoValidationError as e:
+                results[index] = {"index": index, "errors": e.messages}
+                continue
+            period = serializer.validated_data.get("period")
+            if period is None:
+                period = default_reservation_period()
+            pending.append((index, serializer.validated_data, number_of_seats, period))
+
+        try:
+            with transaction.atomic():
+                tables = Table.objects.plan_allocations(
+                    [
+                        (number_of_seats, period)
+                        for _, _, number_of_seats, period in pending
+                    ],
+                    joint=True,
+                )
+                reservations = []
+                for (index, data, number_of_seats, period), table in zip(
+                    pending, tables
+                ):
+                    if table is None:
+                        results[index] = {
+                            "index": index,
+                            "errors": ["No available table for this number of seats."],
+                        }
+                        continue
+                    reservation = Reservation(
+                        user=request.user,
+                        table=table,
+                        number_of_seats=data["number_of_seats"],
+                        cost=table.calculate_cost(number_of_seats),
+                        period=period,
+                        active=True,
+                    )
+                    reservations.append((index, reservation))
+                Reservation.objects.bulk_create(
+                    [reservation for _, reservation in reservations]
+                )
+        except IntegrityError:
+            # A booking made without locking its table row, e.g. in the admin,
+            # took one of the slots first.
+            return Response(
+                {"detail": "Some of these tables were just booked. Please retry."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        for index, reservation in reservations:
+            results[index] = {
+                "index": index,
+                "id": reservation.id,
+                **ReservationCreateSerializer(reservation).data,
+            }
+
+        if not reservations:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(reservations) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({"results": results}, status=response_status)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[permissions.IsAdminUser],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        # Every user's reservations, for finance; ?format=ndjson (default)
+        # or csv, filtered by booked_after, booked_before and active.
+        serializer = ReservationExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        # Bound to the replica chosen now; the rows are read while the
+        # response streams, after the replica context has ended.
+        queryset = get_export_queryset(**serializer.validated_data).using(
+            router.db_for_read(Reservation)
+        )
+
+        export_format = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            STREAMS[export_format](queryset, settings.RESERVATION_EXPORT_CHUNK_SIZE),
+            content_type=request.accepted_renderer.media_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="reservations.{export_format}"'
+        )
+        return response
+
+    def allocate_reservation(self, serializer, number_of_seats, period):
+        attempts = settings.RESERVATION_ALLOCATION_ATTEMPTS
+        for attempt in range(1, attempts + 1):
+            try:
+                with transaction.atomic():
+                    table = Table.objects.claim_available_table(number_of_seats, period)
+                    if table is not None:
+                        return serializer.save(
+                            user=self.request.user,
+                            table=table,
+                            cost=table.calculate_cost(number_of_seats),
+                            period=period,
+                            active=True,
+                        )
+            except IntegrityError:
+                # A concurrent booking committed an overlapping slot first.
+                pass
+
+            try:
+                Table.objects.get_best_available_table(number_of_seats, period)
+            except DjangoValidationError as e:
+                raise DRFValidationError(e.messages)
+
+            if attempt < attempts:
+                time.sleep(settings.RESERVATION_ALLOCATION_BACKOFF * attempt)
+
+        raise DRFValidationError(
+            "All suitable tables are being booked right now. Please try again."
+        )
+
+    def allocate_in_batch(self, serializer, number_of_seats, period):
+        try:
+            serializer.instance = batcher.allocate(
+                self.request.user,
+                serializer.validated_data["number_of_seats"],
+                number_of_seats,
+                period,
+            )
+        except DjangoValidationError as e:
+            raise DRFValidationError(e.messages)
+        except IntegrityError:
+            # A booking committed outside the batch took one of its slots.
+            return self.allocate_reservation(serializer, number_of_seats, period)
+        return serializer.instance
+
     def perform_create(self, serializer):
         try:
             number_of_seats = Reservation.validate_number_of_seats(
                 self.request.data.get("number_of_seats")
             )
-            best_table = Table.objects.get_best_available_table(number_of_seats)
-            cost = best_table.calculate_cost(number_of_seats)
+            # Answered by the in-memory table index, so a request no table can
+            # seat is turned away before any query.
+            Table.objects.get_best_available_table(number_of_seats)
+            period = serializer.validated_data.get("period")
+            if period is None:
+                period = default_reservation_period()
         except DjangoValidationError as e:
             raise DRFValidationError(e.messages)
 
-        reservation = serializer.save(
-            user=self.request.user,
-            table=best_table,
-            cost=cost,
-            active=True,
-        )
+        if settings.RESERVATION_BATCH_WINDOW_MS:
+            reservation = self.allocate_in_batch(serializer, number_of_seats, period)
+        else:
+            reservation = self.allocate_reservation(serializer, number_of_seats, period)
 
         response_data = {
             "table": TableSerializer(reservation.table).data,
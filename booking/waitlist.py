@@ -0,0 +1,187 @@
+import logging
+import select
+import time
+from decimal import ROUND_HALF_UP
+
+import psycopg2
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import COST_EXPONENT
+from .models import Reservation, Table, WaitlistEntry
+
+logger = logging.getLogger(__name__)
+
+# Notified by the triggers from migration 0010 whenever seats may have come
+# free: a reservation was cancelled or deleted, a table was added or grew, or
+# someone joined the waitlist.
+WAITLIST_CHANNEL = "booking_waitlist"
+
+
+def expire_entries(now):
+    return WaitlistEntry.objects.filter(
+        status=WaitlistEntry.WAITING,
+        period__startswith__lte=now - settings.WAITLIST_MAX_DELAY,
+    ).update(status=WaitlistEntry.EXPIRED)
+
+
+def allocate_waitlist(batch_size=None):
+    """
+    Book tables for up to ``batch_size`` waiting entries, in queue order, in
+    a single transaction. The queue is locked and read ``batch_size`` entries
+    at a time; ``TableManager.plan_allocations`` places each page in memory
+    and its reservations are inserted with one ``bulk_create``. Entries that
+    still do not fit keep waiting without holding up the ones behind them:
+    paging goes on until ``batch_size`` entries are allocated or the queue
+    ends. Returns the allocated entries; their users are emailed once the
+    transaction commits.
+    """
+    batch_size = batch_size or settings.WAITLIST_BATCH_SIZE
+    now = timezone.now()
+    queue = (
+        WaitlistEntry.objects.filter(status=WaitlistEntry.WAITING)
+        .select_related("user")
+        .select_for_update(skip_locked=True, of=("self",))
+        .order_by("-priority", "created_at", "id")
+    )
+    allocated = []
+    with transaction.atomic():
+        expire_entries(now)
+        page = list(queue[:batch_size])
+        while page:
+            allocated += allocate_entries(page, batch_size - len(allocated), now)
+            if len(allocated) >= batch_size or len(page) < batch_size:
+                break
+            last = page[-1]
+            page = list(
+                queue.filter(
+                    Q(priority__lt=last.priority)
+                    | Q(priority=last.priority, created_at__gt=last.created_at)
+                    | Q(
+                        priority=last.priority,
+                        created_at=last.created_at,
+                        id__gt=last.id,
+                    )
+                )[:batch_size]
+            )
+        transaction.on_commit(lambda: notify_allocated(allocated))
+    return allocated
+
+
+def allocate_entries(entries, limit, now):
+    # Books the first ``limit`` of ``entries`` that fit somewhere.
+    seats = [
+        Reservation.validate_number_of_seats(entry.number_of_seats) for entry in entries
+    ]
+    tables = Table.objects.plan_allocations(
+        [
+            (number_of_seats, entry.period)
+            for number_of_seats, entry in zip(seats, entries)
+        ]
+    )
+
+    allocated = []
+    for entry, number_of_seats, table in zip(entries, seats, tables):
+        if table is None:
+            continue
+        if len(allocated) == limit:
+            break
+        entry.reservation = Reservation(
+            user_id=entry.user_id,
+            table=table,
+            number_of_seats=entry.number_of_seats,
+            # Rounded as the column would, for the notification.
+            cost=table.calculate_cost(number_of_seats).quantize(
+                COST_EXPONENT, rounding=ROUND_HALF_UP
+            ),
+            period=entry.period,
+            active=True,
+        )
+        entry.status = WaitlistEntry.ALLOCATED
+        entry.allocated_at = now
+        allocated.append(entry)
+    Reservation.objects.bulk_create([entry.reservation for entry in allocated])
+    for entry in allocated:
+        entry.reservation_id = entry.reservation.pk
+    WaitlistEntry.objects.bulk_update(
+        allocated, ["status", "reservation", "allocated_at"]
+    )
+    return allocated
+
+
+def notify_allocated(entries):
+    messages = []
+    for entry in entries:
+        if not entry.user.email:
+            continue
+        reservation = entry.reservation
+        messages.append(
+            (
+                "Your waitlisted reservation is confirmed",
+                f"Hi {entry.user.username},\n\n"
+                f"A table came free: table {reservation.table.table_number} is "
+                f"booked for you for {reservation.number_of_seats} seats from "
+                f"{timezone.localtime(reservation.start_at):%Y-%m-%d %H:%M} to "
+                f"{timezone.localtime(reservation.end_at):%Y-%m-%d %H:%M} "
+                f"({timezone.get_current_timezone_name()}), for {reservation.cost}.",
+                None,
+                [entry.user.email],
+            )
+        )
+    # The reservations are already committed; a mail failure must not undo
+    # them.
+    try:
+        send_mass_mail(messages)
+    except Exception:
+        logger.exception(
+            "Could not notify %d allocated waitlist entries.", len(messages)
+        )
+
+
+def subscribe():
+    connection.ensure_connection()
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {WAITLIST_CHANNEL}")
+    return connection.connection
+
+
+def listen(callback, timeout):
+    """
+    Run ``callback`` now, then again whenever ``WAITLIST_CHANNEL`` is
+    notified and at least every ``timeout`` seconds, until interrupted.
+    Notifications that arrive while it runs are coalesced into one more run.
+    A failing run is logged and the next one goes ahead as usual; if the
+    database connection was lost, it is reopened and listened on again.
+    """
+    raw_connection = None
+    try:
+        while True:
+            try:
+                if raw_connection is None:
+                    raw_connection = subscribe()
+                raw_connection.notifies.clear()
+                callback()
+            except Exception:
+                logger.exception("Waitlist allocation failed.")
+                if connection.connection is None or not connection.is_usable():
+                    # The LISTEN went with the connection.
+                    connection.close()
+                    raw_connection = None
+
+            if raw_connection is None:
+                time.sleep(timeout)
+            elif not raw_connection.notifies:
+                readable, _, _ = select.select([raw_connection], [], [], timeout)
+                if readable:
+                    try:
+                        raw_connection.poll()
+                    except psycopg2.Error:
+                        # Lost; the next run fails and reconnects.
+                        pass
+    finally:
+        if raw_connection is not None and connection.is_usable():
+            with connection.cursor() as cursor:
+                cursor.execute(f"UNLISTEN {WAITLIST_CHANNEL}")
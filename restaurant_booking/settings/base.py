@@ -15,6 +15,8 @@ import environ
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +50,7 @@ DJANGO_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",
 ]
 
 THIRD_PARTY_APPS = [
@@ -72,6 +75,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 SITE_ID = 1
 
 MIDDLEWARE = [
+    "booking.middleware.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -84,7 +88,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "booking.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -99,8 +103,28 @@ SPECTACULAR_SETTINGS = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "booking.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "booking.serializers.ClaimsTokenRefreshSerializer",
 }
 
+# Revoked token ids are checked against a per-process Bloom filter that pulls
+# new revocations from the database every TOKEN_REVOCATION_SYNC_INTERVAL
+# seconds, so a revocation reaches every worker within that interval.
+TOKEN_REVOCATION_SYNC_INTERVAL = env.float("TOKEN_REVOCATION_SYNC_INTERVAL", default=5)
+TOKEN_REVOCATION_SYNC_OVERLAP = env.int("TOKEN_REVOCATION_SYNC_OVERLAP", default=60)
+TOKEN_REVOCATION_BLOOM_CAPACITY = env.int(
+    "TOKEN_REVOCATION_BLOOM_CAPACITY", default=100_000
+)
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = env.float(
+    "TOKEN_REVOCATION_BLOOM_ERROR_RATE", default=0.001
+)
+
+# Requests authenticated from token claims only load the full User row when a
+# view reads a field the token does not carry; those rows are kept in a small
+# per-process LRU cache.
+AUTH_USER_CACHE_SIZE = env.int("AUTH_USER_CACHE_SIZE", default=1024)
+AUTH_USER_CACHE_TIMEOUT = env.int("AUTH_USER_CACHE_TIMEOUT", default=60)
+
 EMAIL_BACKEND = env(
     "EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend"
 )
@@ -129,6 +153,8 @@ WSGI_APPLICATION = "restaurant_booking.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Keep the default READ COMMITTED isolation level: the trigger rejecting
+# overlapping reservations relies on it (booking.E002).
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -137,9 +163,120 @@ DATABASES = {
         "PASSWORD": env("DATABASE_PASSWORD", default="postgres"),
         "HOST": env("DATABASE_HOST", default="localhost"),
         "PORT": env("DATABASE_PORT", default="5432"),
+        # Keep connections open between requests, checking them before reuse.
+        "CONN_MAX_AGE": env.int("DATABASE_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": env.bool("DATABASE_CONN_HEALTH_CHECKS", default=True),
     }
 }
 
+# Optional per-process connection pool (booking.db). Each request checks a
+# connection out and returns it when it finishes, so a worker needs at most
+# one connection per thread; size POOL_MAX_SIZE to the worker's thread count
+# and keep workers * POOL_MAX_SIZE below Postgres' max_connections. The first
+# connection a worker makes opens POOL_MIN_SIZE of them, and that many are kept
+# open while idle.
+if env.bool("DATABASE_POOL", default=False):
+    DATABASES["default"].update(
+        {
+            "ENGINE": "booking.db",
+            "CONN_MAX_AGE": 0,
+            "POOL": {
+                "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=2),
+                "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=10),
+                "timeout": env.float("DATABASE_POOL_TIMEOUT", default=5),
+                "max_idle": env.float("DATABASE_POOL_MAX_IDLE", default=600),
+                "max_lifetime": env.float("DATABASE_POOL_MAX_LIFETIME", default=3600),
+            },
+        }
+    )
+
+
+# Read replicas, e.g. DATABASE_REPLICA_HOSTS=replica-1,replica-2. Safe API
+# requests read from a replica that is at most REPLICA_MAX_LAG seconds behind
+# (checked every REPLICA_LAG_CHECK_INTERVAL seconds per process); for
+# READ_YOUR_WRITES_WINDOW seconds after a write, the affected user's reads,
+# or everyone's after a table change, stay on the primary.
+for number, host in enumerate(env.list("DATABASE_REPLICA_HOSTS", default=[]), 1):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["booking.routers.ReplicaRouter"]
+REPLICA_MAX_LAG = env.float("REPLICA_MAX_LAG", default=2)
+REPLICA_LAG_CHECK_INTERVAL = env.float("REPLICA_LAG_CHECK_INTERVAL", default=5)
+READ_YOUR_WRITES_WINDOW = env.int("READ_YOUR_WRITES_WINDOW", default=10)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Version tokens (cached table lists, ETags, the table availability index),
+# replica pins and auth stamps live here, so with several worker processes it
+# must be shared, e.g. redis://. CACHE_REQUIRE_SHARED turns a process-local
+# backend into a system check error; production and staging set it.
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+CACHE_REQUIRE_SHARED = env.bool("CACHE_REQUIRE_SHARED", default=False)
+
+# Cached TableViewSet responses are keyed by the table-set version, so this only
+# bounds how long unused entries linger.
+TABLE_RESPONSE_CACHE_TIMEOUT = env.int("TABLE_RESPONSE_CACHE_TIMEOUT", default=3600)
+
+
+# PBKDF2 work factor for password hashes. Every login pays for it in CPU, so
+# profile it against the expected login rate (see benchmark_login) before
+# changing it. Passwords are re-encoded at this factor on login, so it may not
+# go below Django 4.2's default.
+MIN_PASSWORD_HASH_ITERATIONS = 600_000
+PASSWORD_HASH_ITERATIONS = env.int(
+    "PASSWORD_HASH_ITERATIONS", default=MIN_PASSWORD_HASH_ITERATIONS
+)
+if PASSWORD_HASH_ITERATIONS < MIN_PASSWORD_HASH_ITERATIONS:
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASH_ITERATIONS must be at least {MIN_PASSWORD_HASH_ITERATIONS}."
+    )
+
+PASSWORD_HASHERS = [
+    "booking.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+
+# "off", "log" or "raise"; only takes effect where QueryBudgetMiddleware is
+# installed (local settings and the test suite).
+QUERY_BUDGET_MODE = env("QUERY_BUDGET_MODE", default="off")
+
+
+# Request metrics served at /metrics. Workers of a multi-process server each
+# write their totals to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds so the
+# endpoint can aggregate them, folding the files of exited workers into one
+# archive; leave it unset for a single process. When
+# METRICS_TOKEN is set, scrapers must send it as a bearer token; otherwise
+# only METRICS_ALLOWED_IPS (compared with REMOTE_ADDR) and staff sessions may
+# read the endpoint.
+METRICS_DIR = env("METRICS_DIR", default=None)
+METRICS_FLUSH_INTERVAL = env.float("METRICS_FLUSH_INTERVAL", default=1)
+METRICS_TOKEN = env("METRICS_TOKEN", default=None)
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# booking_reservation is partitioned by month on booked_at; the
+# manage_reservation_partitions command keeps this many future partitions and
+# archives partitions older than the retention period.
+RESERVATION_PARTITIONS_AHEAD = env.int("RESERVATION_PARTITIONS_AHEAD", default=3)
+RESERVATION_RETENTION_MONTHS = env.int("RESERVATION_RETENTION_MONTHS", default=12)
+RESERVATION_ARCHIVE_SCHEMA = env(
+    "RESERVATION_ARCHIVE_SCHEMA", default="booking_archive"
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -186,3 +323,48 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 DEFAULT_TABLE_PRICE = 50.00
+
+DEFAULT_RESERVATION_DURATION = timedelta(
+    minutes=env.int("DEFAULT_RESERVATION_DURATION_MINUTES", default=120)
+)
+
+# Reservation allocation claims tables with SELECT ... FOR UPDATE SKIP LOCKED and
+# retries with a linear backoff (in seconds) while every candidate is locked.
+RESERVATION_ALLOCATION_ATTEMPTS = env.int("RESERVATION_ALLOCATION_ATTEMPTS", default=3)
+RESERVATION_ALLOCATION_BACKOFF = env.float(
+    "RESERVATION_ALLOCATION_BACKOFF", default=0.05
+)
+# When positive, single bookings a worker process receives within this many
+# milliseconds of each other are allocated together (booking/batching.py).
+# Only useful with threaded workers; 0 allocates each booking on its own.
+RESERVATION_BATCH_WINDOW_MS = env.int("RESERVATION_BATCH_WINDOW_MS", default=0)
+
+RESERVATION_BULK_MAX_SIZE = env.int("RESERVATION_BULK_MAX_SIZE", default=100)
+
+# Rows fetched per round trip by the server-side cursor behind exports.
+RESERVATION_EXPORT_CHUNK_SIZE = env.int("RESERVATION_EXPORT_CHUNK_SIZE", default=2000)
+
+# The waitlist allocator books up to WAITLIST_BATCH_SIZE queued entries per
+# transaction, reading the queue that many entries at a time past those that
+# cannot be placed. Run with --listen, it is woken by the database when seats
+# come free and otherwise runs every WAITLIST_POLL_INTERVAL seconds. Entries
+# still waiting WAITLIST_MAX_DELAY after their requested start expire.
+WAITLIST_BATCH_SIZE = env.int("WAITLIST_BATCH_SIZE", default=200)
+WAITLIST_POLL_INTERVAL = env.float("WAITLIST_POLL_INTERVAL", default=60)
+WAITLIST_MAX_DELAY = timedelta(
+    minutes=env.int("WAITLIST_MAX_DELAY_MINUTES", default=30)
+)
+
+# Seat counts a single /api/quotes/ request may price.
+QUOTE_MAX_SEAT_COUNTS = env.int("QUOTE_MAX_SEAT_COUNTS", default=20)
+
+# Successful responses to requests sent with an Idempotency-Key are replayed to
+# retries for IDEMPOTENCY_KEY_TTL. A retry that arrives while the first request
+# is still running polls for its result for up to IDEMPOTENCY_LOCK_TIMEOUT
+# seconds and then gets a 409. An unanswered key is only considered abandoned by
+# a crashed worker, and claimed again, after IDEMPOTENCY_ABANDON_AFTER seconds;
+# keep it well above the slowest request.
+IDEMPOTENCY_KEY_TTL = timedelta(hours=env.int("IDEMPOTENCY_KEY_TTL_HOURS", default=24))
+IDEMPOTENCY_LOCK_TIMEOUT = env.float("IDEMPOTENCY_LOCK_TIMEOUT", default=10)
+IDEMPOTENCY_ABANDON_AFTER = env.float("IDEMPOTENCY_ABANDON_AFTER", default=300)
+IDEMPOTENCY_POLL_INTERVAL = env.float("IDEMPOTENCY_POLL_INTERVAL", default=0.05)
@@ -15,3 +15,10 @@ MIDDLEWARE = ["debug_toolbar.middleware.DebugToolbarMiddleware"] + MIDDLEWARE
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
+
+# Query budgets
+# -----------------------------------------------------------------------------
+
+MIDDLEWARE += ["booking.middleware.QueryBudgetMiddleware"]
+
+QUERY_BUDGET_MODE = env("QUERY_BUDGET_MODE", default="log")
@@ -1,3 +1,10 @@
 from .base import *
 
 ENV_SETTINGS = "STAGING"
+
+# Every worker process must see the same version tokens and auth stamps, so a
+# shared cache is required (see booking.checks).
+CACHES = {
+    "default": env.cache("CACHE_URL"),
+}
+CACHE_REQUIRE_SHARED = True
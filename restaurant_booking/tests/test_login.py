@@ -0,0 +1,54 @@
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.tokens import AccessToken
+
+from booking.management.commands.benchmark_login import ENDPOINTS
+
+LOGIN_URL = ENDPOINTS["login"]
+
+
+@pytest.mark.django_db
+def test_login_issues_single_token_pair(api_client, create_user):
+    user = create_user("test@example.com", "password", "testuser")
+
+    response = api_client.post(
+        LOGIN_URL, {"username": "testuser", "password": "password"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.data) == {"access", "refresh", "user"}
+    assert response.data["user"] == {
+        "id": user.id,
+        "username": "testuser",
+        "email": "test@example.com",
+    }
+    assert AccessToken(response.data["access"])["username"] == "testuser"
+    assert not Token.objects.exists()
+
+
+@pytest.mark.django_db
+def test_login_rejects_bad_credentials(api_client, create_user):
+    create_user("test@example.com", "password", "testuser")
+
+    response = api_client.post(LOGIN_URL, {"username": "testuser", "password": "wrong"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_password_hash_uses_configured_iterations(api_client, create_user):
+    with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+        assert make_password("password").startswith("pbkdf2_sha256$1000$")
+        user = create_user("test@example.com", "password", "testuser")
+
+    with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+        response = api_client.post(
+            LOGIN_URL, {"username": "testuser", "password": "password"}
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$2000$")
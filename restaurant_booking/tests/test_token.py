@@ -8,6 +8,10 @@ from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 
+from booking.authentication import ClaimsRefreshToken
+from booking.revocation import revocation_list
+from booking.serializers import TokenRevokeSerializer
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
@@ -123,3 +127,51 @@ def test_refresh_token(
     response = api_client.post(refresh_token_url, data=data)
     assert response.status_code == expected_status
     assert set(response.data.keys()) >= expected_keys
+
+
+@pytest.mark.django_db
+def test_revoke_refresh_token(
+    api_client, create_user, obtain_token_url, refresh_token_url
+):
+    create_user(email="user@test.com", username="testuser", password="testpassword")
+    tokens = api_client.post(
+        obtain_token_url, data={"username": "testuser", "password": "testpassword"}
+    ).data
+    refreshed_access = api_client.post(
+        refresh_token_url, data={"refresh": tokens["refresh"]}
+    ).data["access"]
+
+    response = api_client.post(
+        reverse("token_revoke"), data={"refresh": tokens["refresh"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = api_client.post(refresh_token_url, data={"refresh": tokens["refresh"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    for access in (tokens["access"], refreshed_access):
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = api_client.get(reverse("reservation-list"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data["detail"] == "Token is revoked"
+
+
+@pytest.mark.django_db
+def test_revoke_invalid_token(api_client):
+    response = api_client.post(reverse("token_revoke"), data={"refresh": "invalid"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_validating_a_revocation_does_not_revoke(create_user):
+    user = create_user(
+        email="user@test.com", username="testuser", password="testpassword"
+    )
+    token = ClaimsRefreshToken.for_user(user)
+
+    serializer = TokenRevokeSerializer(data={"refresh": str(token)})
+    assert serializer.is_valid()
+    assert not revocation_list.is_revoked(token["jti"])
+
+    serializer.save()
+    assert revocation_list.is_revoked(token["jti"])
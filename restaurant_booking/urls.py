@@ -27,16 +27,18 @@ from drf_spectacular.views import (
     SpectacularRedocView,
     SpectacularSwaggerView,
 )
-from .views import CustomLoginView
+from .views import CustomLoginView, TokenRevokeView, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("api/token/revoke/", TokenRevokeView.as_view(), name="token_revoke"),
     path("dj-rest-auth/login/", CustomLoginView.as_view(), name="rest_login"),
     path("dj-rest-auth/", include("dj_rest_auth.urls")),
     path("dj-rest-auth/registration/", include("dj_rest_auth.registration.urls")),
     path("api/", include("booking.urls")),
+    path("metrics", metrics, name="metrics"),
 ]
 
 
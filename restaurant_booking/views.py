@@ -1,22 +1,79 @@
+from dj_rest_auth.app_settings import api_settings
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
 from dj_rest_auth.views import LoginView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenViewBase
+
+from booking.authentication import ClaimsRefreshToken
+from booking.metrics import registry, render_prometheus
+from booking.serializers import TokenRevokeSerializer
 
 
 class CustomLoginView(LoginView):
-    def get_response(self):
-        response = super().get_response()
+    """
+    Authenticates once and issues a single JWT pair.
+
+    dj-rest-auth's ``login()`` would also create an authtoken ``Token`` that
+    none of the API's authentication classes accept, so it is skipped.
+    """
 
-        refresh = RefreshToken.for_user(self.user)
-        access_token = str(refresh.access_token)
-        refresh_token = str(refresh)
+    def login(self):
+        self.user = self.serializer.validated_data["user"]
+        self.refresh_token = ClaimsRefreshToken.for_user(self.user)
 
-        response.data["access"] = access_token
-        response.data["refresh"] = refresh_token
+        if api_settings.SESSION_LOGIN:
+            self.process_login()
 
-        response.data["user"] = {
-            "id": self.user.id,
-            "username": self.user.username,
-            "email": self.user.email,
+    def get_response(self):
+        data = {
+            "access": str(self.refresh_token.access_token),
+            "refresh": str(self.refresh_token),
+            "user": {
+                "id": self.user.id,
+                "username": self.user.username,
+                "email": self.user.email,
+            },
         }
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class TokenRevokeView(TokenViewBase):
+    """
+    Revokes a refresh token and every access token issued from it.
+    """
+
+    serializer_class = TokenRevokeSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        serializer.save()
+        return Response({}, status=status.HTTP_200_OK)
+
 
-        return response
+@require_GET
+def metrics(request):
+    """Request metrics of every worker, in the Prometheus text format."""
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not constant_time_compare(
+            request.headers.get("Authorization", ""), expected
+        ):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    elif not (
+        request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+        or request.user.is_staff
+    ):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        render_prometheus(registry.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )